@@ -5,342 +5,4858 @@
 Автоматизированный анализ JSON логов с выявлением проблем и метрик
 """
 
+import argparse
+import asyncio
+import glob
+import gzip
+import hashlib
+import heapq
+import importlib
+import io
 import json
+import lzma
+import math
+import mmap
+import operator
+import os
 import re
-from collections import Counter, defaultdict
-from datetime import datetime
-from typing import List, Dict, Tuple
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import compress, islice, repeat
+from typing import Callable, List, Dict, Optional, Tuple, Iterable, Iterator, TextIO
+from urllib.parse import parse_qsl, urlsplit
+
+try:
+    import zstandard
+except ImportError:  # логи .zst читаются только при установленном zstandard
+    zstandard = None
+
+# Размер блока при потоковом чтении лога (символов)
+READ_CHUNK_SIZE = 1 << 16
+
+_json_decoder = json.JSONDecoder()
+
+# ANSI-коды цвета в выводе сборки
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
+
+def _iter_json_array(f: TextIO, buf: str, chunk_size: int) -> Iterator[Dict]:
+    """Инкрементальный разбор JSON-массива: записи отдаются по одной, не дожидаясь конца файла"""
+    pos = buf.index('[') + 1
+    eof = False
+    while True:
+        # Пропуск пробелов и разделителей между элементами
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            buf, pos = f.read(chunk_size), 0
+            eof = not buf
+        if pos >= len(buf):
+            raise ValueError('Неожиданный конец файла: JSON-массив не закрыт')
+        if buf[pos] == ']':
+            return
+        try:
+            record, end = _json_decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            # Запись разрезана границей блока — дочитываем
+            if eof:
+                raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buf = buf[pos:] + chunk
+            pos = 0
+            continue
+        yield record
+        pos = end
+        # Отбрасываем уже разобранную часть буфера
+        if pos > chunk_size:
+            buf, pos = buf[pos:], 0
+
+def _iter_ndjson(f: TextIO, buf: str) -> Iterator[Dict]:
+    """Разбор NDJSON: одна JSON-запись на строку"""
+    head, sep, tail = buf.partition('\n')
+    if not sep:
+        # Первая строка длиннее блока — дочитываем её целиком
+        head += f.readline()
+        tail = ''
+    lines = [head] + tail.splitlines(keepends=True)
+    # Последняя строка блока может быть неполной
+    if lines and not lines[-1].endswith('\n'):
+        lines[-1] += f.readline()
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def iter_records_from_stream(f: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict]:
+    """Потоковое чтение записей из открытого файла (JSON-массив или NDJSON)"""
+    buf = f.read(chunk_size)
+    while buf and not buf.strip():
+        buf = f.read(chunk_size)
+    stripped = buf.lstrip()
+    if not stripped:
+        return
+    if stripped[0] == '[':
+        yield from _iter_json_array(f, stripped, chunk_size)
+    else:
+        yield from _iter_ndjson(f, stripped)
+
+# Сигнатуры сжатых архивов логов (первые байты файла)
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+def detect_compression(filepath: str) -> str:
+    """'gzip' | 'xz' | 'zstd' по сигнатуре файла; None — несжатый лог"""
+    with open(filepath, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+def open_log(filepath: str, errors: str = 'strict') -> TextIO:
+    """Текстовый поток лога; сжатые архивы распаковываются на лету, без временных файлов"""
+    compression = detect_compression(filepath)
+    if compression is None:
+        return open(filepath, 'r', encoding='utf-8', errors=errors)
+    if compression == 'gzip':
+        return gzip.open(filepath, 'rt', encoding='utf-8', errors=errors)
+    if compression == 'xz':
+        return lzma.open(filepath, 'rt', encoding='utf-8', errors=errors)
+    if zstandard is None:
+        raise ImportError(f'{filepath}: лог сжат zstd, для чтения нужен пакет zstandard (pip install zstandard)')
+    raw = open(filepath, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+    return io.TextIOWrapper(io.BufferedReader(reader), encoding='utf-8', errors=errors)
+
+def iter_records(filepath: str, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Dict]:
+    """Потоковое чтение логов (в том числе .gz/.xz/.zst): генератор записей с постоянным расходом памяти"""
+    with open_log(filepath) as f:
+        yield from iter_records_from_stream(f, chunk_size)
 
 def load_logs(filepath: str) -> List[Dict]:
-    """Загрузка логов из JSON файла"""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """
+    Загрузка логов из JSON файла целиком (для совместимости; анализ использует iter_records)
+    Одинаковые content хранятся одной строкой на все записи
+    """
+    data = []
+    contents = {}
+    for record in iter_records(filepath):
+        content = record['content']
+        record['content'] = contents.setdefault(content, content)
+        data.append(record)
+    return data
 
 def parse_timestamp(ts: str) -> datetime:
     """Парсинг timestamp в datetime объект"""
     return datetime.fromisoformat(ts.replace('Z', '+00:00'))
 
-def analyze_basic_stats(data: List[Dict]) -> Dict:
-    """Базовая статистика по логам"""
-    stats = {
-        'total_records': len(data),
-        'first_timestamp': data[0]['timestamp'],
-        'last_timestamp': data[-1]['timestamp'],
-        'streams': Counter([d['stream'] for d in data]),
-        'content_lengths': sorted([len(d['content']) for d in data], reverse=True)[:10]
-    }
+# ============================================================================
+# ВРЕМЕННЫЕ МЕТКИ С НАНОСЕКУНДНОЙ ТОЧНОСТЬЮ
+# ============================================================================
+
+NS_PER_SECOND = 10 ** 9
+
+# Пороги пауз (секунды), по которым строится распределение пауз
+GAP_THRESHOLDS = (0.001, 0.01, 0.1, 1, 5, 10, 30, 60, 300)
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Множитель дробной части по числу её цифр: '5' -> 500000000 нс
+_FRACTION_SCALE = [10 ** (9 - digits) for digits in range(10)]
+
+@lru_cache(maxsize=4096)
+def _second_ns(prefix: str) -> int:
+    """YYYY-MM-DDTHH:MM:SS -> наносекунды от эпохи (соседние записи делят одну секунду)"""
+    ordinal = date(int(prefix[:4]), int(prefix[5:7]), int(prefix[8:10])).toordinal()
+    seconds = (ordinal - _EPOCH_ORDINAL) * 86400 + int(prefix[11:13]) * 3600 + int(prefix[14:16]) * 60 + int(prefix[17:19])
+    return seconds * NS_PER_SECOND
+
+def parse_timestamp_ns(ts: str) -> int:
+    """
+    Парсинг timestamp фиксированного формата в наносекунды от эпохи (UTC)
+    Формат: YYYY-MM-DDTHH:MM:SS[.дробь до 9 знаков][Z|±HH:MM]; в отличие от
+    datetime.fromisoformat наносекунды не отбрасываются
+    """
+    # Быстрый путь для формата Amvera: дробная часть без часового пояса
+    fraction = ts[20:]
+    if ts[19:20] == '.' and len(fraction) <= 9 and fraction.isdigit():
+        return _second_ns(ts[:19]) + int(fraction) * _FRACTION_SCALE[len(fraction)]
+    
+    ns = _second_ns(ts[:19])
+    tz = ts[19:]
+    if tz[:1] == '.':
+        end = 1
+        while end < len(tz) and tz[end].isdigit():
+            end += 1
+        fraction = tz[1:end][:9]
+        ns += int(fraction) * _FRACTION_SCALE[len(fraction)]
+        tz = tz[end:]
+    if tz and tz != 'Z':
+        # Смещение ±HH:MM или ±HHMM
+        offset = (int(tz[1:3]) * 60 + int(tz[-2:])) * 60 * NS_PER_SECOND
+        ns -= offset if tz[0] == '+' else -offset
+    return ns
+
+def format_timestamp_ns(ns: int) -> str:
+    """Наносекунды от эпохи -> timestamp формата Amvera (UTC, без часового пояса)"""
+    seconds, fraction = divmod(ns, NS_PER_SECOND)
+    return f"{datetime.fromtimestamp(seconds, timezone.utc):%Y-%m-%dT%H:%M:%S}.{fraction:09d}"
+
+_seconds_part = operator.itemgetter(slice(0, 19))
+_separator_part = operator.itemgetter(slice(19, 20))
+_fraction_part = operator.itemgetter(slice(20, None))
+
+def timestamp_column(timestamps: Iterable[str]) -> array:
+    """
+    Колонка timestamp -> массив int64 наносекунд от эпохи
+    Если все метки в формате Amvera (без часового пояса), разбор идёт цепочкой
+    map по встроенным функциям — без интерпретируемого кода на каждую запись
+    """
+    timestamps = list(timestamps)
+    if timestamps and max(map(len, timestamps)) <= 29 and set(map(_separator_part, timestamps)) <= {'.', ''}:
+        try:
+            return array('q', map(
+                operator.add,
+                map(_second_ns, map(_seconds_part, timestamps)),
+                map(int, map(str.ljust, map(_fraction_part, timestamps), repeat(9), repeat('0')))
+            ))
+        except ValueError:
+            pass
+    return array('q', map(parse_timestamp_ns, timestamps))
+
+def gap_column(ts_ns: array) -> array:
+    """Паузы между соседними записями (нс): поэлементная разность, как numpy.diff"""
+    return array('q', map(operator.sub, islice(ts_ns, 1, None), ts_ns))
+
+def gap_indices(gaps: array, threshold_seconds: float) -> List[int]:
+    """Индексы пауз длиннее порога (пауза i — между записями i и i+1)"""
+    bound = round(threshold_seconds * NS_PER_SECOND)
+    return list(compress(range(len(gaps)), map(bound.__lt__, gaps)))
+
+class GapDistribution:
+    """Распределение пауз между записями сразу по нескольким порогам"""
     
-    # Вычисление длительности
-    start = parse_timestamp(data[0]['timestamp'])
-    end = parse_timestamp(data[-1]['timestamp'])
-    duration = (end - start).total_seconds()
-    stats['duration_seconds'] = duration
-    stats['duration_minutes'] = duration / 60
+    def __init__(self, thresholds: Iterable[float] = GAP_THRESHOLDS):
+        self.thresholds = tuple(sorted(thresholds))
+        self._bounds = [round(t * NS_PER_SECOND) for t in self.thresholds]
+        self.counts = [0] * len(self.thresholds)   # пауз строго длиннее порога
+        self.totals = [0] * len(self.thresholds)   # их суммарная длительность, нс
+        self.gaps = 0
+        self.max_gap = 0
     
-    return stats
+    def add(self, gap_ns: int) -> None:
+        """Потоковое добавление одной паузы"""
+        self.gaps += 1
+        if gap_ns > self.max_gap:
+            self.max_gap = gap_ns
+        for i, bound in enumerate(self._bounds):
+            if gap_ns <= bound:
+                break
+            self.counts[i] += 1
+            self.totals[i] += gap_ns
+    
+    def add_column(self, gaps: array) -> None:
+        """Векторный путь: одна сортировка и бинарный поиск по каждому порогу"""
+        if not gaps:
+            return
+        ordered = sorted(gaps)
+        self.gaps += len(ordered)
+        self.max_gap = max(self.max_gap, ordered[-1])
+        for i, bound in enumerate(self._bounds):
+            start = bisect_right(ordered, bound)
+            self.counts[i] += len(ordered) - start
+            self.totals[i] += sum(islice(ordered, start, None))
+    
+    def result(self) -> Dict:
+        return {
+            'gaps_total': self.gaps,
+            'max_gap_seconds': self.max_gap / NS_PER_SECOND,
+            'over_threshold': [
+                {
+                    'threshold_seconds': threshold,
+                    'count': count,
+                    'total_seconds': total / NS_PER_SECOND
+                }
+                for threshold, count, total in zip(self.thresholds, self.counts, self.totals)
+            ]
+        }
 
-def categorize_by_level(data: List[Dict]) -> Dict[str, List[Dict]]:
-    """Категоризация по уровням логирования"""
-    categories = defaultdict(list)
+# ============================================================================
+# КОМПИЛИРОВАННЫЙ МАТЧЕР КЛЮЧЕВЫХ СЛОВ
+# ============================================================================
+#
+# Все ключевые слова (ошибки, предупреждения, npm, файловые ошибки, таймауты,
+# события временной шкалы) собраны в одно регулярное выражение-трай, которое
+# находит все теги за один проход по строке. Первый символ каждой ветки трая
+# записан литералом в обоих регистрах, а хвост — под (?i:...): так движок re
+# быстро пропускает позиции по первому символу и сравнивает регистронезависимо
+# без создания копии строки в верхнем регистре.
+
+# (ключевое слово, группа, метка); внутри группы порядок задаёт приоритет —
+# как и раньше, выигрывает первое слово из списка, найденное в строке
+MATCHER_KEYWORDS = [
+    ('error', 'errors', 'ERROR'),
+    ('fatal', 'errors', 'FATAL'),
+    ('exception', 'errors', 'EXCEPTION'),
+    ('failed', 'errors', 'FAILED'),
+    ('fail', 'errors', 'FAIL'),
+    ('panic', 'errors', 'PANIC'),
+    ('warn', 'warnings', 'WARN'),
+    ('info', 'info', 'INFO'),
+    ('npm ERR!', 'npm_errors', 'NPM_ERROR'),
+    ('yarn ERR!', 'npm_errors', 'NPM_ERROR'),
+    ('gyp ERR!', 'npm_errors', 'NPM_ERROR'),
+    ('deprecated', 'deprecated', 'DEPRECATED'),
+    ('enoent', 'file_errors', 'FILE_ERROR'),
+    ('eacces', 'file_errors', 'FILE_ERROR'),
+    ('eperm', 'file_errors', 'FILE_ERROR'),
+    ('etimedout', 'timeouts', 'TIMEOUT'),
+    ('timeout', 'timeouts', 'TIMEOUT'),
+    ('cloning into', 'timeline', 'git_clone'),
+    ('head is now at', 'timeline', 'git_checkout'),
+    ('npm install', 'timeline', 'npm_install_start'),
+    ('npm ci', 'timeline', 'npm_install_start'),
+    ('npm run build', 'timeline', 'npm_build_start'),
+    ('resolved base name', 'timeline', 'docker_stage'),
+    ('retrieving image', 'timeline', 'docker_stage'),
+    ('building stage', 'timeline', 'docker_stage'),
+    ('copy', 'timeline', 'copying'),
+    ('completed', 'timeline', 'completed'),
+    ('finished', 'timeline', 'completed'),
+    ('done', 'timeline', 'completed'),
+]
+
+# Ключевые слова, которые сравниваются с учётом регистра
+CASE_SENSITIVE_KEYWORDS = {'npm ERR!', 'yarn ERR!', 'gyp ERR!'}
+
+def _trie_pattern(words: List[str]) -> str:
+    """Регулярное выражение-трай для набора литералов (общие префиксы вынесены)"""
+    root = {}
+    for word in words:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
     
-    for record in data:
-        content = record['content']
-        content_upper = content.upper()
+    def emit(node: Dict) -> str:
+        # Более длинные продолжения идут первыми: 'fail' + 'ed' -> 'failed'
+        branches = [re.escape(ch) + emit(child) for ch, child in node.items() if ch]
+        optional = '' in node
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if optional else '')
+    
+    return emit(root)
+
+class KeywordMatcher:
+    """Поиск всех тегов строки за один проход единым скомпилированным выражением"""
+    
+    def __init__(self, keywords: List[Tuple[str, str, str]] = MATCHER_KEYWORDS):
+        # ключевое слово (в нижнем регистре) -> (группа, приоритет, метка, литерал для сверки регистра)
+        self._lookup = {}
+        by_first = defaultdict(list)
+        for priority, (word, group, label) in enumerate(keywords):
+            exact = word if word in CASE_SENSITIVE_KEYWORDS else None
+            self._lookup[word.lower()] = (group, priority, label, exact)
+            by_first[word[0].lower()].append(word[1:].lower())
         
-        # Определение категории по содержимому
-        if '\x1b[31m' in content or 'ERROR' in content_upper or 'FATAL' in content_upper:
-            categories['ERROR'].append(record)
-        elif '\x1b[33m' in content or 'WARN' in content_upper:
-            categories['WARN'].append(record)
-        elif '\x1b[36m' in content or 'INFO' in content_upper:
-            categories['INFO'].append(record)
-        elif 'npm' in content[:30].lower():
-            categories['NPM'].append(record)
-        elif any(kw in content[:50].lower() for kw in ['docker', 'kaniko', 'building', 'copying']):
-            categories['DOCKER'].append(record)
-        else:
-            categories['OTHER'].append(record)
+        branches = []
+        for first, tails in sorted(by_first.items()):
+            tail = _trie_pattern(tails)
+            tail = f'(?i:{tail})' if tail else ''
+            for ch in sorted({first, first.upper()}):
+                branches.append(re.escape(ch) + tail)
+        self.pattern = re.compile('|'.join(branches))
+        self._search = self.pattern.search
     
-    return dict(categories)
+    def scan(self, text: str) -> Dict[str, str]:
+        """Теги строки: группа -> метка с наивысшим приоритетом среди найденных"""
+        found = {}
+        best = {}
+        search = self._search
+        lookup = self._lookup
+        m = search(text)
+        while m is not None:
+            word = m.group()
+            group, priority, label, exact = lookup[word.lower()]
+            if (exact is None or word == exact) and priority < best.get(group, len(lookup) + 1):
+                best[group] = priority
+                found[group] = label
+            # Следующий поиск со сдвигом на один символ: пересекающиеся
+            # ключевые слова не теряются
+            m = search(text, m.start() + 1)
+        return found
 
-def find_problems(data: List[Dict]) -> Dict[str, List[Tuple[Dict, str]]]:
-    """Поиск проблемных паттернов"""
-    problems = {
-        'errors': [],
-        'warnings': [],
-        'npm_errors': [],
-        'deprecated': [],
-        'file_errors': [],
-        'timeouts': []
-    }
+keyword_matcher = KeywordMatcher()
+
+# ============================================================================
+# ОДНОПРОХОДНЫЙ КОНВЕЙЕР АНАЛИЗА
+# ============================================================================
+#
+# Записи проходят через конвейер один раз; каждый анализатор — это этап
+# (AnalysisStage), который обновляет собственный аккумулятор в feed() и
+# отдаёт итог в result(). Производные строки записи (upper/lower) считаются
+# один раз и разделяются всеми этапами через LogRecord (теги KeywordMatcher).
+# Новый анализатор = новый подкласс AnalysisStage, добавленный в список этапов.
+#
+# Логи сборок сильно повторяются (вывод npm и tsc при каждой попытке), поэтому
+# всё, что зависит только от текста строки (теги, шаблон ошибки), хранится в
+# LineInfo и вычисляется один раз на уникальную строку. Строки интернируются
+# после очистки от ANSI-кодов: записи, отличающиеся только цветом, ссылаются на
+# общий LineInfo из LineTable. Категория зависит и от цвета (красный — ERROR),
+# поэтому она запоминается отдельно для каждого варианта исходной строки.
+
+# Предел числа уникальных строк в LineTable: дальше строки не запоминаются,
+# чтобы лог из одних уникальных строк не раздувал память
+LINE_TABLE_MAX = 1 << 18
+
+def strip_ansi(content: str) -> str:
+    return ANSI_RE.sub('', content) if '\x1b' in content else content
+
+class LineInfo:
+    """Уникальная строка лога (без ANSI-кодов) и производные от неё значения, вычисляемые один раз"""
+    __slots__ = ('clean', '_tags', '_level', '_colored_levels', '_fingerprint')
+    
+    def __init__(self, clean: str):
+        self.clean = clean
+        self._tags = None
+        self._level = None
+        self._colored_levels = None   # исходная строка с ANSI-кодами -> категория
+        self._fingerprint = None
+    
+    @property
+    def tags(self) -> Dict[str, str]:
+        if self._tags is None:
+            self._tags = keyword_matcher.scan(self.clean)
+        return self._tags
+    
+    def level_of(self, content: str) -> str:
+        """Категория записи с исходным текстом content (classify_level: цвет ANSI тоже учитывается)"""
+        if len(content) == len(self.clean):
+            # content очищается в clean, поэтому равная длина — строка без ANSI-кодов
+            if self._level is None:
+                self._level = classify_level(content, self.tags)
+            return self._level
+        levels = self._colored_levels
+        if levels is None:
+            levels = self._colored_levels = {}
+        level = levels.get(content)
+        if level is None:
+            level = levels[content] = classify_level(content, self.tags)
+        return level
+    
+    @property
+    def fingerprint(self) -> Tuple[str, str]:
+        """(хеш, шаблон) сообщения без ANSI-кодов"""
+        if self._fingerprint is None:
+            template = fingerprint_template(self.clean)
+            self._fingerprint = (fingerprint(template), template)
+        return self._fingerprint
+
+class LineTable:
+    """Таблица уникальных строк: одинаковый content без ANSI-кодов -> общий LineInfo"""
+    
+    def __init__(self, max_lines: int = LINE_TABLE_MAX):
+        self.max_lines = max_lines
+        self.lines: Dict[str, LineInfo] = {}
+    
+    def __len__(self) -> int:
+        return len(self.lines)
+    
+    def intern(self, content: str) -> LineInfo:
+        clean = strip_ansi(content)
+        line = self.lines.get(clean)
+        if line is None:
+            line = LineInfo(clean)
+            if len(self.lines) < self.max_lines:
+                self.lines[clean] = line
+        return line
+
+class LogRecord:
+    """Запись лога; теги, очистка и категория берутся из общего для одинаковых строк LineInfo"""
+    __slots__ = ('raw', 'timestamp', 'stream', 'content', 'line', '_ts_ns')
+    
+    def __init__(self, raw: Dict, line: LineInfo = None):
+        self.raw = raw
+        self.timestamp = raw['timestamp']
+        self.content = raw['content']
+        if line is None:
+            line = LineInfo(strip_ansi(self.content))
+        self.line = line
+        self.stream = raw['stream']
+        self._ts_ns = None
+    
+    @property
+    def tags(self) -> Dict[str, str]:
+        return self.line.tags
+    
+    @property
+    def ts_ns(self) -> int:
+        if self._ts_ns is None:
+            self._ts_ns = parse_timestamp_ns(self.timestamp)
+        return self._ts_ns
+    
+    @property
+    def clean(self) -> str:
+        """content без ANSI-кодов (общий для записей одной строки)"""
+        return self.line.clean
+    
+    @property
+    def level(self) -> str:
+        return self.line.level_of(self.content)
+    
+    @property
+    def fingerprint(self) -> Tuple[str, str]:
+        return self.line.fingerprint
+
+class AnalysisStage:
+    """Базовый этап конвейера: накапливает состояние по одной записи за раз"""
+    name = ''
     
-    error_keywords = ['ERROR', 'FATAL', 'EXCEPTION', 'FAILED', 'FAIL', 'PANIC']
-    warning_keywords = ['WARN', 'WARNING']
+    def feed(self, rec: LogRecord) -> None:
+        raise NotImplementedError
     
+    def result(self):
+        raise NotImplementedError
+    
+    def get_state(self) -> Dict:
+        """JSON-сериализуемое состояние аккумулятора (для контрольной точки)"""
+        raise NotImplementedError(f'Этап {type(self).__name__} не поддерживает контрольные точки')
+    
+    def set_state(self, state: Dict) -> None:
+        """Восстановление аккумулятора из get_state()"""
+        raise NotImplementedError(f'Этап {type(self).__name__} не поддерживает контрольные точки')
+    
+    def accuracy(self) -> Optional[Dict]:
+        """Гарантии точности приближённого результата (None — результат точный)"""
+        return None
+    
+    def run(self, data: Iterable[Dict]):
+        """Прогон одного этапа по записям (обёртка для одиночного использования)"""
+        return run_pipeline(data, [self])[self.name]
+
+def feed_pipeline(data: Iterable[Dict], stages: List[AnalysisStage], lines: LineTable = None) -> int:
+    """Один проход по записям с передачей каждой записи во все этапы; возвращает число записей"""
+    feeds = [stage.feed for stage in stages]
+    intern = (lines if lines is not None else LineTable()).intern
+    count = 0
     for record in data:
-        content = record['content']
-        content_upper = content.upper()
-        
-        # Ошибки
-        for keyword in error_keywords:
-            if keyword in content_upper:
-                problems['errors'].append((record, keyword))
-                break
-        
-        # Предупреждения
-        for keyword in warning_keywords:
-            if keyword in content_upper:
-                problems['warnings'].append((record, keyword))
-                break
-        
-        # npm/yarn ошибки
-        if 'npm ERR!' in content or 'yarn ERR!' in content or 'gyp ERR!' in content:
-            problems['npm_errors'].append((record, 'NPM_ERROR'))
+        rec = LogRecord(record, intern(record['content']))
+        for feed in feeds:
+            feed(rec)
+        count += 1
+    return count
+
+def run_pipeline(data: Iterable[Dict], stages: List[AnalysisStage]) -> Dict:
+    """Один проход по записям; результат — словарь имя этапа -> result()"""
+    feed_pipeline(data, stages)
+    return {stage.name: stage.result() for stage in stages}
+
+# ============================================================================
+# ОГРАНИЧЕННАЯ ПАМЯТЬ: ЧАСТЫЕ ГРУППЫ И ВЫБОРКИ ПРИМЕРОВ
+# ============================================================================
+#
+# Группы дубликатов и шаблонов ошибок считаются алгоритмом Space-Saving: в
+# таблице не больше capacity групп, новая группа при заполненной таблице
+# вытесняет самую редкую и получает её счёт + 1 (оценка сверху). В выводе
+# счёт дополнительно ограничивается оценкой Count-Min-скетча по всему потоку
+# (тоже оценка сверху, часто точнее для групп, попавших в таблицу поздно).
+# Гарантии (N — число записей группы проблем, K — capacity):
+#   count - error <= истинное число <= count, error <= N / K;
+#   группа с истинной частотой больше N / K всегда есть в таблице.
+# Пока таблица не переполнялась, все счёты точные (error = 0). Таблицы частей
+# потока (отдельных логов, рабочих процессов) объединяются с теми же гарантиями.
+# Примеры — равномерная выборка (reservoir sampling): каждый элемент потока
+# попадает в выборку размера R с вероятностью R / n. Выбор места детерминирован
+# (хеш номера элемента), поэтому результаты воспроизводимы и переживают
+# контрольные точки.
+
+# Сколько групп держит таблица Space-Saving
+HEAVY_HITTERS_CAPACITY = 1000
+# Count-Min: ошибка оценки <= epsilon * N с вероятностью 1 - delta
+COUNT_MIN_EPSILON = 0.001
+COUNT_MIN_DELTA = 0.01
+# Примеров на группу дубликатов/шаблонов
+GROUP_SAMPLES = 3
+
+def _stable_hash(value: str, salt: bytes = b'') -> int:
+    """64-битный хеш, одинаковый во всех процессах (в отличие от hash() для str)"""
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8, key=salt).digest(), 'little')
+
+class CountMinSketch:
+    """Count-Min-скетч: оценка частоты ключа сверху, память width * depth счётчиков"""
+    
+    def __init__(self, epsilon: float = COUNT_MIN_EPSILON, delta: float = COUNT_MIN_DELTA):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.table = array('I', bytes(4 * self.width * self.depth))
+        self.total = 0
+    
+    def _cells(self, key: str) -> Iterator[int]:
+        # Двойное хеширование: depth индексов из одного 64-битного хеша
+        h = _stable_hash(key)
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        width = self.width
+        return (row * width + (h1 + row * h2) % width for row in range(self.depth))
+    
+    def add(self, key: str) -> None:
+        table = self.table
+        for cell in self._cells(key):
+            table[cell] += 1
+        self.total += 1
+    
+    def estimate(self, key: str) -> int:
+        return min(self.table[cell] for cell in self._cells(key))
+    
+    def merge(self, other: 'CountMinSketch') -> None:
+        """Сложение скетча другой части потока (размеры должны совпадать)"""
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError('Count-Min: размеры скетчей не совпадают')
+        self.table = array('I', (a + b for a, b in zip(self.table, other.table)))
+        self.total += other.total
+    
+    def get_state(self) -> Dict:
+        return {'width': self.width, 'depth': self.depth, 'total': self.total,
+                'table': self.table.tobytes().hex()}
+    
+    def set_state(self, state: Dict) -> None:
+        self.width, self.depth, self.total = state['width'], state['depth'], state['total']
+        self.table = array('I')
+        self.table.frombytes(bytes.fromhex(state['table']))
+
+class SpaceSaving:
+    """
+    Таблица не более capacity частых групп (Space-Saving + Count-Min)
+    Группа — словарь с полями вызывающего кода и полями 'count', 'error'
+    """
+    
+    def __init__(self, capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.capacity = capacity
+        self.entries: Dict[str, Dict] = {}
+        self.sketch = CountMinSketch()
+        self.evictions = 0
+        self._heap = []   # (count, key) с ленивым обновлением: устаревшие пары пропускаются
+    
+    def add(self, key: str, make_entry: Callable[[], Dict]) -> Tuple[Dict, bool]:
+        """Учесть вхождение ключа; возвращает (группа, создана ли она сейчас)"""
+        self.sketch.add(key)
+        entry = self.entries.get(key)
+        if entry is not None:
+            entry['count'] += 1
+            return entry, False
+        count, error = 1, 0
+        if len(self.entries) >= self.capacity:
+            count = self._pop_min() + 1
+            error = count - 1
+            self.evictions += 1
+        entry = make_entry()
+        entry['count'] = count
+        entry['error'] = error
+        self.entries[key] = entry
+        heapq.heappush(self._heap, (count, key))
+        return entry, True
+    
+    def groups(self) -> List[Dict]:
+        """Группы для вывода: счёт уточнён оценкой Count-Min, error — ширина интервала"""
+        if not self.evictions:
+            return list(self.entries.values())
+        groups = []
+        for key, entry in self.entries.items():
+            lower = entry['count'] - entry['error']
+            count = min(entry['count'], self.sketch.estimate(key))
+            groups.append(dict(entry, count=count, error=count - lower))
+        return groups
+    
+    def merge(self, other: 'SpaceSaving') -> None:
+        """
+        Объединение с таблицей другой части потока (mergeable summaries)
+        Ключ, которого нет в переполнявшейся таблице, встречался в её части не чаще
+        её минимального счёта: этот минимум добавляется к count и error
+        """
+        self.sketch.merge(other.sketch)
+        floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for key in [*self.entries, *(k for k in other.entries if k not in self.entries)]:
+            mine, theirs = self.entries.get(key), other.entries.get(key)
+            entry = dict(mine if mine is not None else theirs)
+            for field in ('count', 'error'):
+                entry[field] = (mine[field] if mine is not None else floor) + \
+                               (theirs[field] if theirs is not None else other_floor)
+            merged[key] = entry
+        dropped = max(0, len(merged) - self.capacity)
+        if dropped:
+            merged = dict(heapq.nlargest(self.capacity, merged.items(), key=lambda item: item[1]['count']))
+        self.entries = merged
+        self.evictions += other.evictions + dropped
+        self._heap = [(entry['count'], key) for key, entry in merged.items()]
+        heapq.heapify(self._heap)
+    
+    def _floor(self) -> int:
+        """Оценка сверху для ключа вне таблицы: 0, пока вытеснений не было"""
+        if not self.evictions or not self.entries:
+            return 0
+        return min(entry['count'] for entry in self.entries.values())
+    
+    def _pop_min(self) -> int:
+        """Вытеснение группы с наименьшим счётом; возвращает её счёт"""
+        heap, entries = self._heap, self.entries
+        while True:
+            count, key = heapq.heappop(heap)
+            current = entries[key]['count']
+            if current == count:
+                del entries[key]
+                return count
+            heapq.heappush(heap, (current, key))
+    
+    def accuracy(self, name: str) -> Dict:
+        """Описание гарантий точности для вывода рядом с результатами"""
+        total = self.sketch.total
+        bound = total // self.capacity if self.evictions else 0
+        return {
+            'method': 'space-saving + count-min',
+            'capacity': self.capacity,
+            'records': total,
+            'groups_tracked': len(self.entries),
+            'evictions': self.evictions,
+            'exact': self.evictions == 0,
+            'max_overcount': bound,
+            'guarantee': (f'{name}: count - error <= истинное число <= count, error <= {bound}; '
+                          f'любая группа чаще {bound} раз присутствует' if self.evictions else
+                          f'{name}: таблица не переполнялась, счёты точные'),
+        }
+    
+    def get_state(self) -> Dict:
+        return {'capacity': self.capacity, 'evictions': self.evictions,
+                'entries': list(self.entries.values()), 'sketch': self.sketch.get_state()}
+    
+    def set_state(self, state: Dict, key: str) -> None:
+        self.capacity = state['capacity']
+        self.evictions = state['evictions']
+        self.entries = {entry[key]: dict(entry, error=entry.get('error', 0)) for entry in state['entries']}
+        self._heap = [(entry['count'], k) for k, entry in self.entries.items()]
+        heapq.heapify(self._heap)
+        self.sketch.set_state(state['sketch'])
+
+def reservoir_add(items: List, size: int, seen: int, item, salt: bytes = b'') -> None:
+    """Шаг алгоритма R: item — seen-й элемент потока (seen считается с 1)"""
+    if len(items) < size:
+        items.append(item)
+        return
+    slot = _stable_hash(str(seen), salt) % seen
+    if slot < size:
+        items[slot] = item
+
+class Reservoir:
+    """Равномерная выборка не более size элементов потока (алгоритм R, детерминированный)"""
+    
+    def __init__(self, size: int, salt: str = ''):
+        self.size = size
+        self.salt = salt.encode('utf-8')[:64]
+        self.items = []
+        self.seen = 0
+    
+    def add(self, item) -> None:
+        self.seen += 1
+        reservoir_add(self.items, self.size, self.seen, item, self.salt)
+    
+    def get_state(self) -> Dict:
+        return {'size': self.size, 'seen': self.seen, 'items': self.items}
+    
+    def set_state(self, state: Dict) -> None:
+        self.size, self.seen = state['size'], state['seen']
+        self.items = [tuple(item) if isinstance(item, list) else item for item in state['items']]
+
+class BasicStatsStage(AnalysisStage):
+    """Базовая статистика: число записей, границы по времени, потоки, самые длинные сообщения"""
+    name = 'stats'
+    
+    def __init__(self):
+        self.total = 0
+        self.first = None
+        self.last = None
+        self.streams = Counter()
+        self.longest = []  # min-heap из 10 самых длинных сообщений
+    
+    def feed(self, rec: LogRecord) -> None:
+        if self.first is None:
+            self.first = rec.timestamp
+        self.last = rec.timestamp
+        self.total += 1
+        self.streams[rec.stream] += 1
+        length = len(rec.content)
+        if len(self.longest) < 10:
+            heapq.heappush(self.longest, length)
+        elif length > self.longest[0]:
+            heapq.heapreplace(self.longest, length)
+    
+    def result(self) -> Dict:
+        stats = {
+            'total_records': self.total,
+            'first_timestamp': self.first,
+            'last_timestamp': self.last,
+            'streams': self.streams,
+            'content_lengths': sorted(self.longest, reverse=True)
+        }
         
-        # Deprecated зависимости
-        if 'DEPRECATED' in content_upper or 'deprecated' in content:
-            problems['deprecated'].append((record, 'DEPRECATED'))
+        # Вычисление длительности
+        duration = 0.0
+        if self.first is not None:
+            duration = (parse_timestamp_ns(self.last) - parse_timestamp_ns(self.first)) / NS_PER_SECOND
+        stats['duration_seconds'] = duration
+        stats['duration_minutes'] = duration / 60
         
-        # Файловые ошибки
-        if any(code in content_upper for code in ['ENOENT', 'EACCES', 'EPERM']):
-            problems['file_errors'].append((record, 'FILE_ERROR'))
+        return stats
+    
+    def get_state(self) -> Dict:
+        return {'total': self.total, 'first': self.first, 'last': self.last,
+                'streams': dict(self.streams), 'longest': self.longest}
+    
+    def set_state(self, state: Dict) -> None:
+        self.total = state['total']
+        self.first = state['first']
+        self.last = state['last']
+        self.streams = Counter(state['streams'])
+        self.longest = state['longest']
+
+def classify_level(content: str, tags: Dict[str, str]) -> str:
+    """Категория записи по содержимому и тегам KeywordMatcher"""
+    if '\x1b[31m' in content or tags.get('errors') in ('ERROR', 'FATAL'):
+        return 'ERROR'
+    if '\x1b[33m' in content or 'warnings' in tags:
+        return 'WARN'
+    if '\x1b[36m' in content or 'info' in tags:
+        return 'INFO'
+    if 'npm' in content[:30].lower():
+        return 'NPM'
+    if any(kw in content[:50].lower() for kw in ['docker', 'kaniko', 'building', 'copying']):
+        return 'DOCKER'
+    return 'OTHER'
+
+class CategoryStage(AnalysisStage):
+    """Категоризация по уровням логирования (записи целиком или только счётчики)"""
+    name = 'categories'
+    
+    def __init__(self, keep_records: bool = True):
+        self.keep_records = keep_records
+        self.categories = defaultdict(list) if keep_records else {}
+    
+    def feed(self, rec: LogRecord) -> None:
+        category = rec.level
         
-        # Таймауты
-        if 'ETIMEDOUT' in content_upper or 'timeout' in content.lower():
-            problems['timeouts'].append((record, 'TIMEOUT'))
+        if self.keep_records:
+            self.categories[category].append(rec.raw)
+        else:
+            self.categories[category] = self.categories.get(category, 0) + 1
+    
+    def result(self) -> Dict:
+        return dict(self.categories)
+    
+    def get_state(self) -> Dict:
+        if self.keep_records:
+            return super().get_state()
+        return {'categories': self.categories}
     
-    return problems
+    def set_state(self, state: Dict) -> None:
+        if self.keep_records:
+            super().set_state(state)
+        self.categories = dict(state['categories'])
 
-def analyze_timeline(data: List[Dict]) -> List[Dict]:
-    """Анализ временной шкалы и ключевых событий"""
-    key_events = []
-    
-    # Паттерны для ключевых событий
-    patterns = {
-        'git_clone': r'Cloning into',
-        'git_checkout': r'HEAD is now at',
-        'npm_install_start': r'npm (install|ci)',
-        'npm_build_start': r'npm run build',
-        'docker_stage': r'(Resolved base name|Retrieving image|Building stage)',
-        'copying': r'(Copying|COPY)',
-        'completed': r'completed|finished|done'
+# Группы проблем (совпадают с группами тегов KeywordMatcher)
+PROBLEM_GROUPS = ('errors', 'warnings', 'npm_errors', 'deprecated', 'file_errors', 'timeouts')
+
+class ProblemsStage(AnalysisStage):
+    """Поиск проблемных паттернов"""
+    name = 'problems'
+    
+    def __init__(self):
+        self.problems = {group: [] for group in PROBLEM_GROUPS}
+    
+    def feed(self, rec: LogRecord) -> None:
+        # Ошибки (ERROR/FATAL/...), предупреждения, npm/yarn ошибки, deprecated
+        # зависимости, файловые ошибки (ENOENT/EACCES/EPERM) и таймауты —
+        # все теги найдены одним проходом KeywordMatcher
+        tags = rec.tags
+        if not tags:
+            return
+        record = rec.raw
+        for group, found in self.problems.items():
+            label = tags.get(group)
+            if label is not None:
+                found.append((record, label))
+    
+    def result(self) -> Dict[str, List[Tuple[Dict, str]]]:
+        return self.problems
+
+class ProblemSummaryStage(AnalysisStage):
+    """Счётчики проблем и выборки примеров ошибок/предупреждений без хранения записей"""
+    name = 'problems'
+    
+    def __init__(self, error_examples: int = 20, warning_examples: int = 10):
+        self.counts = dict.fromkeys(PROBLEM_GROUPS, 0)
+        self.examples = {'errors': Reservoir(error_examples, 'errors'),
+                         'warnings': Reservoir(warning_examples, 'warnings')}
+    
+    def feed(self, rec: LogRecord) -> None:
+        tags = rec.tags
+        if not tags:
+            return
+        counts = self.counts
+        for group in PROBLEM_GROUPS:
+            label = tags.get(group)
+            if label is None:
+                continue
+            counts[group] += 1
+            examples = self.examples.get(group)
+            if examples is not None:
+                examples.add((rec.timestamp, rec.clean[:300], label))
+    
+    def result(self) -> Dict:
+        counts = self.counts
+        return {
+            'errors_count': counts['errors'],
+            'errors_examples': sorted(self.examples['errors'].items),
+            'warnings_count': counts['warnings'],
+            'warnings_examples': sorted(self.examples['warnings'].items),
+            'npm_errors': counts['npm_errors'],
+            'deprecated': counts['deprecated'],
+            'file_errors': counts['file_errors'],
+            'timeouts': counts['timeouts']
+        }
+    
+    def accuracy(self) -> Dict:
+        return {
+            'method': 'reservoir sampling',
+            'samples': {group: {'size': r.size, 'seen': r.seen} for group, r in self.examples.items()},
+            'guarantee': 'каждая запись группы попадает в примеры с вероятностью size / seen',
+        }
+    
+    def get_state(self) -> Dict:
+        return {'counts': self.counts,
+                'examples': {group: r.get_state() for group, r in self.examples.items()}}
+    
+    def set_state(self, state: Dict) -> None:
+        self.counts = dict(state['counts'])
+        for group, examples in state['examples'].items():
+            self.examples[group].set_state(examples)
+
+def _group_entry(key_field: str, key: str, timestamp: str, clean_content: str, **fields) -> Dict:
+    """Новая группа дубликатов/шаблонов (count и error ведёт SpaceSaving)"""
+    return {
+        key_field: key,
+        **fields,
+        'count': 0,
+        'error': 0,
+        'first_occurrence': timestamp,
+        'last_occurrence': timestamp,
+        'example': clean_content[:300],
+        'samples': [],
     }
+
+def _sample_group(entry: Dict, key: str, timestamp: str, clean_content: str) -> None:
+    """Выборка примеров группы среди её вхождений с момента попадания в таблицу"""
+    reservoir_add(entry['samples'], GROUP_SAMPLES, entry['count'] - entry['error'],
+                  {'timestamp': timestamp, 'content': clean_content[:300]}, key.encode('utf-8')[:64])
+
+class DuplicatesStage(AnalysisStage):
+    """Потоковая агрегация дубликатов одной группы проблем (как aggregate_duplicates)"""
     
-    for record in data:
-        content = record['content']
-        
-        for event_type, pattern in patterns.items():
-            if re.search(pattern, content, re.IGNORECASE):
-                key_events.append({
-                    'timestamp': record['timestamp'],
+    def __init__(self, group: str = 'errors', name: str = 'error_aggregated', sample_length: int = 100,
+                 capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.group = group
+        self.name = name
+        self.sample_length = sample_length
+        self.groups = SpaceSaving(capacity)
+    
+    def add(self, timestamp: str, clean_content: str) -> None:
+        # Группировка по первым N символам текста без ANSI кодов
+        key = clean_content[:self.sample_length].strip()
+        entry, created = self.groups.add(key, lambda: _group_entry('sample', key, timestamp, clean_content))
+        if not created:
+            entry['last_occurrence'] = timestamp
+        _sample_group(entry, key, timestamp, clean_content)
+    
+    def feed(self, rec: LogRecord) -> None:
+        if self.group in rec.tags:
+            self.add(rec.timestamp, rec.clean)
+    
+    def result(self) -> List[Dict]:
+        # Сортировка по частоте; при равенстве — порядок попадания группы в таблицу.
+        # Пока вытеснений не было, это порядок первого появления; вытесненная и
+        # вернувшаяся группа стоит по моменту возвращения (прежний момент не хранится)
+        return sorted(self.groups.groups(), key=lambda x: x['count'], reverse=True)
+    
+    def accuracy(self) -> Dict:
+        return self.groups.accuracy(self.name)
+    
+    def get_state(self) -> Dict:
+        return self.groups.get_state()
+    
+    def set_state(self, state: Dict) -> None:
+        self.groups.set_state(state, 'sample')
+
+# ============================================================================
+# ШАБЛОНЫ ОШИБОК (FINGERPRINTING)
+# ============================================================================
+#
+# Переменные части сообщения (URL, пути, номера строк/колонок, идентификаторы
+# в кавычках, hex-идентификаторы, длительности, числа) заменяются
+# плейсхолдерами. Получившийся шаблон хешируется, группы хранятся в словаре
+# по хешу: агрегация за O(n), на группу — одна запись без списка вхождений.
+
+# (имя группы, выражение, замена); порядок ветвей задаёт приоритет в одной позиции
+FINGERPRINT_RULES = [
+    ('url', r'[A-Za-z][A-Za-z0-9+.-]*://\S+', '<url>'),
+    ('path', r'(?:[A-Za-z]:)?(?:[\w@.$~-]*[/\\])+[\w@.$~*-]+', '<path>'),
+    ('hex', r'\b(?:0[xX][0-9a-fA-F]+|(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{7,})\b', '<hex>'),
+    ('duration', r'\b\d+(?:\.\d+)?\s?(?:ns|us|µs|ms|s|sec|min|m|h)\b', '<dur>'),
+    ('quoted', r"'[^'\s]{1,80}'|\"[^\"\s]{1,80}\"", "'<id>'"),
+    ('number', r'\b\d+(?:\.\d+)*\b', '<n>'),
+    ('space', r'\s+', ' '),
+]
+
+_FINGERPRINT_RE = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern, _ in FINGERPRINT_RULES))
+_FINGERPRINT_REPLACEMENTS = {name: replacement for name, _, replacement in FINGERPRINT_RULES}
+
+def fingerprint_template(clean_content: str) -> str:
+    """Шаблон сообщения без ANSI-кодов: переменные части заменены плейсхолдерами"""
+    return _FINGERPRINT_RE.sub(lambda m: _FINGERPRINT_REPLACEMENTS[m.lastgroup], clean_content).strip()
+
+def fingerprint(template: str) -> str:
+    """Короткий стабильный хеш шаблона (16 hex-символов)"""
+    return hashlib.blake2b(template.encode('utf-8'), digest_size=8).hexdigest()
+
+class FingerprintStage(AnalysisStage):
+    """Агрегация проблем одной группы по шаблонам сообщений"""
+    
+    def __init__(self, group: str = 'errors', name: str = 'error_fingerprints',
+                 capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.group = group
+        self.name = name
+        self.templates = SpaceSaving(capacity)   # fingerprint -> группа
+    
+    def add(self, timestamp: str, clean_content: str) -> None:
+        template = fingerprint_template(clean_content)
+        self._add(timestamp, clean_content, fingerprint(template), template)
+    
+    def _add(self, timestamp: str, clean_content: str, key: str, template: str) -> None:
+        entry, created = self.templates.add(
+            key, lambda: _group_entry('fingerprint', key, timestamp, clean_content, template=template[:300]))
+        if not created:
+            entry['last_occurrence'] = timestamp
+        _sample_group(entry, key, timestamp, clean_content)
+    
+    def feed(self, rec: LogRecord) -> None:
+        if self.group in rec.tags:
+            key, template = rec.fingerprint
+            self._add(rec.timestamp, rec.clean, key, template)
+    
+    def result(self) -> List[Dict]:
+        return sorted(self.templates.groups(), key=lambda x: x['count'], reverse=True)
+    
+    def accuracy(self) -> Dict:
+        return self.templates.accuracy(self.name)
+    
+    def get_state(self) -> Dict:
+        return self.templates.get_state()
+    
+    def set_state(self, state: Dict) -> None:
+        self.templates.set_state(state, 'fingerprint')
+
+def aggregate_fingerprints(problems: List[Tuple[Dict, str]]) -> List[Dict]:
+    """Агрегация проблем по шаблонам сообщений (fingerprint)"""
+    stage = FingerprintStage()
+    for record, keyword in problems:
+        stage.add(record['timestamp'], ANSI_RE.sub('', record['content']))
+    return stage.result()
+
+# ============================================================================
+# ИНДЕКС ДИАГНОСТИК TYPESCRIPT
+# ============================================================================
+
+# miniapp/src/hooks/usePageTransitions.ts(182,7): error TS1005: '>' expected.
+TS_DIAGNOSTIC_RE = re.compile(r'(?P<file>[^\s(][^(]*)\((?P<line>\d+),(?P<column>\d+)\): error (?P<code>TS\d+): (?P<message>.*)')
+
+TS_INDEX_VERSION = 1
+
+class TsDiagnosticIndex:
+    """Таблица диагностик tsc (файл, строка, колонка, код, сообщение) с индексами по файлу и по коду"""
+    
+    def __init__(self):
+        # Справочники строк: таблица хранит только их номера
+        self.files: List[str] = []
+        self.codes: List[str] = []
+        self.messages: List[str] = []
+        self._ids: Dict[str, Dict[str, int]] = {'files': {}, 'codes': {}, 'messages': {}}
+        # Колонки таблицы
+        self.file_ids = array('I')
+        self.lines = array('I')
+        self.columns = array('I')
+        self.code_ids = array('I')
+        self.message_ids = array('I')
+        # Индексы: номер в справочнике -> номера строк таблицы
+        self.by_file: Dict[int, List[int]] = defaultdict(list)
+        self.by_code: Dict[int, List[int]] = defaultdict(list)
+    
+    def _intern(self, table: str, value: str) -> int:
+        ids = self._ids[table]
+        value_id = ids.get(value)
+        if value_id is None:
+            value_id = ids[value] = len(ids)
+            getattr(self, table).append(value)
+        return value_id
+    
+    def add(self, file: str, line: int, column: int, code: str, message: str) -> None:
+        row = len(self.file_ids)
+        file_id = self._intern('files', file)
+        code_id = self._intern('codes', code)
+        self.file_ids.append(file_id)
+        self.lines.append(line)
+        self.columns.append(column)
+        self.code_ids.append(code_id)
+        self.message_ids.append(self._intern('messages', message))
+        self.by_file[file_id].append(row)
+        self.by_code[code_id].append(row)
+    
+    def add_line(self, clean_content: str) -> bool:
+        """Разбор строки лога без ANSI-кодов; True, если это диагностика tsc"""
+        if ': error TS' not in clean_content:
+            return False
+        m = TS_DIAGNOSTIC_RE.search(clean_content)
+        if m is None:
+            return False
+        self.add(m.group('file').strip(), int(m.group('line')), int(m.group('column')),
+                 m.group('code'), m.group('message').strip())
+        return True
+    
+    def __len__(self) -> int:
+        return len(self.file_ids)
+    
+    def row(self, i: int) -> Dict:
+        return {
+            'file': self.files[self.file_ids[i]],
+            'line': self.lines[i],
+            'column': self.columns[i],
+            'code': self.codes[self.code_ids[i]],
+            'message': self.messages[self.message_ids[i]],
+        }
+    
+    def rows_for_code(self, code: str) -> List[int]:
+        code_id = self._ids['codes'].get(code)
+        return self.by_code.get(code_id, []) if code_id is not None else []
+    
+    def rows_for_file(self, file: str) -> List[int]:
+        file_id = self._ids['files'].get(file)
+        return self.by_file.get(file_id, []) if file_id is not None else []
+    
+    def files_for_code(self, code: str) -> List[Tuple[str, int]]:
+        """Файлы с наибольшим числом диагностик данного кода"""
+        counts = Counter(self.file_ids[i] for i in self.rows_for_code(code))
+        return [(self.files[file_id], count) for file_id, count in counts.most_common()]
+    
+    def codes_for_file(self, file: str) -> List[Tuple[str, int]]:
+        """Коды диагностик файла по убыванию частоты"""
+        counts = Counter(self.code_ids[i] for i in self.rows_for_file(file))
+        return [(self.codes[code_id], count) for code_id, count in counts.most_common()]
+    
+    def summary(self, top: int = 10) -> Dict:
+        """Краткая сводка для analysis_results.json"""
+        by_code = sorted(((self.codes[c], len(rows)) for c, rows in self.by_code.items()), key=lambda x: -x[1])
+        by_file = sorted(((self.files[f], len(rows)) for f, rows in self.by_file.items()), key=lambda x: -x[1])
+        return {
+            'total': len(self),
+            'codes': dict(by_code[:top]),
+            'files': dict(by_file[:top]),
+        }
+    
+    def to_dict(self) -> Dict:
+        return {
+            'version': TS_INDEX_VERSION,
+            'files': self.files,
+            'codes': self.codes,
+            'messages': self.messages,
+            'rows': {
+                'file': self.file_ids.tolist(),
+                'line': self.lines.tolist(),
+                'column': self.columns.tolist(),
+                'code': self.code_ids.tolist(),
+                'message': self.message_ids.tolist(),
+            },
+            'by_file': {str(k): v for k, v in self.by_file.items()},
+            'by_code': {str(k): v for k, v in self.by_code.items()},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TsDiagnosticIndex':
+        if data.get('version') != TS_INDEX_VERSION:
+            raise ValueError(f"Неподдерживаемая версия индекса диагностик: {data.get('version')}")
+        index = cls()
+        for table in ('files', 'codes', 'messages'):
+            setattr(index, table, list(data[table]))
+            index._ids[table] = {value: i for i, value in enumerate(data[table])}
+        rows = data['rows']
+        index.file_ids = array('I', rows['file'])
+        index.lines = array('I', rows['line'])
+        index.columns = array('I', rows['column'])
+        index.code_ids = array('I', rows['code'])
+        index.message_ids = array('I', rows['message'])
+        index.by_file = defaultdict(list, {int(k): v for k, v in data['by_file'].items()})
+        index.by_code = defaultdict(list, {int(k): v for k, v in data['by_code'].items()})
+        return index
+    
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(',', ':'))
+    
+    @classmethod
+    def load(cls, path: str) -> 'TsDiagnosticIndex':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+class TsDiagnosticsStage(AnalysisStage):
+    """Сбор диагностик tsc из ошибок лога в TsDiagnosticIndex"""
+    name = 'ts_diagnostics'
+    
+    def __init__(self):
+        self.index = TsDiagnosticIndex()
+    
+    def feed(self, rec: LogRecord) -> None:
+        if 'errors' in rec.tags:
+            self.index.add_line(rec.clean)
+    
+    def result(self) -> TsDiagnosticIndex:
+        return self.index
+    
+    def get_state(self) -> Dict:
+        return self.index.to_dict()
+    
+    def set_state(self, state: Dict) -> None:
+        self.index = TsDiagnosticIndex.from_dict(state)
+
+def ts_index_path(output_file: str) -> str:
+    """Файл индекса диагностик рядом с analysis_results.json"""
+    return os.path.splitext(output_file)[0] + '.ts_diagnostics.json'
+
+def ts_query_main(argv: List[str]) -> None:
+    """Запросы к индексу диагностик tsc: файлы по коду ошибки, коды по файлу"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py ts-query', description='Запросы к индексу диагностик TypeScript')
+    parser.add_argument('index', nargs='?', default=ts_index_path(DEFAULT_OUTPUT_PATH), help='файл *.ts_diagnostics.json')
+    parser.add_argument('--code', help='код ошибки, например TS2322: файлы с наибольшим числом таких ошибок')
+    parser.add_argument('--file', help='путь к файлу: коды ошибок в нём')
+    parser.add_argument('--rows', action='store_true', help='вывести сами диагностики, а не счётчики')
+    parser.add_argument('--top', type=int, default=20, help='сколько строк вывести')
+    args = parser.parse_args(argv)
+    
+    index = TsDiagnosticIndex.load(args.index)
+    if args.rows:
+        rows = index.rows_for_code(args.code) if args.code else index.rows_for_file(args.file) if args.file else range(len(index))
+        if args.code and args.file:
+            rows = [i for i in rows if index.files[index.file_ids[i]] == args.file]
+        for i in list(rows)[:args.top]:
+            row = index.row(i)
+            print(f"{row['file']}({row['line']},{row['column']}): {row['code']}: {row['message']}")
+    elif args.code:
+        for file, count in index.files_for_code(args.code)[:args.top]:
+            print(f"{count:6d}  {file}")
+    elif args.file:
+        for code, count in index.codes_for_file(args.file)[:args.top]:
+            print(f"{count:6d}  {code}")
+    else:
+        summary = index.summary(args.top)
+        print(f"Диагностик: {summary['total']}")
+        for code, count in summary['codes'].items():
+            print(f"{count:6d}  {code}")
+
+class TimelineStage(AnalysisStage):
+    """Анализ временной шкалы и ключевых событий"""
+    name = 'timeline'
+    
+    def __init__(self, limit: int = None):
+        self.limit = limit
+        self.total = 0
+        self.key_events = []
+    
+    def feed(self, rec: LogRecord) -> None:
+        event_type = rec.tags.get('timeline')
+        if event_type is not None:
+            self.total += 1
+            if self.limit is None or len(self.key_events) < self.limit:
+                self.key_events.append({
+                    'timestamp': rec.timestamp,
                     'type': event_type,
-                    'content': content[:200]
+                    'content': rec.content[:200]
                 })
-                break
     
-    return key_events
+    def result(self) -> List[Dict]:
+        return self.key_events
+    
+    def get_state(self) -> Dict:
+        return {'total': self.total, 'key_events': self.key_events}
+    
+    def set_state(self, state: Dict) -> None:
+        self.total = state['total']
+        self.key_events = state['key_events']
 
-def find_time_gaps(data: List[Dict], threshold_seconds: int = 30) -> List[Dict]:
+class TimeGapsStage(AnalysisStage):
     """Поиск аномально длинных пауз между событиями"""
-    gaps = []
+    name = 'time_gaps'
     
-    for i in range(1, len(data)):
-        prev_time = parse_timestamp(data[i-1]['timestamp'])
-        curr_time = parse_timestamp(data[i]['timestamp'])
-        gap = (curr_time - prev_time).total_seconds()
-        
-        if gap > threshold_seconds:
-            gaps.append({
-                'gap_seconds': gap,
-                'before': {
-                    'timestamp': data[i-1]['timestamp'],
-                    'content': data[i-1]['content'][:150]
-                },
-                'after': {
-                    'timestamp': data[i]['timestamp'],
-                    'content': data[i]['content'][:150]
-                }
-            })
+    def __init__(self, threshold_seconds: float = 30):
+        self.threshold_ns = round(threshold_seconds * NS_PER_SECOND)
+        self.gaps = []
+        self.prev = None
     
-    return sorted(gaps, key=lambda x: x['gap_seconds'], reverse=True)
-
-def aggregate_duplicates(problems: List[Tuple[Dict, str]], sample_length: int = 100) -> List[Dict]:
-    """Агрегация дубликатов ошибок"""
-    error_groups = defaultdict(list)
+    def feed(self, rec: LogRecord) -> None:
+        prev = self.prev
+        if prev is not None:
+            gap = rec.ts_ns - prev.ts_ns
+            
+            if gap > self.threshold_ns:
+                self.gaps.append({
+                    'gap_seconds': gap / NS_PER_SECOND,
+                    'before': {
+                        'timestamp': prev.timestamp,
+                        'content': prev.content[:150]
+                    },
+                    'after': {
+                        'timestamp': rec.timestamp,
+                        'content': rec.content[:150]
+                    }
+                })
+        self.prev = rec
     
-    for record, keyword in problems:
-        content = record['content']
-        # Очистка от ANSI кодов
-        clean_content = re.sub(r'\x1b\[[0-9;]*m', '', content)
-        # Группировка по первым N символам
-        key = clean_content[:sample_length].strip()
-        error_groups[key].append({
-            'timestamp': record['timestamp'],
-            'full_content': clean_content,
-            'keyword': keyword
-        })
+    def result(self) -> List[Dict]:
+        return sorted(self.gaps, key=lambda x: x['gap_seconds'], reverse=True)
     
-    # Сортировка по частоте
-    aggregated = []
-    for key, occurrences in error_groups.items():
-        aggregated.append({
-            'sample': key,
-            'count': len(occurrences),
-            'first_occurrence': occurrences[0]['timestamp'],
-            'last_occurrence': occurrences[-1]['timestamp'],
-            'example': occurrences[0]['full_content'][:300]
-        })
+    def get_state(self) -> Dict:
+        prev = self.prev
+        return {
+            'gaps': self.gaps,
+            'prev': None if prev is None else {
+                'timestamp': prev.timestamp, 'content': prev.content[:150], 'ts_ns': prev.ts_ns}
+        }
     
-    return sorted(aggregated, key=lambda x: x['count'], reverse=True)
+    def set_state(self, state: Dict) -> None:
+        self.gaps = state['gaps']
+        prev = state['prev']
+        self.prev = None
+        if prev is not None:
+            self.prev = LogRecord({'timestamp': prev['timestamp'], 'stream': '', 'content': prev['content']})
+            self.prev._ts_ns = prev['ts_ns']
 
-def main(silent=False):
-    if silent:
-        import sys
-        import os
-        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
-    print("="*80)
-    print("АНАЛИЗ ЛОГОВ DOCKER BUILD")
-    print("="*80)
+class GapDistributionStage(AnalysisStage):
+    """Распределение всех пауз между записями по набору порогов"""
+    name = 'gap_distribution'
     
-    # Загрузка данных
-    filepath = r'c:\Users\Notebook\StickerArtWeb-1\docs\front.log'
-    print(f"\nЗагрузка файла: {filepath}")
-    data = load_logs(filepath)
-    print(f"[OK] Загружено {len(data)} записей")
+    def __init__(self, thresholds: Iterable[float] = GAP_THRESHOLDS):
+        self.distribution = GapDistribution(thresholds)
+        self.prev_ns = None
     
-    # 1. БАЗОВАЯ СТАТИСТИКА
-    print("\n" + "="*80)
-    print("1. БАЗОВАЯ СТАТИСТИКА")
-    print("="*80)
-    stats = analyze_basic_stats(data)
-    print(f"\nОбщее количество записей: {stats['total_records']}")
-    print(f"Временной диапазон:")
-    print(f"  Начало: {stats['first_timestamp']}")
-    print(f"  Конец:  {stats['last_timestamp']}")
-    print(f"  Длительность: {stats['duration_minutes']:.2f} минут ({stats['duration_seconds']:.0f} секунд)")
-    print(f"\nРаспределение по потокам:")
-    for stream, count in stats['streams'].items():
-        print(f"  {stream}: {count} записей ({count/stats['total_records']*100:.1f}%)")
-    print(f"\nТоп-10 самых длинных сообщений (символов): {stats['content_lengths'][:5]}")
+    def feed(self, rec: LogRecord) -> None:
+        ts_ns = rec.ts_ns
+        if self.prev_ns is not None:
+            self.distribution.add(ts_ns - self.prev_ns)
+        self.prev_ns = ts_ns
     
-    # 2. КАТЕГОРИЗАЦИЯ
-    print("\n" + "="*80)
-    print("2. КАТЕГОРИЗАЦИЯ ПО УРОВНЯМ")
-    print("="*80)
-    categories = categorize_by_level(data)
-    print("\nРаспределение по категориям:")
-    for cat, records in sorted(categories.items(), key=lambda x: len(x[1]), reverse=True):
-        print(f"  {cat}: {len(records)} записей ({len(records)/len(data)*100:.1f}%)")
+    def result(self) -> Dict:
+        return self.distribution.result()
     
-    # 3. ПОИСК ПРОБЛЕМ
-    print("\n" + "="*80)
-    print("3. ПОИСК ПРОБЛЕМНЫХ ПАТТЕРНОВ")
-    print("="*80)
-    problems = find_problems(data)
-    
-    print(f"\n[ERRORS] Ошибки (ERROR/FATAL/EXCEPTION): {len(problems['errors'])}")
-    if problems['errors']:
-        print("\nПримеры первых 5 ошибок:")
-        for i, (record, keyword) in enumerate(problems['errors'][:5], 1):
-            content = re.sub(r'\x1b\[[0-9;]*m', '', record['content'])
-            print(f"\n  {i}. [{record['timestamp']}] Тип: {keyword}")
-            print(f"     {content[:200]}")
-    
-    print(f"\n[WARN] Предупреждения (WARN): {len(problems['warnings'])}")
-    if problems['warnings']:
-        print("\nПримеры первых 3 предупреждений:")
-        for i, (record, keyword) in enumerate(problems['warnings'][:3], 1):
-            content = re.sub(r'\x1b\[[0-9;]*m', '', record['content'])
-            print(f"\n  {i}. [{record['timestamp']}]")
-            print(f"     {content[:200]}")
-    
-    print(f"\n[NPM] NPM ошибки: {len(problems['npm_errors'])}")
-    print(f"[DEPRECATED] Deprecated зависимости: {len(problems['deprecated'])}")
-    print(f"[FILE] Файловые ошибки (ENOENT/EACCES): {len(problems['file_errors'])}")
-    print(f"[TIMEOUT] Таймауты: {len(problems['timeouts'])}")
+    def get_state(self) -> Dict:
+        d = self.distribution
+        return {'counts': d.counts, 'totals': d.totals, 'gaps': d.gaps, 'max_gap': d.max_gap,
+                'prev_ns': self.prev_ns}
     
-    # 4. ВРЕМЕННОЙ АНАЛИЗ
-    print("\n" + "="*80)
-    print("4. ВРЕМЕННОЙ АНАЛИЗ")
-    print("="*80)
+    def set_state(self, state: Dict) -> None:
+        d = self.distribution
+        d.counts = list(state['counts'])
+        d.totals = list(state['totals'])
+        d.gaps = state['gaps']
+        d.max_gap = state['max_gap']
+        self.prev_ns = state['prev_ns']
+
+# ============================================================================
+# ПОТОКОВЫЙ ДЕТЕКТОР ЗАВИСАНИЙ И ЛАВИН ВЫВОДА
+# ============================================================================
+#
+# Фиксированный порог (30 сек) не видит, где сборка простаивает короткими
+# паузами. Детектор сравнивает каждую паузу между записями и темп записей в
+# секунду с экспоненциально сглаженным (EWMA) средним и разбросом: пауза
+# заметно длиннее обычной — зависание (npm ждёт реестр), секунда с темпом
+# заметно выше обычного — лавина вывода. Память O(1): базовые линии, кольцевой
+# буфер строк контекста и ограниченная куча самых сильных аномалий.
+
+ANOMALY_ALPHA = 0.05          # вес новой точки в EWMA
+ANOMALY_SIGMAS = 4.0          # насколько выше базовой линии (в стандартных отклонениях)
+ANOMALY_WARMUP = 50           # точек до начала детектирования
+MIN_STALL_SECONDS = 2.0       # короче — не зависание, как бы ни было тихо до этого
+MIN_FLOOD_RATE = 100          # записей/сек: ниже — не лавина
+ANOMALY_CONTEXT = 3           # строк контекста до и после
+ANOMALY_TOP = 20              # сколько самых сильных аномалий хранить
+_GAP_LOG_OFFSET = 0.001       # паузы сглаживаются в логарифмической шкале
+
+class EwmaBaseline:
+    """Экспоненциально сглаженные среднее и дисперсия"""
+    __slots__ = ('alpha', 'mean', 'var', 'n')
     
-    timeline = analyze_timeline(data)
-    print(f"\nКлючевые события: {len(timeline)}")
-    print("\nПервые 15 ключевых событий:")
-    for i, event in enumerate(timeline[:15], 1):
-        print(f"{i:2d}. [{event['timestamp']}] {event['type']}")
-        print(f"    {event['content'][:150]}")
-    
-    gaps = find_time_gaps(data, threshold_seconds=30)
-    print(f"\n\nАномально длинные паузы (>30 сек): {len(gaps)}")
-    if gaps:
-        print("\nТоп-5 самых длинных пауз:")
-        for i, gap in enumerate(gaps[:5], 1):
-            print(f"\n{i}. Пауза: {gap['gap_seconds']:.1f} секунд")
-            print(f"   До:    [{gap['before']['timestamp']}] {gap['before']['content'][:100]}")
-            print(f"   После: [{gap['after']['timestamp']}] {gap['after']['content'][:100]}")
+    def __init__(self, alpha: float = ANOMALY_ALPHA):
+        self.alpha = alpha
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
     
-    # 5. АГРЕГАЦИЯ ДУБЛИКАТОВ
-    print("\n" + "="*80)
-    print("5. АГРЕГАЦИЯ ДУБЛИКАТОВ")
-    print("="*80)
+    def update(self, x: float) -> None:
+        if self.n == 0:
+            self.mean = x
+        else:
+            diff = x - self.mean
+            incr = self.alpha * diff
+            self.mean += incr
+            self.var = (1 - self.alpha) * (self.var + diff * incr)
+        self.n += 1
     
-    error_aggregated = []
-    deprecated_aggregated = []
-    if problems['errors']:
-        error_aggregated = aggregate_duplicates(problems['errors'])
-        print(f"\nУникальных типов ошибок: {len(error_aggregated)}")
-        print("\nТоп-10 самых частых ошибок:")
-        for i, err in enumerate(error_aggregated[:10], 1):
-            print(f"\n{i}. Встречается: {err['count']} раз")
-            print(f"   Первое: {err['first_occurrence']}")
-            print(f"   Последнее: {err['last_occurrence']}")
-            print(f"   Пример: {err['sample'][:120]}")
+    def upper(self, sigmas: float) -> float:
+        return self.mean + sigmas * math.sqrt(self.var)
     
-    if problems['deprecated']:
-        deprecated_aggregated = aggregate_duplicates(problems['deprecated'])
-        print(f"\n\nУстаревшие зависимости: {len(deprecated_aggregated)} уникальных")
-        print("\nТоп-5 deprecated предупреждений:")
-        for i, dep in enumerate(deprecated_aggregated[:5], 1):
-            print(f"\n{i}. Встречается: {dep['count']} раз")
-            print(f"   {dep['sample'][:150]}")
+    def to_list(self) -> List[float]:
+        return [self.mean, self.var, self.n]
     
-    # Сохранение результатов для этапа 2
-    print("\n" + "="*80)
-    print("СОХРАНЕНИЕ РЕЗУЛЬТАТОВ")
-    print("="*80)
+    def from_list(self, state: List[float]) -> None:
+        self.mean, self.var, self.n = state
+
+class AnomalyStage(AnalysisStage):
+    """Зависания (паузы выше базовой линии) и лавины вывода (темп выше базовой линии)"""
+    name = 'anomalies'
     
-    results = {
-        'stats': stats,
-        'categories': {k: len(v) for k, v in categories.items()},
-        'problems': {
-            'errors_count': len(problems['errors']),
-            'errors_examples': [(r['timestamp'], re.sub(r'\x1b\[[0-9;]*m', '', r['content'])[:300], kw) 
-                                for r, kw in problems['errors'][:20]],
-            'warnings_count': len(problems['warnings']),
-            'warnings_examples': [(r['timestamp'], re.sub(r'\x1b\[[0-9;]*m', '', r['content'])[:300], kw) 
-                                  for r, kw in problems['warnings'][:10]],
-            'npm_errors': len(problems['npm_errors']),
-            'deprecated': len(problems['deprecated']),
-            'file_errors': len(problems['file_errors']),
-            'timeouts': len(problems['timeouts'])
-        },
-        'timeline': timeline[:30],
-        'time_gaps': gaps[:10],
-        'error_aggregated': error_aggregated[:15] if problems['errors'] else [],
-        'deprecated_aggregated': deprecated_aggregated[:10] if problems['deprecated'] else []
-    }
+    def __init__(self, alpha: float = ANOMALY_ALPHA, sigmas: float = ANOMALY_SIGMAS,
+                 warmup: int = ANOMALY_WARMUP, min_stall_seconds: float = MIN_STALL_SECONDS,
+                 min_flood_rate: int = MIN_FLOOD_RATE, context: int = ANOMALY_CONTEXT, top: int = ANOMALY_TOP):
+        self.sigmas = sigmas
+        self.warmup = warmup
+        self.min_stall_seconds = min_stall_seconds
+        self.min_flood_rate = min_flood_rate
+        self.context = context
+        self.top = top
+        self.gaps = EwmaBaseline(alpha)
+        self.rate = EwmaBaseline(alpha)
+        self.recent = deque(maxlen=context)   # последние строки: контекст «до»
+        self.pending = []                     # аномалии, ждущие строк контекста «после»
+        self.heap = []                        # (сила, номер, аномалия) — самые сильные
+        self.prev_ns = None
+        self.second = None                    # текущая секунда для подсчёта темпа
+        self.second_count = 0
+        self.second_start = None              # первая запись секунды и контекст перед ней
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.floods = 0
+        self.seq = 0
     
-    output_file = r'c:\Users\Notebook\StickerArtWeb-1\docs\analysis_results.json'
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
+    def _keep(self, score: float, anomaly: Dict) -> None:
+        self.seq += 1
+        item = (score, self.seq, anomaly)
+        if len(self.heap) < self.top:
+            heapq.heappush(self.heap, item)
+        elif score > self.heap[0][0]:
+            heapq.heapreplace(self.heap, item)
+        else:
+            return
+        if len(anomaly['context_after']) < self.context:
+            self.pending.append(anomaly)
     
-    print(f"\n[OK] Результаты сохранены в: {output_file}")
-    print("\n" + "="*80)
-    print("ПРЕДОБРАБОТКА ЗАВЕРШЕНА")
-    print("="*80)
+    def _close_second(self, next_second: int) -> None:
+        count = self.second_count
+        baseline = self.rate
+        if baseline.n >= self.warmup // 5:
+            limit = max(baseline.upper(self.sigmas), self.min_flood_rate)
+            if count > limit:
+                self.floods += 1
+                start = self.second_start
+                self._keep(count / limit, {
+                    'type': 'flood',
+                    'timestamp': start['timestamp'],
+                    'records_per_second': count,
+                    'baseline_per_second': round(baseline.mean, 3),
+                    'context_before': start['before'],
+                    'context_after': start['lines'],
+                })
+        baseline.update(count)
+        # Пустые секунды до следующей записи тоже входят в базовую линию темпа
+        for _ in range(min(next_second - self.second - 1, 60)):
+            baseline.update(0)
+    
+    def feed(self, rec: LogRecord) -> None:
+        ts_ns = rec.ts_ns
+        line = f'[{rec.timestamp}] {rec.clean[:150]}'
+        
+        if self.pending:
+            for anomaly in self.pending:
+                anomaly['context_after'].append(line)
+            self.pending = [a for a in self.pending if len(a['context_after']) < self.context]
+        
+        second = ts_ns // NS_PER_SECOND
+        if second != self.second:
+            if self.second is not None:
+                self._close_second(second)
+            self.second = second
+            self.second_count = 0
+            self.second_start = {'timestamp': rec.timestamp, 'before': list(self.recent), 'lines': []}
+        self.second_count += 1
+        if len(self.second_start['lines']) < self.context:
+            self.second_start['lines'].append(line)
+        
+        if self.prev_ns is not None:
+            gap = max(ts_ns - self.prev_ns, 0) / NS_PER_SECOND
+            x = math.log(gap + _GAP_LOG_OFFSET)
+            baseline = self.gaps
+            if baseline.n >= self.warmup and gap >= self.min_stall_seconds:
+                limit = max(math.exp(baseline.upper(self.sigmas)) - _GAP_LOG_OFFSET, self.min_stall_seconds)
+                if gap > limit:
+                    self.stalls += 1
+                    self.stall_seconds += gap
+                    self._keep(gap / limit, {
+                        'type': 'stall',
+                        'timestamp': rec.timestamp,
+                        'gap_seconds': gap,
+                        'baseline_seconds': round(math.exp(baseline.mean) - _GAP_LOG_OFFSET, 6),
+                        'context_before': list(self.recent),
+                        'context_after': [line],
+                    })
+            baseline.update(x)
+        self.prev_ns = ts_ns
+        self.recent.append(line)
+    
+    def result(self) -> Dict:
+        top = sorted(self.heap, key=lambda item: (-item[0], item[1]))
+        return {
+            'stalls': self.stalls,
+            'stall_seconds': self.stall_seconds,
+            'floods': self.floods,
+            'top': [dict(anomaly, score=round(score, 3)) for score, _, anomaly in top],
+        }
+    
+    def get_state(self) -> Dict:
+        return {
+            'gaps': self.gaps.to_list(), 'rate': self.rate.to_list(), 'recent': list(self.recent),
+            'heap': [list(item) for item in self.heap], 'prev_ns': self.prev_ns,
+            'second': self.second, 'second_count': self.second_count, 'second_start': self.second_start,
+            'stalls': self.stalls, 'stall_seconds': self.stall_seconds, 'floods': self.floods, 'seq': self.seq,
+        }
+    
+    def set_state(self, state: Dict) -> None:
+        self.gaps.from_list(state['gaps'])
+        self.rate.from_list(state['rate'])
+        self.recent = deque(state['recent'], maxlen=self.context)
+        self.heap = [tuple(item) for item in state['heap']]
+        # Ждущие контекста — те же объекты, что и в куче
+        self.pending = [item[2] for item in self.heap if len(item[2]['context_after']) < self.context]
+        self.prev_ns = state['prev_ns']
+        self.second = state['second']
+        self.second_count = state['second_count']
+        self.second_start = state['second_start']
+        self.stalls = state['stalls']
+        self.stall_seconds = state['stall_seconds']
+        self.floods = state['floods']
+        self.seq = state['seq']
+
+def analyze_basic_stats(data: Iterable[Dict]) -> Dict:
+    """Базовая статистика по логам (один проход, без хранения записей)"""
+    return BasicStatsStage().run(data)
+
+def categorize_by_level(data: Iterable[Dict]) -> Dict[str, List[Dict]]:
+    """Категоризация по уровням логирования"""
+    return CategoryStage().run(data)
+
+def find_problems(data: Iterable[Dict]) -> Dict[str, List[Tuple[Dict, str]]]:
+    """Поиск проблемных паттернов"""
+    return ProblemsStage().run(data)
+
+def analyze_timeline(data: Iterable[Dict]) -> List[Dict]:
+    """Анализ временной шкалы и ключевых событий"""
+    return TimelineStage().run(data)
+
+def find_time_gaps(data: Iterable[Dict], threshold_seconds: float = 30) -> List[Dict]:
+    """Поиск аномально длинных пауз между событиями"""
+    return TimeGapsStage(threshold_seconds).run(data)
+
+def gap_distribution(data: Iterable[Dict], thresholds: Iterable[float] = GAP_THRESHOLDS) -> Dict:
+    """Распределение пауз сразу по нескольким порогам: колонка timestamp -> разности -> пороги"""
+    distribution = GapDistribution(thresholds)
+    distribution.add_column(gap_column(timestamp_column(record['timestamp'] for record in data)))
+    return distribution.result()
+
+# ============================================================================
+# ФАЗЫ СБОРКИ
+# ============================================================================
+
+# Маркеры начала фаз: (дорожка, фаза, шаблон)
+# Шаги сборки идут друг за другом; стадии kaniko — отдельная дорожка поверх шагов
+BUILD_PHASE_MARKERS = [
+    ('step', 'clone', r"Cloning into"),
+    ('step', 'base_image', r"Resolved base name|Retrieving image"),
+    ('step', 'install', r"RUN npm (?:ci|install)"),
+    ('step', 'tsc', r"npx tsc|STARTING BUILD"),
+    ('step', 'vite', r"vite v[\d.]+ building"),
+    ('step', 'push', r"[Pp]ushing image"),
+    ('stage', 'stage', r"Building stage '(?P<stage_name>[^']*)'"),
+]
+
+# Конец сборки закрывает все открытые фазы
+BUILD_END_RE = re.compile(r"Container builder has completed|watcher application completed|error building image")
+
+_PHASE_RE = re.compile('|'.join(f'(?P<m{i}>{pattern})' for i, (_, _, pattern) in enumerate(BUILD_PHASE_MARKERS)))
+
+class BuildPhasesStage(AnalysisStage):
+    """
+    Длительность фаз сборки (clone, npm install, tsc, vite build, стадии kaniko, push)
+    Фаза длится от своего маркера до маркера следующей фазы той же дорожки или конца сборки;
+    внутри фазы запоминаются самые длинные паузы без вывода
+    """
+    name = 'phases'
+    
+    def __init__(self, silences: int = 3):
+        self.silences = silences
+        self.finished = []
+        self.open = {}
+        self.last = None
+    
+    def _start(self, track: str, phase: str, rec: LogRecord) -> None:
+        current = self.open.get(track)
+        if current is not None and current['phase'] == phase:
+            return
+        self._close(track, rec.ts_ns, rec.timestamp)
+        self.open[track] = {
+            'phase': phase,
+            'start': rec.timestamp,
+            'start_ns': rec.ts_ns,
+            'records': 0,
+            'prev': None,
+            'silences': [],
+        }
+    
+    def _close(self, track: str, end_ns: int, end: str) -> None:
+        current = self.open.pop(track, None)
+        if current is None:
+            return
+        silences = sorted(current['silences'], reverse=True)
+        self.finished.append({
+            'phase': current['phase'],
+            'start': current['start'],
+            'end': end,
+            'duration_seconds': (end_ns - current['start_ns']) / NS_PER_SECOND,
+            'records': current['records'],
+            'silences': [
+                {'seconds': gap / NS_PER_SECOND, 'before': before, 'after': after}
+                for gap, _, before, after in silences
+            ],
+        })
+    
+    def feed(self, rec: LogRecord) -> None:
+        content = rec.content
+        m = _PHASE_RE.search(content)
+        if m is not None:
+            track, phase, _ = BUILD_PHASE_MARKERS[int(m.lastgroup[1:])]
+            if track == 'stage':
+                phase = f"stage:{m.group('stage_name')}"
+            elif phase == 'push':
+                self._close('stage', rec.ts_ns, rec.timestamp)
+            self._start(track, phase, rec)
+        
+        ts_ns = rec.ts_ns
+        for current in self.open.values():
+            prev = current['prev']
+            if prev is not None:
+                heap = current['silences']
+                item = [ts_ns - prev['ts_ns'], current['records'],
+                        {'timestamp': prev['timestamp'], 'content': prev['content']},
+                        {'timestamp': rec.timestamp, 'content': content[:150]}]
+                if len(heap) < self.silences:
+                    heapq.heappush(heap, item)
+                elif item[0] > heap[0][0]:
+                    heapq.heapreplace(heap, item)
+            current['prev'] = {'ts_ns': ts_ns, 'timestamp': rec.timestamp, 'content': content[:150]}
+            current['records'] += 1
+        self.last = {'ts_ns': ts_ns, 'timestamp': rec.timestamp}
+        
+        if m is None and BUILD_END_RE.search(content):
+            for track in list(self.open):
+                self._close(track, ts_ns, rec.timestamp)
+    
+    def result(self) -> Dict:
+        phases = list(self.finished)
+        if self.open and self.last is not None:
+            # Незавершённые фазы считаются до последней записи, состояние этапа не меняется
+            pending = BuildPhasesStage(self.silences)
+            pending.open = {track: dict(current) for track, current in self.open.items()}
+            for track in list(pending.open):
+                pending._close(track, self.last['ts_ns'], self.last['timestamp'])
+            phases.extend(pending.finished)
+        phases.sort(key=lambda p: p['start'])
+        
+        summary = {}
+        for p in phases:
+            s = summary.setdefault(p['phase'], {
+                'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'longest_silence_seconds': 0.0})
+            s['count'] += 1
+            s['total_seconds'] += p['duration_seconds']
+            s['max_seconds'] = max(s['max_seconds'], p['duration_seconds'])
+            if p['silences']:
+                s['longest_silence_seconds'] = max(s['longest_silence_seconds'], p['silences'][0]['seconds'])
+        summary = dict(sorted(summary.items(), key=lambda x: (-x[1]['total_seconds'], x[0])))
+        return {'summary': summary, 'phases': phases}
+    
+    def get_state(self) -> Dict:
+        return {'finished': self.finished, 'open': self.open, 'last': self.last}
+    
+    def set_state(self, state: Dict) -> None:
+        self.finished = state['finished']
+        self.open = state['open']
+        self.last = state['last']
+
+def profile_phases(data: Iterable[Dict]) -> Dict:
+    """Длительности фаз сборки и самые длинные паузы внутри них"""
+    return run_pipeline(data, [BuildPhasesStage()])['phases']
+
+# ============================================================================
+# КОЛОНОЧНОЕ ХРАНИЛИЩЕ ЛОГА
+# ============================================================================
+#
+# Вместо списка словарей (~0.5 КБ накладных расходов на запись) лог хранится
+# колонками: timestamp — int64 наносекунд, поток — однобайтовый код,
+# текст timestamp и content — в общих UTF-8 буферах с массивами смещений.
+# Одинаковые content хранятся один раз: запись держит номер уникальной строки,
+# и категории/теги считаются по уникальным строкам, а не по каждой записи.
+# Уникальные строки ищутся по 8-байтовому хешу, а не по ключу-str: иначе каждая
+# строка хранилась бы дважды (в буфере и объектом str). Совпадение хеша
+# проверяется сравнением байт в буфере; строки с чужим хешем — в отдельном словаре.
+# Категории и проблемы — массивы индексов записей. LogStore ведёт себя как
+# последовательность словарей, поэтому все функции анализа работают и с ним.
+
+def _content_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=8).digest()
+
+class LogStore:
+    """Компактное колоночное представление загруженного лога"""
+    
+    def __init__(self):
+        self.timestamps = array('q')          # наносекунды от эпохи
+        self.stream_codes = array('B')        # индекс в stream_names
+        self.stream_names: List[str] = []
+        self._stream_index: Dict[str, int] = {}
+        self._ts_text = bytearray()           # исходные строки timestamp
+        self._ts_offsets = array('q', [0])
+        self.content_ids = array('I')         # номер уникальной строки content
+        self._content_index: Dict[bytes, int] = {}       # хеш content -> номер уникальной строки
+        self._content_collisions: Dict[bytes, int] = {}  # content с уже занятым хешем -> номер
+        self._content = bytearray()           # уникальные content подряд
+        self._content_offsets = array('q', [0])
+    
+    @classmethod
+    def from_records(cls, data: Iterable[Dict]) -> 'LogStore':
+        """Потоковое построение хранилища из записей"""
+        store = cls()
+        for record in data:
+            store.append(record)
+        return store
+    
+    def append(self, record: Dict) -> None:
+        timestamp = record['timestamp']
+        stream = record['stream']
+        code = self._stream_index.get(stream)
+        if code is None:
+            code = self._stream_index[stream] = len(self.stream_names)
+            self.stream_names.append(stream)
+        
+        self.timestamps.append(parse_timestamp_ns(timestamp))
+        self.stream_codes.append(code)
+        self._ts_text += timestamp.encode('ascii')
+        self._ts_offsets.append(len(self._ts_text))
+        data = record['content'].encode('utf-8')
+        digest = _content_digest(data)
+        content_id = self._content_index.get(digest)
+        if content_id is not None and not self._same_content(content_id, data):
+            content_id = self._content_collisions.get(data)
+        if content_id is None:
+            content_id = len(self._content_offsets) - 1
+            if digest in self._content_index:
+                self._content_collisions[data] = content_id
+            else:
+                self._content_index[digest] = content_id
+            self._content += data
+            self._content_offsets.append(len(self._content))
+        self.content_ids.append(content_id)
+    
+    def _same_content(self, content_id: int, data: bytes) -> bool:
+        """Уникальная строка content_id совпадает с data (без копирования буфера)"""
+        start = self._content_offsets[content_id]
+        return (self._content_offsets[content_id + 1] - start == len(data)
+                and self._content.startswith(data, start))
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def timestamp_text(self, i: int) -> str:
+        return self._ts_text[self._ts_offsets[i]:self._ts_offsets[i + 1]].decode('ascii')
+    
+    def stream(self, i: int) -> str:
+        return self.stream_names[self.stream_codes[i]]
+    
+    def content(self, i: int) -> str:
+        return self.unique_content(self.content_ids[i])
+    
+    def unique_content(self, content_id: int) -> str:
+        return self._content[self._content_offsets[content_id]:self._content_offsets[content_id + 1]].decode('utf-8')
+    
+    def unique_contents(self) -> Iterator[str]:
+        """Уникальные строки content в порядке первого появления"""
+        data = self._content
+        offsets = self._content_offsets
+        for i in range(len(offsets) - 1):
+            yield data[offsets[i]:offsets[i + 1]].decode('utf-8')
+    
+    def __getitem__(self, i: int) -> Dict:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('LogStore index out of range')
+        return {'timestamp': self.timestamp_text(i), 'stream': self.stream(i), 'content': self.content(i)}
+    
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+    
+    def contents(self) -> Iterator[str]:
+        """Только content записей, без сборки словарей"""
+        unique = list(self.unique_contents())
+        return map(unique.__getitem__, self.content_ids)
+    
+    def categorize(self) -> Dict[str, array]:
+        """Категории по уровням логирования: категория -> массив индексов записей"""
+        # Категория считается один раз на уникальную строку
+        levels = [classify_level(content, keyword_matcher.scan(content)) for content in self.unique_contents()]
+        index = defaultdict(lambda: array('I'))
+        for i, level in enumerate(map(levels.__getitem__, self.content_ids)):
+            index[level].append(i)
+        return dict(index)
+    
+    def find_problems(self) -> Dict[str, Tuple[array, List[str]]]:
+        """Проблемные записи: группа -> (массив индексов, метки найденных ключевых слов)"""
+        index = {group: (array('I'), []) for group in PROBLEM_GROUPS}
+        unique_tags = [keyword_matcher.scan(content) for content in self.unique_contents()]
+        for i, tags in enumerate(map(unique_tags.__getitem__, self.content_ids)):
+            if not tags:
+                continue
+            for group, (indices, labels) in index.items():
+                label = tags.get(group)
+                if label is not None:
+                    indices.append(i)
+                    labels.append(label)
+        return index
+    
+    def time_gaps(self, threshold_seconds: float = 30) -> List[Dict]:
+        """Паузы длиннее порога — разность по колонке timestamp вместо цикла по записям"""
+        gaps = gap_column(self.timestamps)
+        result = []
+        for i in gap_indices(gaps, threshold_seconds):
+            result.append({
+                'gap_seconds': gaps[i] / NS_PER_SECOND,
+                'before': {'timestamp': self.timestamp_text(i), 'content': self.content(i)[:150]},
+                'after': {'timestamp': self.timestamp_text(i + 1), 'content': self.content(i + 1)[:150]}
+            })
+        return sorted(result, key=lambda x: x['gap_seconds'], reverse=True)
+    
+    def gap_distribution(self, thresholds: Iterable[float] = GAP_THRESHOLDS) -> Dict:
+        """Распределение пауз по порогам на колонке timestamp"""
+        distribution = GapDistribution(thresholds)
+        distribution.add_column(gap_column(self.timestamps))
+        return distribution.result()
+    
+    def nbytes(self) -> int:
+        """Объём буферов хранилища в байтах"""
+        columns = (self.timestamps, self.stream_codes, self.content_ids, self._ts_offsets, self._content_offsets)
+        return sum(col.itemsize * len(col) for col in columns) + len(self._ts_text) + len(self._content)
+
+def load_log_store(filepath: str) -> LogStore:
+    """Загрузка лога в колоночное хранилище (потоковым чтением)"""
+    return LogStore.from_records(iter_records(filepath))
+
+def aggregate_duplicates(problems: List[Tuple[Dict, str]], sample_length: int = 100) -> List[Dict]:
+    """Агрегация дубликатов ошибок"""
+    stage = DuplicatesStage(sample_length=sample_length)
+    for record, keyword in problems:
+        stage.add(record['timestamp'], ANSI_RE.sub('', record['content']))
+    return stage.result()
+
+# ============================================================================
+# БЫСТРАЯ ПРОВЕРКА НА ПРОБЛЕМЫ ПО БАЙТАМ (MMAP)
+# ============================================================================
+#
+# Вопрос «есть ли в логе npm ERR! / ENOENT / ETIMEDOUT» не требует разбора
+# всех записей. Файл отображается в память, и по сырым байтам ищутся опорные
+# подстроки ключевых слов; JSON разбирается только вокруг найденных мест, а
+# каждая найденная запись проверяется KeywordMatcher, так что ложных
+# срабатываний нет. На чистом логе это несколько проходов поиска подстроки
+# (bytes.find) по файлу вместо разбора каждой записи.
+#
+# Как и в KeywordMatcher, регистр не важен ('Request TIMEOUT', 'eacces'): блок
+# файла приводится к нижнему регистру (bytes.lower меняет только ASCII, байт в
+# байт, так что смещения совпадают), и в нём ищутся опоры в нижнем регистре.
+# Регулярное выражение без учёта регистра здесь в разы медленнее: первые буквы
+# опор ('e', 'i') встречаются почти в каждой строке.
+
+# Опорные подстроки по группам проблем (в нижнем регистре)
+PREFILTER_ANCHORS = {
+    'npm_errors': [b' err!'],
+    'file_errors': [b'enoent', b'eacces', b'eperm'],
+    'timeouts': [b'etimedout', b'imeout'],
+}
+PREFILTER_GROUPS = tuple(PREFILTER_ANCHORS)
+# Блок, приводимый к нижнему регистру за раз (копия блока — вся дополнительная память)
+PREFILTER_CHUNK = 4 * 1024 * 1024
+# Насколько далеко от найденного места искать начало записи
+PREFILTER_MAX_RECORD = 1 << 20
+
+def _anchor_positions(lowered: bytes, anchors: Iterable[bytes], end: int) -> Iterator[int]:
+    """Смещения всех вхождений опор в блоке, начинающихся раньше end"""
+    for anchor in anchors:
+        pos = lowered.find(anchor, 0, end + len(anchor) - 1)
+        while pos >= 0:
+            yield pos
+            pos = lowered.find(anchor, pos + 1, end + len(anchor) - 1)
+
+def _record_around(data, pos: int) -> Tuple[Dict, int]:
+    """Запись JSON, содержащая байт pos: (запись, байтовое смещение её конца) или (None, pos + 1)"""
+    lower = max(0, pos - PREFILTER_MAX_RECORD)
+    start = pos + 1
+    while True:
+        start = data.rfind(b'{', lower, start)
+        if start < 0:
+            return None, pos + 1
+        window = 4096
+        while True:
+            chunk = data[start:start + window]
+            text = chunk.decode('utf-8', errors='replace')
+            try:
+                record, end = _json_decoder.raw_decode(text)
+            except ValueError:
+                if start + window < len(data) and window < PREFILTER_MAX_RECORD:
+                    window *= 4
+                    continue
+                break
+            end_byte = start + len(text[:end].encode('utf-8'))
+            if isinstance(record, dict) and 'content' in record and end_byte > pos:
+                return record, end_byte
+            break
+
+def scan_problems(filepath: str, groups: Iterable[str] = PREFILTER_GROUPS, first_only: bool = False,
+                  examples: int = 5) -> Dict:
+    """
+    Быстрая проверка лога на проблемы заданных групп
+    first_only — остановиться на первой найденной проблеме (ответ да/нет)
+    """
+    groups = tuple(groups)
+    counts = {group: 0 for group in groups}
+    found = {group: [] for group in groups}
+    summary = {'bytes': os.path.getsize(filepath), 'candidates': 0, 'records_parsed': 0,
+               'counts': counts, 'examples': found}
+    
+    def check(record: Dict) -> bool:
+        summary['records_parsed'] += 1
+        tags = keyword_matcher.scan(record['content'])
+        hit = False
+        for group in groups:
+            if group in tags:
+                hit = True
+                counts[group] += 1
+                if len(found[group]) < examples:
+                    found[group].append({'timestamp': record.get('timestamp'),
+                                         'content': ANSI_RE.sub('', record['content'])[:200]})
+        return hit
+    
+    if summary['bytes'] == 0 or detect_compression(filepath) is not None:
+        # Сжатый архив нельзя отобразить в память: обычный потоковый разбор
+        for record in iter_records(filepath):
+            if check(record) and first_only:
+                break
+    else:
+        anchors = sorted({anchor for group in groups for anchor in PREFILTER_ANCHORS[group]})
+        overlap = max(len(anchor) for anchor in anchors) - 1
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            size = len(data)
+            covered = 0
+            for chunk_start in range(0, size, PREFILTER_CHUNK):
+                chunk_end = min(size, chunk_start + PREFILTER_CHUNK)
+                lowered = data[chunk_start:min(size, chunk_end + overlap)].lower()
+                positions = sorted(chunk_start + pos
+                                   for pos in _anchor_positions(lowered, anchors, chunk_end - chunk_start))
+                summary['candidates'] += len(positions)
+                hit = False
+                for pos in positions:
+                    if pos < covered:
+                        continue
+                    record, covered = _record_around(data, pos)
+                    if record is not None and check(record) and first_only:
+                        hit = True
+                        break
+                if hit:
+                    break
+    
+    summary['has_problems'] = any(counts.values())
+    return summary
+
+def scan_main(argv: List[str]) -> None:
+    """Быстрая проверка лога на проблемы; код выхода 1, если проблемы найдены"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py scan', description='Быстрая проверка лога на проблемы')
+    parser.add_argument('log', help='файл лога')
+    parser.add_argument('--groups', default=','.join(PREFILTER_GROUPS),
+                        help=f"группы проблем через запятую: {', '.join(PREFILTER_GROUPS)}")
+    parser.add_argument('--first', action='store_true', help='остановиться на первой найденной проблеме')
+    parser.add_argument('--json', action='store_true', help='вывести результат в JSON')
+    args = parser.parse_args(argv)
+    
+    groups = [g.strip() for g in args.groups.split(',') if g.strip()]
+    unknown = [g for g in groups if g not in PREFILTER_ANCHORS]
+    if unknown:
+        parser.error(f"неизвестные группы: {', '.join(unknown)}")
+    summary = scan_problems(args.log, groups, args.first)
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        for group, count in summary['counts'].items():
+            print(f"{group}: {count}")
+            for example in summary['examples'][group][:3]:
+                print(f"  [{example['timestamp']}] {example['content'][:150]}")
+        print(f"[{'!!' if summary['has_problems'] else 'OK'}] Проверено {summary['bytes']} байт, "
+              f"разобрано записей: {summary['records_parsed']}")
+    sys.exit(1 if summary['has_problems'] else 0)
+
+# ============================================================================
+# ОТЧЁТ И ЗАПУСК
+# ============================================================================
+
+# Пути по умолчанию (исходное расположение лога сборки и результатов)
+DEFAULT_LOG_PATH = r'c:\Users\Notebook\StickerArtWeb-1\docs\front.log'
+DEFAULT_OUTPUT_PATH = r'c:\Users\Notebook\StickerArtWeb-1\docs\analysis_results.json'
+
+
+# Разделы analysis_results.json: имя раздела (= имя этапа) -> фабрика этапа.
+# При выборе разделов запускаются только их этапы.
+SECTIONS = {
+    'stats': BasicStatsStage,
+    'categories': lambda: CategoryStage(keep_records=False),
+    'problems': ProblemSummaryStage,
+    'timeline': lambda: TimelineStage(limit=30),
+    'time_gaps': lambda: TimeGapsStage(threshold_seconds=30),
+    'gap_distribution': GapDistributionStage,
+    'error_aggregated': lambda: DuplicatesStage('errors', 'error_aggregated'),
+    'deprecated_aggregated': lambda: DuplicatesStage('deprecated', 'deprecated_aggregated'),
+    'error_fingerprints': lambda: FingerprintStage('errors', 'error_fingerprints'),
+    'warning_fingerprints': lambda: FingerprintStage('warnings', 'warning_fingerprints'),
+    'ts_diagnostics': TsDiagnosticsStage,
+    'phases': BuildPhasesStage,
+    'anomalies': AnomalyStage,
+}
+
+def default_stages(sections: Iterable[str] = None) -> List[AnalysisStage]:
+    """Набор этапов, результаты которых сохраняются в analysis_results.json (все или только для sections)"""
+    if sections is None:
+        return [factory() for factory in SECTIONS.values()]
+    sections = set(sections)
+    unknown = sections - SECTIONS.keys()
+    if unknown:
+        raise ValueError(f"Неизвестные разделы: {', '.join(sorted(unknown))}")
+    return [factory() for name, factory in SECTIONS.items() if name in sections]
+
+def build_results(stages: List[AnalysisStage], values: Dict = None) -> Dict:
+    """
+    Структура analysis_results.json из накопленного состояния этапов конвейера
+    values — уже вычисленные result() этапов по имени (чтобы не считать повторно)
+    """
+    by_name = {stage.name: stage for stage in stages}
+    results = {}
+    # Полные размеры и списки групп — для отчёта и объединения сводок сборок
+    extra = {}
+    for name in SECTIONS:
+        stage = by_name.get(name)
+        if stage is None:
+            continue
+        value = values[name] if values is not None and name in values else stage.result()
+        if name == 'timeline':
+            extra['_timeline_total'] = stage.total
+        elif name == 'time_gaps':
+            extra['_time_gaps_total'] = len(value)
+            value = value[:10]
+        elif name == 'error_aggregated':
+            extra['_error_groups'] = value
+            value = value[:15]
+        elif name == 'deprecated_aggregated':
+            extra['_deprecated_groups'] = value
+            value = value[:10]
+        elif name == 'ts_diagnostics':
+            extra['_ts_index'] = value.to_dict()
+            value = value.summary()
+        results[name] = value
+    # Гарантии точности приближённых разделов (Space-Saving, выборки примеров)
+    accuracy = {name: acc for name, acc in ((stage.name, stage.accuracy()) for stage in stages) if acc is not None}
+    if accuracy:
+        results['accuracy'] = accuracy
+    results.update(extra)
+    return results
+
+def analyze_file(filepath: str, cache: 'ResultCache' = None, sections: Iterable[str] = None) -> Dict:
+    """
+    Анализ одного файла лога за один потоковый проход (или из кэша результатов)
+    sections — только эти разделы результатов; остальные этапы не запускаются
+    """
+    if cache is not None:
+        results = cache.analyze(filepath)
+        if sections is not None:
+            sections = set(sections)
+            results = {k: v for k, v in results.items() if k.startswith('_') or k in sections or k == 'accuracy'}
+        return results
+    stages = default_stages(sections)
+    feed_pipeline(iter_records(filepath), stages)
+    return build_results(stages)
+
+def _print_header(title: str) -> None:
+    print("\n" + "="*80)
+    print(title)
+    print("="*80)
+
+def print_report(results: Dict) -> None:
+    """Человекочитаемый отчёт по результатам анализа (печатаются только посчитанные разделы)"""
+    stats = results.get('stats')
+    if stats is not None:
+        total = stats['total_records']
+        print(f"[OK] Загружено {total} записей")
+        
+        # 1. БАЗОВАЯ СТАТИСТИКА
+        _print_header("1. БАЗОВАЯ СТАТИСТИКА")
+        print(f"\nОбщее количество записей: {stats['total_records']}")
+        print(f"Временной диапазон:")
+        print(f"  Начало: {stats['first_timestamp']}")
+        print(f"  Конец:  {stats['last_timestamp']}")
+        print(f"  Длительность: {stats['duration_minutes']:.2f} минут ({stats['duration_seconds']:.0f} секунд)")
+        print(f"\nРаспределение по потокам:")
+        for stream, count in stats['streams'].items():
+            print(f"  {stream}: {count} записей ({count/stats['total_records']*100:.1f}%)")
+        print(f"\nТоп-10 самых длинных сообщений (символов): {stats['content_lengths'][:5]}")
+    
+    # 2. КАТЕГОРИЗАЦИЯ
+    categories = results.get('categories')
+    if categories is not None:
+        total = stats['total_records'] if stats is not None else sum(categories.values())
+        _print_header("2. КАТЕГОРИЗАЦИЯ ПО УРОВНЯМ")
+        print("\nРаспределение по категориям:")
+        for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
+            print(f"  {cat}: {count} записей ({count/total*100:.1f}%)")
+    
+    # 3. ПОИСК ПРОБЛЕМ
+    problems = results.get('problems')
+    ts_summary = results.get('ts_diagnostics')
+    if problems is not None or ts_summary is not None:
+        _print_header("3. ПОИСК ПРОБЛЕМНЫХ ПАТТЕРНОВ")
+    if problems is not None:
+        print(f"\n[ERRORS] Ошибки (ERROR/FATAL/EXCEPTION): {problems['errors_count']}")
+        if problems['errors_examples']:
+            print("\nПримеры ошибок (равномерная выборка):")
+            for i, (timestamp, content, keyword) in enumerate(problems['errors_examples'][:5], 1):
+                print(f"\n  {i}. [{timestamp}] Тип: {keyword}")
+                print(f"     {content[:200]}")
+        
+        print(f"\n[WARN] Предупреждения (WARN): {problems['warnings_count']}")
+        if problems['warnings_examples']:
+            print("\nПримеры предупреждений (равномерная выборка):")
+            for i, (timestamp, content, keyword) in enumerate(problems['warnings_examples'][:3], 1):
+                print(f"\n  {i}. [{timestamp}]")
+                print(f"     {content[:200]}")
+        
+        print(f"\n[NPM] NPM ошибки: {problems['npm_errors']}")
+        print(f"[DEPRECATED] Deprecated зависимости: {problems['deprecated']}")
+        print(f"[FILE] Файловые ошибки (ENOENT/EACCES): {problems['file_errors']}")
+        print(f"[TIMEOUT] Таймауты: {problems['timeouts']}")
+    
+    if ts_summary and ts_summary['total']:
+        print(f"\n[TS] Диагностики TypeScript: {ts_summary['total']}")
+        for code, count in list(ts_summary['codes'].items())[:5]:
+            print(f"  {code}: {count}")
+    
+    # 4. ВРЕМЕННОЙ АНАЛИЗ
+    if any(key in results for key in ('timeline', 'phases', 'gap_distribution', 'anomalies', 'time_gaps')):
+        _print_header("4. ВРЕМЕННОЙ АНАЛИЗ")
+    
+    timeline = results.get('timeline')
+    if timeline is not None:
+        print(f"\nКлючевые события: {results.get('_timeline_total', len(timeline))}")
+        print("\nПервые 15 ключевых событий:")
+        for i, event in enumerate(timeline[:15], 1):
+            print(f"{i:2d}. [{event['timestamp']}] {event['type']}")
+            print(f"    {event['content'][:150]}")
+    
+    phases = results.get('phases')
+    if phases and phases['summary']:
+        print("\n\nФазы сборки (суммарно по всем запускам):")
+        for phase, s in phases['summary'].items():
+            print(f"  {phase:30s} {s['count']:3d} раз, всего {s['total_seconds']:8.1f} сек, "
+                  f"максимум {s['max_seconds']:7.1f} сек, самая длинная пауза {s['longest_silence_seconds']:.1f} сек")
+        slowest = sorted(phases['phases'], key=lambda p: -p['duration_seconds'])[:5]
+        print("\nСамые долгие фазы:")
+        for i, p in enumerate(slowest, 1):
+            print(f"\n{i}. {p['phase']}: {p['duration_seconds']:.1f} сек [{p['start']} - {p['end']}], записей: {p['records']}")
+            for silence in p['silences'][:1]:
+                print(f"   Пауза {silence['seconds']:.1f} сек после: {silence['before']['content'][:100]}")
+    
+    distribution = results.get('gap_distribution')
+    if distribution is not None:
+        print(f"\n\nРаспределение пауз (всего {distribution['gaps_total']}, максимум {distribution['max_gap_seconds']:.3f} сек):")
+        for bucket in distribution['over_threshold']:
+            print(f"  > {bucket['threshold_seconds']:g} сек: {bucket['count']} пауз, суммарно {bucket['total_seconds']:.1f} сек")
+    
+    anomalies = results.get('anomalies')
+    if anomalies:
+        print(f"\nЗависания относительно обычного темпа: {anomalies['stalls']} "
+              f"(суммарно {anomalies['stall_seconds']:.1f} сек), лавины вывода: {anomalies['floods']}")
+        for i, anomaly in enumerate(anomalies['top'][:5], 1):
+            if anomaly['type'] == 'stall':
+                print(f"\n{i}. Зависание {anomaly['gap_seconds']:.1f} сек (обычно {anomaly['baseline_seconds']:.3f} сек) "
+                      f"перед [{anomaly['timestamp']}]")
+            else:
+                print(f"\n{i}. Лавина {anomaly['records_per_second']} записей/сек "
+                      f"(обычно {anomaly['baseline_per_second']:.1f}) с [{anomaly['timestamp']}]")
+            for line in anomaly['context_before'][-1:] + anomaly['context_after'][:1]:
+                print(f"   {line[:120]}")
+    
+    gaps = results.get('time_gaps')
+    if gaps is not None:
+        print(f"\nАномально длинные паузы (>30 сек): {results.get('_time_gaps_total', len(gaps))}")
+        if gaps:
+            print("\nТоп-5 самых длинных пауз:")
+            for i, gap in enumerate(gaps[:5], 1):
+                print(f"\n{i}. Пауза: {gap['gap_seconds']:.1f} секунд")
+                print(f"   До:    [{gap['before']['timestamp']}] {gap['before']['content'][:100]}")
+                print(f"   После: [{gap['after']['timestamp']}] {gap['after']['content'][:100]}")
+    
+    # 5. АГРЕГАЦИЯ ДУБЛИКАТОВ
+    if any(key in results for key in ('error_aggregated', 'deprecated_aggregated', 'error_fingerprints')):
+        _print_header("5. АГРЕГАЦИЯ ДУБЛИКАТОВ")
+    
+    error_groups = results.get('_error_groups', results.get('error_aggregated'))
+    if error_groups:
+        print(f"\nУникальных типов ошибок: {len(error_groups)}")
+        print("\nТоп-10 самых частых ошибок:")
+        for i, err in enumerate(error_groups[:10], 1):
+            bound = f" (из них до {err['error']} — оценка)" if err.get('error') else ''
+            print(f"\n{i}. Встречается: {err['count']} раз{bound}")
+            print(f"   Первое: {err['first_occurrence']}")
+            print(f"   Последнее: {err['last_occurrence']}")
+            print(f"   Пример: {err['sample'][:120]}")
+    
+    deprecated_groups = results.get('_deprecated_groups', results.get('deprecated_aggregated'))
+    if deprecated_groups:
+        print(f"\n\nУстаревшие зависимости: {len(deprecated_groups)} уникальных")
+        print("\nТоп-5 deprecated предупреждений:")
+        for i, dep in enumerate(deprecated_groups[:5], 1):
+            print(f"\n{i}. Встречается: {dep['count']} раз")
+            print(f"   {dep['sample'][:150]}")
+    
+    fingerprints = results.get('error_fingerprints', [])
+    if fingerprints:
+        print(f"\n\nШаблонов ошибок: {len(fingerprints)}")
+        print("\nТоп-10 шаблонов ошибок:")
+        for i, group in enumerate(fingerprints[:10], 1):
+            print(f"\n{i}. [{group['fingerprint']}] Встречается: {group['count']} раз")
+            print(f"   Первое: {group['first_occurrence']}, последнее: {group['last_occurrence']}")
+            print(f"   Шаблон: {group['template'][:150]}")
+
+def save_results(results: Dict, output_file: str) -> None:
+    """
+    Сохранение результатов (служебные поля с префиксом '_' не сохраняются)
+    Индекс диагностик tsc пишется отдельным компактным файлом рядом
+    """
+    public = {k: v for k, v in results.items() if not k.startswith('_')}
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(public, f, ensure_ascii=False, indent=2)
+    if '_ts_index' in results:
+        with open(ts_index_path(output_file), 'w', encoding='utf-8') as f:
+            json.dump(results['_ts_index'], f, ensure_ascii=False, separators=(',', ':'))
+
+# ============================================================================
+# ПРОФИЛИРОВАНИЕ ЭТАПОВ АНАЛИЗА
+# ============================================================================
+#
+# В обычном режиме этапы работают за один общий проход, и их время
+# перемешано. В режиме --profile записи сначала загружаются в память (этап
+# load), разбираются метки времени (parse), после чего каждый этап проходит по
+# записям отдельно и сразу строит свой результат. Очищенный текст
+# вычисляется при подготовке записей, а теги и уровень строки — лениво и
+# кэшируются в LineInfo, поэтому каждый этап получает свежие записи (новая
+# таблица строк, готовится вне замера) и сам платит за производные поля,
+# которые использует. Для каждого шага пишутся
+# время (стенное и CPU), записей в секунду и пик памяти tracemalloc за шаг
+# (сверх памяти на его начало). Если tracemalloc уже запущен вызывающим кодом,
+# профилировщик его не останавливает. Результаты совпадают с обычным режимом;
+# время включает накладные расходы tracemalloc.
+#
+# Хуки — вызываемые объекты hook(event: Dict), получают событие по каждому
+# шагу сразу по его завершении (экспорт в систему метрик). С командной строки
+# подключаются как --profile-hook модуль:функция.
+
+PROFILE_VERSION = 1
+
+class StageProfiler:
+    """Замеры шагов анализа и рассылка событий хукам"""
+    
+    def __init__(self, hooks: Iterable[Callable[[Dict], None]] = (), trace_memory: bool = True):
+        self.hooks = list(hooks)
+        self.trace_memory = trace_memory
+        self.steps = []
+    
+    @contextmanager
+    def step(self, name: str, records: int = 0) -> Iterator[Dict]:
+        """
+        Замер шага: with profiler.step('load') as event: ...
+        Число записей можно уточнить внутри блока через event['records']
+        """
+        event = {'stage': name, 'records': records}
+        # Трассировку, запущенную вызывающим кодом, не трогаем: только сбрасываем пик
+        started = self.trace_memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        if self.trace_memory:
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield event
+        finally:
+            event['wall_seconds'] = round(time.perf_counter() - wall, 6)
+            event['cpu_seconds'] = round(time.process_time() - cpu, 6)
+            if self.trace_memory:
+                event['peak_memory_bytes'] = tracemalloc.get_traced_memory()[1] - base
+            if started:
+                tracemalloc.stop()
+        event['records_per_second'] = (round(event['records'] / event['wall_seconds'])
+                                       if event['wall_seconds'] > 0 else None)
+        self.steps.append(event)
+        for hook in self.hooks:
+            hook(event)
+    
+    def to_dict(self) -> Dict:
+        wall = sum(step['wall_seconds'] for step in self.steps)
+        dominant = max(self.steps, key=operator.itemgetter('wall_seconds'), default=None)
+        return {
+            'version': PROFILE_VERSION,
+            'tracemalloc': self.trace_memory,
+            'total_wall_seconds': round(wall, 6),
+            'total_cpu_seconds': round(sum(step['cpu_seconds'] for step in self.steps), 6),
+            'dominant_stage': dominant['stage'] if dominant else None,
+            'stages': [dict(step, share=round(step['wall_seconds'] / wall, 4) if wall else None)
+                       for step in self.steps],
+        }
+
+def load_profile_hook(spec: str) -> Callable[[Dict], None]:
+    """Хук по строке 'модуль:функция' (модуль ищется в sys.path, как при import)"""
+    module_name, _, attr = spec.partition(':')
+    if not module_name or not attr:
+        raise ValueError(f'Хук профилирования задаётся как модуль:функция, получено: {spec}')
+    return getattr(importlib.import_module(module_name), attr)
+
+def profile_path(output_file: str) -> str:
+    """Файл профиля рядом с analysis_results.json: <имя>.profile.json"""
+    return os.path.splitext(output_file)[0] + '.profile.json'
+
+def _fresh_records(records: List[LogRecord]) -> List[LogRecord]:
+    """Те же записи с новой таблицей строк (без вычисленных полей LineInfo) и готовым временем"""
+    intern = LineTable().intern
+    fresh = []
+    for rec in records:
+        copy = LogRecord(rec.raw, intern(rec.content))
+        copy._ts_ns = rec._ts_ns
+        fresh.append(copy)
+    return fresh
+
+def profile_file(filepath: str, profiler: StageProfiler, sections: Iterable[str] = None) -> Dict:
+    """Анализ файла с раздельным замером загрузки, классификации и каждого этапа"""
+    stages = default_stages(sections)
+    with profiler.step('load') as event:
+        intern = LineTable().intern
+        records = [LogRecord(record, intern(record['content'])) for record in iter_records(filepath)]
+        event['records'] = len(records)
+    count = len(records)
+    with profiler.step('parse', count):
+        for rec in records:
+            rec.ts_ns
+    values = {}
+    for stage in stages:
+        # Ленивые поля LineInfo, вычисленные прошлыми этапами, не должны достаться этому даром
+        records = _fresh_records(records)
+        with profiler.step(stage.name, count):
+            feed = stage.feed
+            for rec in records:
+                feed(rec)
+            values[stage.name] = stage.result()
+    with profiler.step('results', count):
+        results = build_results(stages, values)
+    return results
+
+# ============================================================================
+# ПАКЕТНЫЙ АНАЛИЗ НЕСКОЛЬКИХ СБОРОК
+# ============================================================================
+
+def summarize(results: Dict, source: str) -> Dict:
+    """Объединяемая сводка одной сборки (счётчики, группы дубликатов, паузы)"""
+    stats = results['stats']
+    problems = results['problems']
+    return {
+        'builds': 1,
+        'sources': [source],
+        'total_records': stats['total_records'],
+        'duration_seconds': stats['duration_seconds'],
+        'streams': dict(stats['streams']),
+        'categories': dict(results['categories']),
+        'problems': {k: v for k, v in problems.items() if not k.endswith('_examples')},
+        'error_aggregated': results['_error_groups'],
+        'deprecated_aggregated': results['_deprecated_groups'],
+        'error_fingerprints': results['error_fingerprints'],
+        'warning_fingerprints': results['warning_fingerprints'],
+        'gap_distribution': results['gap_distribution'],
+        'phases': results['phases']['summary'],
+        'anomalies': {k: v for k, v in results['anomalies'].items() if k != 'top'},
+        'time_gaps': [dict(gap, source=source) for gap in results['time_gaps']],
+    }
+
+def _sum_counts(target: Dict, counts: Dict) -> None:
+    for key, value in counts.items():
+        target[key] = target.get(key, 0) + value
+
+def _merge_groups(groups_lists: Iterable[List[Dict]], key: str = 'sample') -> List[Dict]:
+    """Слияние групп дубликатов (или шаблонов) по ключу группы"""
+    merged = {}
+    for groups in groups_lists:
+        for group in groups:
+            current = merged.get(group[key])
+            if current is None:
+                merged[group[key]] = dict(group)
+                continue
+            current['count'] += group['count']
+            current['error'] = current.get('error', 0) + group.get('error', 0)
+            if group['first_occurrence'] < current['first_occurrence']:
+                current['first_occurrence'] = group['first_occurrence']
+                current['example'] = group['example']
+                current['samples'] = group.get('samples', [])
+            current['last_occurrence'] = max(current['last_occurrence'], group['last_occurrence'])
+    return sorted(merged.values(), key=lambda x: (-x['count'], x[key]))
+
+def _merge_gap_distributions(distributions: List[Dict]) -> Dict:
+    merged = {'gaps_total': 0, 'max_gap_seconds': 0.0, 'over_threshold': []}
+    buckets = {}
+    for distribution in distributions:
+        merged['gaps_total'] += distribution['gaps_total']
+        merged['max_gap_seconds'] = max(merged['max_gap_seconds'], distribution['max_gap_seconds'])
+        for bucket in distribution['over_threshold']:
+            current = buckets.setdefault(bucket['threshold_seconds'], {
+                'threshold_seconds': bucket['threshold_seconds'], 'count': 0, 'total_seconds': 0.0})
+            current['count'] += bucket['count']
+            current['total_seconds'] += bucket['total_seconds']
+    merged['over_threshold'] = [buckets[t] for t in sorted(buckets)]
+    return merged
+
+def _merge_phase_summaries(summaries: List[Dict]) -> Dict:
+    merged = {}
+    for summary in summaries:
+        for phase, s in summary.items():
+            current = merged.setdefault(phase, {
+                'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0, 'longest_silence_seconds': 0.0})
+            current['count'] += s['count']
+            current['total_seconds'] += s['total_seconds']
+            current['max_seconds'] = max(current['max_seconds'], s['max_seconds'])
+            current['longest_silence_seconds'] = max(current['longest_silence_seconds'], s['longest_silence_seconds'])
+    return dict(sorted(merged.items(), key=lambda x: (-x[1]['total_seconds'], x[0])))
+
+def merge_summaries(summaries: List[Dict], top: int = 15) -> Dict:
+    """
+    Объединение сводок нескольких сборок
+    Результат не зависит от порядка входа: сводки упорядочиваются по источнику
+    """
+    summaries = sorted(summaries, key=lambda s: s['sources'])
+    merged = {
+        'builds': 0,
+        'sources': [],
+        'total_records': 0,
+        'duration_seconds': 0.0,
+        'streams': {},
+        'categories': {},
+        'problems': {},
+        'anomalies': {},
+    }
+    for summary in summaries:
+        merged['builds'] += summary['builds']
+        merged['sources'].extend(summary['sources'])
+        merged['total_records'] += summary['total_records']
+        merged['duration_seconds'] += summary['duration_seconds']
+        _sum_counts(merged['streams'], summary['streams'])
+        _sum_counts(merged['categories'], summary['categories'])
+        _sum_counts(merged['problems'], summary['problems'])
+        _sum_counts(merged['anomalies'], summary['anomalies'])
+    
+    for key in ('streams', 'categories', 'problems'):
+        merged[key] = dict(sorted(merged[key].items()))
+    merged['error_aggregated'] = _merge_groups(s['error_aggregated'] for s in summaries)[:top]
+    merged['deprecated_aggregated'] = _merge_groups(s['deprecated_aggregated'] for s in summaries)[:top]
+    merged['error_fingerprints'] = _merge_groups((s['error_fingerprints'] for s in summaries), 'fingerprint')[:top]
+    merged['warning_fingerprints'] = _merge_groups((s['warning_fingerprints'] for s in summaries), 'fingerprint')[:top]
+    merged['gap_distribution'] = _merge_gap_distributions([s['gap_distribution'] for s in summaries])
+    merged['phases'] = _merge_phase_summaries([s['phases'] for s in summaries])
+    merged['time_gaps'] = sorted(
+        (gap for s in summaries for gap in s['time_gaps']),
+        key=lambda x: (-x['gap_seconds'], x['source'], x['before']['timestamp'])
+    )[:top]
+    return merged
+
+def _analyze_build(filepath: str, cache: 'ResultCache' = None) -> Tuple[str, Dict, Dict]:
+    """Задача рабочего процесса: анализ одного лога и его объединяемая сводка"""
+    results = analyze_file(filepath, cache)
+    return filepath, results, summarize(results, os.path.basename(filepath))
+
+def analyze_batch(filepaths: List[str], workers: int = None,
+                  cache: 'ResultCache' = None) -> Tuple[Dict[str, Dict], Dict]:
+    """Параллельный анализ логов пулом процессов; возвращает результаты по файлам и общую сводку"""
+    filepaths = sorted(filepaths)
+    per_build = {}
+    summaries = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for filepath, results, summary in executor.map(_analyze_build, filepaths, repeat(cache)):
+            per_build[filepath] = results
+            summaries.append(summary)
+    return per_build, merge_summaries(summaries)
+
+# Маски логов каталога по умолчанию: обычные и сжатые (читаются через open_log)
+BATCH_PATTERNS = ('*.log', '*.log.gz', '*.log.xz', '*.log.zst')
+COMPRESSED_SUFFIXES = ('.gz', '.xz', '.zst')
+
+def build_name(filepath: str) -> str:
+    """Имя сборки по файлу лога: build-42.log.gz -> build-42"""
+    name = os.path.basename(filepath)
+    if name.endswith(COMPRESSED_SUFFIXES):
+        name = os.path.splitext(name)[0]
+    return os.path.splitext(name)[0]
+
+def batch_main(argv: List[str]) -> None:
+    """Пакетный режим: все логи каталога, результаты по каждой сборке и общая сводка"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py batch', description='Пакетный анализ логов сборок')
+    parser.add_argument('directory', help='каталог с логами сборок')
+    parser.add_argument('--pattern', action='append',
+                        help=f"маска имён логов, можно несколько (по умолчанию {' '.join(BATCH_PATTERNS)})")
+    parser.add_argument('-o', '--output-dir', help='куда сохранять результаты (по умолчанию каталог логов)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='число процессов (по умолчанию — число ядер)')
+    parser.add_argument('-s', '--silent', action='store_true', help='без вывода в консоль')
+    add_cache_arguments(parser)
+    add_history_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    patterns = args.pattern or BATCH_PATTERNS
+    filepaths = sorted({path for pattern in patterns for path in glob.glob(os.path.join(args.directory, pattern))})
+    output_dir = args.output_dir or args.directory
+    os.makedirs(output_dir, exist_ok=True)
+    
+    per_build, merged = analyze_batch(filepaths, args.workers, cache_from_args(args))
+    history = history_from_args(args, os.path.join(output_dir, 'batch_summary.json'))
+    for filepath, results in per_build.items():
+        save_results(results, os.path.join(output_dir, f'{build_name(filepath)}.analysis_results.json'))
+        if history is not None:
+            history.record(results, filepath)
+    if history is not None:
+        history.close()
+    summary_file = os.path.join(output_dir, 'batch_summary.json')
+    with open(summary_file, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False, indent=2)
+    
+    if not args.silent:
+        print(f"[OK] Проанализировано сборок: {merged['builds']}, записей: {merged['total_records']}")
+        for key, value in merged['problems'].items():
+            print(f"  {key}: {value}")
+        print(f"[OK] Сводка сохранена в: {summary_file}")
+
+# ============================================================================
+# РЕЖИМ FOLLOW: ИНКРЕМЕНТАЛЬНЫЙ АНАЛИЗ С КОНТРОЛЬНЫМИ ТОЧКАМИ
+# ============================================================================
+
+CHECKPOINT_VERSION = 2
+
+# Сколько первых байт файла хранится в контрольной точке как отпечаток (хеш)
+CHECKPOINT_HEAD_BYTES = 4096
+
+class LogFollower:
+    """Чтение только дописанных записей, начиная с байтового смещения в файле"""
+    
+    def __init__(self, filepath: str, offset: int = 0, fmt: str = None, chunk_size: int = 1 << 20):
+        if os.path.exists(filepath) and detect_compression(filepath) is not None:
+            raise ValueError(f'{filepath}: сжатый лог не дописывается — анализируйте его целиком, без follow')
+        self.filepath = filepath
+        self.offset = offset          # смещение сразу за последней прочитанной записью
+        self.format = fmt             # 'array' | 'ndjson' (определяется по первому байту)
+        self.chunk_size = chunk_size
+        self.closed = False           # JSON-массив закрыт ']' — новых записей не будет
+    
+    def read_new(self) -> Iterator[Dict]:
+        """Все полные записи, дописанные после self.offset; неполный хвост ждёт следующего вызова"""
+        if self.closed:
+            return
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.offset)
+            buf = b''
+            while True:
+                chunk = f.read(self.chunk_size)
+                buf += chunk
+                if self.format is None:
+                    head = buf.lstrip()
+                    if not head:
+                        if not chunk:
+                            return
+                        continue
+                    self.format = 'array' if head[:1] == b'[' else 'ndjson'
+                parse = self._parse_array if self.format == 'array' else self._parse_ndjson
+                consumed = yield from parse(buf, at_eof=not chunk)
+                buf = buf[consumed:]
+                if not chunk or self.closed:
+                    return
+    
+    def _parse_ndjson(self, buf: bytes, at_eof: bool):
+        pos = 0
+        while True:
+            end = buf.find(b'\n', pos)
+            if end < 0:
+                # Последняя строка без перевода строки: берём, только если это уже полный JSON
+                line = buf[pos:]
+                if at_eof and line.strip():
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        return pos
+                    self.offset += len(buf) - pos
+                    yield record
+                    return len(buf)
+                return pos
+            line = buf[pos:end]
+            self.offset += end + 1 - pos
+            pos = end + 1
+            if line.strip():
+                yield json.loads(line)
+    
+    def _parse_array(self, buf: bytes, at_eof: bool):
+        # surrogateescape: разрезанный границей блока UTF-8 символ не ломает декодирование,
+        # а обратное кодирование точно восстанавливает число байт
+        text = buf.decode('utf-8', 'surrogateescape')
+        pos = 0
+        consumed = 0
+        while True:
+            start = pos
+            while pos < len(text) and text[pos] in ' \t\r\n,[':
+                pos += 1
+            if pos >= len(text):
+                return consumed
+            if text[pos] == ']':
+                self.closed = True
+                self.offset += pos + 1 - start
+                return consumed + pos + 1 - start
+            try:
+                record, end = _json_decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                # Запись ещё дописывается
+                return consumed
+            size = (pos - start) + len(text[pos:end].encode('utf-8', 'surrogateescape'))
+            consumed += size
+            self.offset += size
+            pos = end
+            yield record
+
+def _file_head_digest(filepath: str) -> str:
+    with open(filepath, 'rb') as f:
+        return hashlib.sha256(f.read(CHECKPOINT_HEAD_BYTES)).hexdigest()
+
+def save_checkpoint(checkpoint_file: str, follower: LogFollower, stages: List[AnalysisStage]) -> None:
+    """Атомарная запись контрольной точки: смещение в файле и состояние всех этапов"""
+    checkpoint = {
+        'version': CHECKPOINT_VERSION,
+        'log': os.path.abspath(follower.filepath),
+        'offset': follower.offset,
+        'format': follower.format,
+        'closed': follower.closed,
+        'head_sha256': _file_head_digest(follower.filepath),
+        'stages': {stage.name: stage.get_state() for stage in stages},
+    }
+    tmp_file = checkpoint_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_file, checkpoint_file)
+
+def load_checkpoint(checkpoint_file: str, filepath: str, stages: List[AnalysisStage]) -> LogFollower:
+    """
+    Восстановление этапов из контрольной точки
+    Если точки нет или файл лога подменён/усечён — чтение начинается с начала файла
+    """
+    follower = LogFollower(filepath)
+    if not os.path.exists(checkpoint_file):
+        return follower
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    
+    valid = (
+        checkpoint.get('version') == CHECKPOINT_VERSION
+        and checkpoint.get('log') == os.path.abspath(filepath)
+        and checkpoint['offset'] <= os.path.getsize(filepath)
+        and checkpoint['head_sha256'] == _file_head_digest(filepath)
+        and set(checkpoint['stages']) == {stage.name for stage in stages}
+    )
+    if not valid:
+        return follower
+    for stage in stages:
+        stage.set_state(checkpoint['stages'][stage.name])
+    follower.offset = checkpoint['offset']
+    follower.format = checkpoint['format']
+    follower.closed = checkpoint['closed']
+    return follower
+
+def follow_log(filepath: str, output_file: str, checkpoint_file: str,
+               interval: float = 2.0, once: bool = False, silent: bool = False) -> Dict:
+    """
+    Слежение за растущим логом: обрабатываются только новые записи,
+    analysis_results.json и контрольная точка обновляются после каждой порции
+    """
+    stages = default_stages()
+    follower = load_checkpoint(checkpoint_file, filepath, stages)
+    if not silent and follower.offset:
+        print(f"[OK] Продолжение с контрольной точки: байт {follower.offset}")
+    results = build_results(stages)
+    lines = LineTable()
+    try:
+        while True:
+            new_records = feed_pipeline(follower.read_new(), stages, lines)
+            if new_records:
+                results = build_results(stages)
+                save_results(results, output_file)
+                save_checkpoint(checkpoint_file, follower, stages)
+                if not silent:
+                    problems = results['problems']
+                    print(f"[+{new_records}] записей: {results['stats']['total_records']}, "
+                          f"ошибок: {problems['errors_count']}, предупреждений: {problems['warnings_count']}")
+            if once or follower.closed:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+    return results
+
+def follow_main(argv: List[str]) -> None:
+    """Режим follow: анализ растущего лога по мере записи сборки"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py follow', description='Слежение за растущим логом сборки')
+    parser.add_argument('log', nargs='?', default=DEFAULT_LOG_PATH, help='файл лога (JSON-массив или NDJSON)')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT_PATH, help='файл для analysis_results.json')
+    parser.add_argument('--checkpoint', help='файл контрольной точки (по умолчанию рядом с результатами)')
+    parser.add_argument('--interval', type=float, default=2.0, help='период опроса файла, сек')
+    parser.add_argument('--once', action='store_true', help='обработать новые записи и выйти')
+    parser.add_argument('-s', '--silent', action='store_true', help='без вывода в консоль')
+    args = parser.parse_args(argv)
+    
+    checkpoint_file = args.checkpoint or os.path.splitext(args.output)[0] + '.checkpoint.json'
+    follow_log(args.log, args.output, checkpoint_file, args.interval, args.once, args.silent)
+
+# ============================================================================
+# ЖИВОЙ ПОТОК: АНАЛИЗ ВЫВОДА ИДУЩЕЙ СБОРКИ
+# ============================================================================
+#
+# Источники (stdin, Unix-сокет, воспроизведение файла вместо потока Amvera)
+# читаются асинхронно и кладут строки в ограниченную очередь; один потребитель
+# разбирает их и прогоняет через этапы конвейера. Когда очередь полна, чтение
+# источника приостанавливается (await put), буферы канала заполняются и
+# производитель блокируется — память не растёт при любом темпе вывода.
+# Тревоги (npm ERR!, FATAL, всплеск ошибок TS) выдаются сразу по мере записи.
+
+LIVE_QUEUE_SIZE = 1024
+LIVE_LINE_LIMIT = 16 * 1024 * 1024
+# Период проверки флага остановки при ожидании места в очереди (чтение файла в потоке)
+LIVE_PUMP_POLL_SECONDS = 0.2
+
+# Всплеск ошибок TypeScript: столько ошибок за столько секунд
+TS_BURST_COUNT = 20
+TS_BURST_SECONDS = 10.0
+# Повтор тревоги одного вида не чаще, чем раз в столько секунд (по времени записей)
+ALERT_COOLDOWN_SECONDS = 30.0
+
+class AlertStage(AnalysisStage):
+    """Тревоги о провале сборки по мере поступления записей"""
+    name = 'alerts'
+    
+    def __init__(self, on_alert=None, burst_count: int = TS_BURST_COUNT, burst_seconds: float = TS_BURST_SECONDS,
+                 cooldown_seconds: float = ALERT_COOLDOWN_SECONDS):
+        self.on_alert = on_alert
+        self.burst_count = burst_count
+        self.burst_ns = round(burst_seconds * NS_PER_SECOND)
+        self.cooldown_ns = round(cooldown_seconds * NS_PER_SECOND)
+        self.ts_errors = deque()
+        self.last_alert: Dict[str, int] = {}
+        self.alerts = []
+        self.suppressed = Counter()
+    
+    def _alert(self, kind: str, rec: LogRecord, **extra) -> None:
+        ts_ns = rec.ts_ns
+        last = self.last_alert.get(kind)
+        if last is not None and ts_ns - last < self.cooldown_ns:
+            self.suppressed[kind] += 1
+            return
+        self.last_alert[kind] = ts_ns
+        alert = {'alert': kind, 'timestamp': rec.timestamp, 'content': rec.clean[:300], **extra}
+        self.alerts.append(alert)
+        if self.on_alert is not None:
+            self.on_alert(alert)
+    
+    def feed(self, rec: LogRecord) -> None:
+        tags = rec.tags
+        if not tags:
+            return
+        if 'npm_errors' in tags:
+            self._alert('npm_error', rec)
+        if 'errors' in tags:
+            clean = rec.clean
+            if 'FATAL' in clean:
+                self._alert('fatal', rec)
+            if ': error TS' in clean:
+                window = self.ts_errors
+                ts_ns = rec.ts_ns
+                window.append(ts_ns)
+                while ts_ns - window[0] > self.burst_ns:
+                    window.popleft()
+                if len(window) >= self.burst_count:
+                    self._alert('ts_error_burst', rec, count=len(window),
+                                window_seconds=self.burst_ns / NS_PER_SECOND)
+    
+    def result(self) -> Dict:
+        return {'alerts': self.alerts, 'suppressed': dict(self.suppressed)}
+
+def _now_timestamp() -> str:
+    """Текущее время UTC в формате Amvera (наносекунды, без часового пояса)"""
+    return format_timestamp_ns(time.time_ns())
+
+def parse_live_line(line: str, stream: str = 'stdout') -> Dict:
+    """Строка потока: запись NDJSON или сырая строка вывода (время — момент получения)"""
+    line = line.rstrip('\r\n')
+    if line.startswith('{'):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        if isinstance(record, dict) and 'content' in record:
+            record.setdefault('timestamp', _now_timestamp())
+            record.setdefault('stream', stream)
+            return record
+    return {'timestamp': _now_timestamp(), 'stream': stream, 'content': line}
+
+class LiveAnalyzer:
+    """Потребитель ограниченной очереди: разбор строк и прогон этапов конвейера"""
+    
+    def __init__(self, on_alert=None, queue_size: int = LIVE_QUEUE_SIZE, **alert_options):
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.alert_stage = AlertStage(on_alert, **alert_options)
+        self.stages = default_stages() + [self.alert_stage]
+        self.lines = LineTable()
+        self.records = 0
+        self.max_queued = 0
+    
+    async def put(self, item) -> None:
+        """Строка (bytes), готовая запись (dict) или None — конец потока"""
+        await self.queue.put(item)
+        if self.queue.qsize() > self.max_queued:
+            self.max_queued = self.queue.qsize()
+    
+    async def read_stream(self, reader: asyncio.StreamReader) -> None:
+        """Производитель: строки из асинхронного потока до EOF; строки длиннее лимита пропускаются"""
+        skipping = False
+        while True:
+            try:
+                line = await reader.readuntil(b'\n')
+            except asyncio.IncompleteReadError as e:
+                # Последняя строка без перевода строки (или пустой остаток при EOF)
+                line = e.partial
+            except asyncio.LimitOverrunError as e:
+                # В первых e.consumed байтах буфера перевода строки нет: они отбрасываются,
+                # остаток длинной строки (до '\n' включительно) пропускается следующим чтением
+                await reader.readexactly(e.consumed)
+                skipping = True
+                continue
+            if not line:
+                break
+            if skipping:
+                skipping = False
+                continue
+            await self.put(line)
+    
+    async def replay(self, filepath: str, rate: float = 0) -> None:
+        """Производитель-заменитель потока Amvera: записи файла лога с заданным темпом (записей/сек)"""
+        delay = 1 / rate if rate > 0 else 0
+        for record in iter_records(filepath):
+            await self.put(record)
+            if delay:
+                await asyncio.sleep(delay)
+    
+    async def consume(self) -> None:
+        feeds = [stage.feed for stage in self.stages]
+        intern = self.lines.intern
+        queue = self.queue
+        while True:
+            item = await queue.get()
+            if item is None:
+                break
+            if isinstance(item, bytes):
+                item = parse_live_line(item.decode('utf-8', errors='replace'))
+            rec = LogRecord(item, intern(item['content']))
+            for feed in feeds:
+                feed(rec)
+            self.records += 1
+    
+    def results(self) -> Dict:
+        results = build_results(self.stages)
+        results['alerts'] = self.alert_stage.result()
+        return results
+
+def _pump_file(fileobj, analyzer: LiveAnalyzer, loop: asyncio.AbstractEventLoop, stop: threading.Event,
+               limit: int = LIVE_LINE_LIMIT) -> None:
+    """Чтение обычного файла (stdin из файла) в потоке с ожиданием места в очереди
+    
+    Строки длиннее limit пропускаются, как в read_stream. Ожидание места в
+    очереди прерывается, как только установлен stop (потребитель упал или поток
+    отменён), — иначе поток исполнителя ждал бы вечно.
+    """
+    skipping = False
+    while not stop.is_set():
+        line = fileobj.readline(limit)
+        if not line:
+            break
+        if len(line) == limit and not line.endswith(b'\n'):
+            # Перевода строки в пределах лимита нет: строка пропускается до конца
+            skipping = True
+            continue
+        if skipping:
+            skipping = False
+            continue
+        future = asyncio.run_coroutine_threadsafe(analyzer.put(line), loop)
+        while True:
+            try:
+                future.result(LIVE_PUMP_POLL_SECONDS)
+                break
+            except FutureTimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    return
+
+async def read_stdin(analyzer: LiveAnalyzer) -> None:
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=LIVE_LINE_LIMIT)
+    try:
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin.buffer)
+    except ValueError:
+        # stdin перенаправлен из обычного файла: канал недоступен
+        stop = threading.Event()
+        try:
+            await loop.run_in_executor(None, _pump_file, sys.stdin.buffer, analyzer, loop, stop)
+        finally:
+            # Отмена read_stdin (run_live при падении потребителя) останавливает и поток чтения
+            stop.set()
+        return
+    await analyzer.read_stream(reader)
+
+async def serve_unix_socket(analyzer: LiveAnalyzer, path: str, exit_on_close: bool = False) -> None:
+    """Unix-сокет: каждое подключение — отдельный производитель той же очереди"""
+    done = asyncio.Event()
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await analyzer.read_stream(reader)
+        finally:
+            writer.close()
+            if exit_on_close:
+                done.set()
+    
+    if os.path.exists(path):
+        os.unlink(path)
+    server = await asyncio.start_unix_server(handle, path, limit=LIVE_LINE_LIMIT)
+    try:
+        async with server:
+            await done.wait()
+    finally:
+        if os.path.exists(path):
+            os.unlink(path)
+
+async def run_live(analyzer: LiveAnalyzer, source: str, target: str = None, rate: float = 0,
+                   exit_on_close: bool = False) -> LiveAnalyzer:
+    """Анализ живого потока до его конца; source: 'stdin', 'socket' или 'replay'"""
+    if source == 'stdin':
+        produce = read_stdin(analyzer)
+    elif source == 'socket':
+        produce = serve_unix_socket(analyzer, target, exit_on_close)
+    elif source == 'replay':
+        produce = analyzer.replay(target, rate)
+    else:
+        raise ValueError(f'Неизвестный источник потока: {source}')
+    
+    consumer = asyncio.create_task(analyzer.consume())
+    producer = asyncio.create_task(produce)
+    try:
+        await asyncio.wait({consumer, producer}, return_when=asyncio.FIRST_COMPLETED)
+        if consumer.done():
+            # Потребитель упал: производитель иначе навсегда ждал бы места в очереди
+            producer.cancel()
+            consumer.result()
+        producer.result()
+        await analyzer.put(None)
+        await consumer
+    finally:
+        for task in (producer, consumer):
+            task.cancel()
+    return analyzer
+
+def live_main(argv: List[str]) -> None:
+    """Режим live: анализ вывода идущей сборки с тревогами о провале"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py live', description='Анализ живого потока сборки')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--socket', help='слушать Unix-сокет (строки NDJSON или сырой вывод)')
+    source.add_argument('--replay', help='воспроизвести файл лога как живой поток')
+    parser.add_argument('--rate', type=float, default=0, help='темп воспроизведения, записей/сек (0 — без задержек)')
+    parser.add_argument('--exit-on-close', action='store_true', help='завершиться, когда клиент сокета отключится')
+    parser.add_argument('-o', '--output', help='сохранить analysis_results.json по окончании потока')
+    parser.add_argument('--alerts', help='дописывать тревоги в файл (NDJSON)')
+    parser.add_argument('--queue-size', type=int, default=LIVE_QUEUE_SIZE, help='ёмкость очереди строк')
+    parser.add_argument('--burst-count', type=int, default=TS_BURST_COUNT, help='ошибок TS для тревоги о всплеске')
+    parser.add_argument('--burst-seconds', type=float, default=TS_BURST_SECONDS, help='окно всплеска ошибок TS, сек')
+    args = parser.parse_args(argv)
+    
+    alerts_file = open(args.alerts, 'a', encoding='utf-8') if args.alerts else None
+    
+    def on_alert(alert: Dict) -> None:
+        line = json.dumps(alert, ensure_ascii=False)
+        print(line, flush=True)
+        if alerts_file is not None:
+            alerts_file.write(line + '\n')
+            alerts_file.flush()
+    
+    if args.socket:
+        source, target = 'socket', args.socket
+    elif args.replay:
+        source, target = 'replay', args.replay
+    else:
+        source, target = 'stdin', None
+    analyzer = LiveAnalyzer(on_alert, args.queue_size, burst_count=args.burst_count, burst_seconds=args.burst_seconds)
+    try:
+        asyncio.run(run_live(analyzer, source, target, args.rate, args.exit_on_close))
+    except KeyboardInterrupt:
+        # Прерванный поток: сохраняется то, что успели разобрать
+        pass
+    finally:
+        if alerts_file is not None:
+            alerts_file.close()
+    
+    results = analyzer.results()
+    if args.output:
+        save_results(results, args.output)
+    print(f"[OK] Записей: {analyzer.records}, тревог: {len(results['alerts']['alerts'])}, "
+          f"максимум в очереди: {analyzer.max_queued}", file=sys.stderr)
+
+# ============================================================================
+# ЛОГИ ДОСТУПА NGINX: КЭШ МЕДИА СТИКЕРОВ
+# ============================================================================
+#
+# Входной формат — подключаемый: парсер строки возвращает запись доступа
+# (uri, status, bytes, cache, request_time, content_type) или None. Форматы:
+#   cache_stats — log_format из nginx.conf ('$time_local|$remote_addr|...|cache_status=...|status=...|bytes=...'),
+#                 в том числе расширенный полями '|rt=$request_time|content_type=$sent_http_content_type';
+#   combined    — стандартный combined, за ним необязательные поля key=value
+#                 (rt=, upstream_cache_status=, sent_http_content_type=) или голый статус кэша (HIT/MISS);
+#   json        — log_format ... escape=json, имена ключей как у переменных nginx.
+# Поля key=value в хвосте cache_stats разбираются по именам, поэтому старые строки
+# (без rt/content_type: нет латентности, тип медиа — по расширению URL) и строки
+# расширенного формата читаются одним парсером, в том числе вперемешку в одном логе.
+#
+# Некэшированные URL считаются в таблице Space-Saving (см. «Ограниченная память»):
+# память ограничена на любом числе различных URL, таблицы логов объединяются.
+#
+# Латентность собирается в t-digest: память O(compression) на любом числе
+# строк, а дайджесты отдельных логов объединяются без потери точности хвостов.
+
+ACCESS_LOG_FORMATS = {}
+
+def access_log_format(name: str) -> Callable:
+    """Регистрация парсера строки лога доступа под именем формата"""
+    def register(parser: Callable[[str], Optional[Dict]]) -> Callable:
+        ACCESS_LOG_FORMATS[name] = parser
+        return parser
+    return register
+
+# Синонимы полей: переменная nginx / короткое имя -> поле записи доступа
+ACCESS_FIELD_ALIASES = {
+    'request_uri': 'uri', 'uri': 'uri',
+    'status': 'status',
+    'body_bytes_sent': 'bytes', 'bytes': 'bytes',
+    'upstream_cache_status': 'cache', 'cache_status': 'cache', 'cache': 'cache',
+    'request_time': 'request_time', 'rt': 'request_time',
+    'upstream_response_time': 'upstream_time', 'urt': 'upstream_time',
+    'sent_http_content_type': 'content_type', 'content_type': 'content_type',
+}
+
+# Значения $upstream_cache_status, при которых ответ отдан из кэша
+CACHE_HIT_STATUSES = frozenset(('HIT', 'STALE', 'UPDATING', 'REVALIDATED'))
+
+_KV_RE = re.compile(r'(\w+)=("[^"]*"|[^\s|]*)')
+_CACHE_WORD_RE = re.compile(r'\b(HIT|MISS|BYPASS|EXPIRED|STALE|UPDATING|REVALIDATED)\b')
+
+def _access_entry(fields: Dict) -> Dict:
+    """Запись доступа из полей с именами nginx: приведение типов, '-' — нет значения"""
+    entry = {'uri': '', 'status': 0, 'bytes': 0, 'cache': None, 'request_time': None, 'content_type': None}
+    for key, value in fields.items():
+        name = ACCESS_FIELD_ALIASES.get(key)
+        if name is None or value is None:
+            continue
+        value = str(value).strip('"')
+        if value in ('', '-'):
+            continue
+        if name in ('status', 'bytes'):
+            entry[name] = int(value) if value.isdigit() else 0
+        elif name in ('request_time', 'upstream_time'):
+            # upstream_response_time при нескольких апстримах: '0.010, 0.020'
+            try:
+                entry[name] = sum(float(part) for part in value.replace(':', ',').split(','))
+            except ValueError:
+                pass
+        else:
+            entry[name] = value
+    if entry['request_time'] is None:
+        entry['request_time'] = entry.pop('upstream_time', None)
+    else:
+        entry.pop('upstream_time', None)
+    return entry
+
+_CACHE_STATS_RE = re.compile(r'^[^|]*\|[^|]*\|(?P<method>[^|]*)\|(?P<uri>.*?)\|(?P<rest>cache_status=.*)$')
+
+@access_log_format('cache_stats')
+def parse_cache_stats_line(line: str) -> Optional[Dict]:
+    """Строка log_format cache_stats из nginx.conf"""
+    match = _CACHE_STATS_RE.match(line)
+    if match is None:
+        return None
+    fields = {key: value for key, value in _KV_RE.findall(match.group('rest')) if key != 'cache_key'}
+    fields['request_uri'] = match.group('uri')
+    return _access_entry(fields)
+
+_COMBINED_RE = re.compile(
+    r'^\S+ \S+ \S+ \[[^\]]*\] "(?:[A-Z]+ )?(?P<uri>[^" ]*)[^"]*" (?P<status>\d{3}) (?P<bytes>\d+|-)'
+    r'(?: "[^"]*" "(?:[^"\\]|\\.)*")?(?P<rest>.*)$'
+)
+
+@access_log_format('combined')
+def parse_combined_line(line: str) -> Optional[Dict]:
+    """Строка формата combined с необязательными дополнительными полями в конце"""
+    match = _COMBINED_RE.match(line)
+    if match is None:
+        return None
+    rest = match.group('rest')
+    fields = dict(_KV_RE.findall(rest))
+    fields['request_uri'] = match.group('uri')
+    fields['status'] = match.group('status')
+    fields['body_bytes_sent'] = match.group('bytes')
+    if not any(ACCESS_FIELD_ALIASES.get(key) == 'cache' for key in fields):
+        word = _CACHE_WORD_RE.search(rest)
+        if word:
+            fields['upstream_cache_status'] = word.group(1)
+    return _access_entry(fields)
+
+@access_log_format('json')
+def parse_json_access_line(line: str) -> Optional[Dict]:
+    """Строка log_format с escape=json: объект с переменными nginx"""
+    try:
+        fields = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(fields, dict):
+        return None
+    if 'request_uri' not in fields and 'uri' not in fields and isinstance(fields.get('request'), str):
+        # $request: 'GET /stickers/x?file=true HTTP/1.1'
+        parts = fields['request'].split(' ')
+        fields['request_uri'] = parts[1] if len(parts) > 1 else parts[0]
+    return _access_entry(fields)
+
+def detect_access_format(line: str) -> Optional[str]:
+    """Формат лога доступа по первой непустой строке"""
+    for name in ('json', 'cache_stats', 'combined'):
+        if ACCESS_LOG_FORMATS[name](line) is not None:
+            return name
+    for name, parser in ACCESS_LOG_FORMATS.items():
+        if parser(line) is not None:
+            return name
+    return None
+
+def iter_access_entries(filepath: str, fmt: str = 'auto', skipped: List[int] = None) -> Iterator[Dict]:
+    """
+    Потоковое чтение лога доступа (в том числе .gz/.xz/.zst)
+    skipped — список из одного счётчика, куда добавляется число нераспознанных строк
+    """
+    parser = None if fmt == 'auto' else ACCESS_LOG_FORMATS[fmt]
+    with open_log(filepath, errors='replace') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line.strip():
+                continue
+            if parser is None:
+                detected = detect_access_format(line)
+                if detected is None:
+                    if skipped is not None:
+                        skipped[0] += 1
+                    continue
+                parser = ACCESS_LOG_FORMATS[detected]
+            entry = parser(line)
+            if entry is None:
+                if skipped is not None:
+                    skipped[0] += 1
+                continue
+            yield entry
+
+class TDigest:
+    """
+    t-digest (объединяющий вариант, масштабная функция k1) для квантилей потока
+    Память — O(compression) центроидов; точность выше у хвостов (p99), чем у медианы
+    """
+    __slots__ = ('compression', 'means', 'weights', 'count', 'min', 'max', '_buffer')
+    
+    def __init__(self, compression: float = 100):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+    
+    def add(self, value: float) -> None:
+        self._buffer.append(value)
+        if len(self._buffer) >= 10 * self.compression:
+            self._compress()
+    
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+    
+    def _q(self, k: float) -> float:
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+    
+    def _compress(self, extra: Iterable[Tuple[float, float]] = ()) -> None:
+        """Слияние буфера (и центроидов другого дайджеста) в центроиды"""
+        if not self._buffer and not extra:
+            return
+        if self._buffer:
+            self.min = min(self.min, min(self._buffer))
+            self.max = max(self.max, max(self._buffer))
+        points = list(zip(self.means, self.weights))
+        points.extend(zip(self._buffer, repeat(1)))
+        points.extend(extra)
+        points.sort()
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+        means, weights = [], []
+        mean, weight = points[0]
+        done = 0.0
+        limit = total * self._q(self._k(0) + 1)
+        for next_mean, next_weight in islice(points, 1, None):
+            if done + weight + next_weight <= limit:
+                weight += next_weight
+                mean += (next_mean - mean) * next_weight / weight
+            else:
+                means.append(mean)
+                weights.append(weight)
+                done += weight
+                limit = total * self._q(self._k(done / total) + 1)
+                mean, weight = next_mean, next_weight
+        means.append(mean)
+        weights.append(weight)
+        self.means, self.weights, self.count = means, weights, total
+    
+    def merge(self, other: 'TDigest') -> None:
+        other._compress()
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(list(zip(other.means, other.weights)))
+    
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля q ∈ [0, 1]; интерполяция между центрами центроидов"""
+        self._compress()
+        if not self.means:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+        target = q * self.count
+        done = 0.0
+        prev_center, prev_mean = 0.0, self.min
+        for mean, weight in zip(self.means, self.weights):
+            center = done + weight / 2
+            if target < center:
+                if center == prev_center:
+                    return mean
+                return prev_mean + (mean - prev_mean) * (target - prev_center) / (center - prev_center)
+            prev_center, prev_mean = center, mean
+            done += weight
+        if self.count == prev_center:
+            return self.max
+        return prev_mean + (self.max - prev_mean) * (target - prev_center) / (self.count - prev_center)
+    
+    def to_dict(self) -> Dict:
+        self._compress()
+        return {'compression': self.compression, 'min': self.min if self.means else None,
+                'max': self.max if self.means else None,
+                'centroids': [[round(m, 6), w] for m, w in zip(self.means, self.weights)]}
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TDigest':
+        digest = cls(data['compression'])
+        if data['centroids']:
+            digest.min, digest.max = data['min'], data['max']
+            digest._compress([tuple(c) for c in data['centroids']])
+        return digest
+
+# Тип медиа стикера: по Content-Type ответа, иначе по расширению в пути
+MEDIA_CONTENT_TYPES = {
+    'image/webp': 'webp',
+    'video/webm': 'webm',
+    'application/x-tgsticker': 'tgs',
+    'application/x-tgs': 'tgs',
+}
+MEDIA_EXTENSIONS = ('webp', 'webm', 'tgs')
+LATENCY_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+
+def media_type(entry: Dict) -> str:
+    content_type = entry['content_type']
+    if content_type:
+        media = MEDIA_CONTENT_TYPES.get(content_type.split(';', 1)[0].strip().lower())
+        if media:
+            return media
+    path = entry['uri'].split('?', 1)[0]
+    ext = path.rsplit('.', 1)[-1].lower() if '.' in path.rsplit('/', 1)[-1] else ''
+    return ext if ext in MEDIA_EXTENSIONS else 'other'
+
+class AccessLogStats:
+    """Потоковая статистика лога доступа: кэш по типам медиа, латентность, некэшированные URL"""
+    
+    def __init__(self, uncached_capacity: int = HEAVY_HITTERS_CAPACITY):
+        self.requests = 0
+        self.skipped = 0
+        self.cache_statuses = Counter()
+        self.status_classes = Counter()
+        self.by_type = defaultdict(lambda: {'requests': 0, 'cache_requests': 0, 'hits': 0, 'bytes': 0})
+        self.latency = defaultdict(TDigest)
+        self.uncached = SpaceSaving(uncached_capacity)   # URL в логе не ограничены: только top-K
+    
+    def feed(self, entry: Dict) -> None:
+        self.requests += 1
+        media = media_type(entry)
+        stats = self.by_type[media]
+        stats['requests'] += 1
+        stats['bytes'] += entry['bytes']
+        self.status_classes[f"{entry['status'] // 100}xx"] += 1
+        cache = entry['cache']
+        if cache is not None:
+            self.cache_statuses[cache] += 1
+            stats['cache_requests'] += 1
+            if cache in CACHE_HIT_STATUSES:
+                stats['hits'] += 1
+            else:
+                uri = entry['uri']
+                self.uncached.add(uri, lambda: {'uri': uri})
+        if entry['request_time'] is not None:
+            self.latency[media].add(entry['request_time'])
+            self.latency['all'].add(entry['request_time'])
+    
+    def merge(self, other: 'AccessLogStats') -> None:
+        self.requests += other.requests
+        self.skipped += other.skipped
+        self.cache_statuses.update(other.cache_statuses)
+        self.status_classes.update(other.status_classes)
+        for media, stats in other.by_type.items():
+            _sum_counts(self.by_type[media], stats)
+        for media, digest in other.latency.items():
+            self.latency[media].merge(digest)
+        self.uncached.merge(other.uncached)
+    
+    def __getstate__(self) -> Dict:
+        # defaultdict с lambda не сериализуется pickle (передача из рабочих процессов)
+        state = dict(self.__dict__)
+        state['by_type'] = dict(self.by_type)
+        state['latency'] = dict(self.latency)
+        return state
+    
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__()
+        by_type, latency = state.pop('by_type'), state.pop('latency')
+        self.__dict__.update(state)
+        self.by_type.update(by_type)
+        self.latency.update(latency)
+    
+    def result(self, top: int = 20) -> Dict:
+        types = {}
+        for media, stats in sorted(self.by_type.items()):
+            ratio = stats['hits'] / stats['cache_requests'] if stats['cache_requests'] else None
+            types[media] = dict(stats, hit_ratio=round(ratio, 4) if ratio is not None else None)
+        latency = {}
+        for media, digest in sorted(self.latency.items()):
+            quantiles = {f'p{round(q * 100)}': digest.quantile(q) for q in LATENCY_QUANTILES}
+            latency[media] = {'count': int(digest.count)}
+            latency[media].update((key, round(value, 4)) for key, value in quantiles.items())
+        cache_requests = sum(stats['cache_requests'] for stats in self.by_type.values())
+        hits = sum(stats['hits'] for stats in self.by_type.values())
+        uncached = sorted(self.uncached.groups(), key=lambda x: x['count'], reverse=True)[:top]
+        return {
+            'requests': self.requests,
+            'skipped_lines': self.skipped,
+            'hit_ratio': round(hits / cache_requests, 4) if cache_requests else None,
+            'cache_statuses': dict(self.cache_statuses.most_common()),
+            'status_classes': dict(sorted(self.status_classes.items())),
+            'by_type': types,
+            'latency_seconds': latency,
+            'top_uncached': [{'uri': g['uri'], 'count': g['count'], 'error': g['error']} for g in uncached],
+            'latency_digests': {media: digest.to_dict() for media, digest in sorted(self.latency.items())},
+            'accuracy': {'top_uncached': self.uncached.accuracy('top_uncached')},
+        }
+
+def analyze_access_log(filepath: str, fmt: str = 'auto') -> AccessLogStats:
+    """Статистика одного лога доступа за один проход"""
+    stats = AccessLogStats()
+    skipped = [0]
+    for entry in iter_access_entries(filepath, fmt, skipped):
+        stats.feed(entry)
+    stats.skipped = skipped[0]
+    return stats
+
+def print_access_report(results: Dict) -> None:
+    _print_header('ЛОГ ДОСТУПА NGINX: КЭШ МЕДИА СТИКЕРОВ')
+    ratio = results['hit_ratio']
+    print(f"Запросов: {results['requests']}, нераспознанных строк: {results['skipped_lines']}")
+    print(f"Доля попаданий в кэш: {ratio * 100:.1f}%" if ratio is not None else "Статус кэша в логе не найден")
+    print(f"Статусы кэша: {results['cache_statuses']}")
+    print(f"Коды ответа: {results['status_classes']}")
+    
+    _print_header('ПО ТИПАМ МЕДИА')
+    for media, stats in results['by_type'].items():
+        ratio = f"{stats['hit_ratio'] * 100:.1f}%" if stats['hit_ratio'] is not None else '-'
+        print(f"{media:<6} запросов: {stats['requests']:<10} попаданий: {ratio:<7} байт: {stats['bytes']}")
+    
+    if results['latency_seconds']:
+        _print_header('ЛАТЕНТНОСТЬ, СЕК (T-DIGEST)')
+        for media, latency in results['latency_seconds'].items():
+            quantiles = ' '.join(f"{key}={value}" for key, value in latency.items() if key != 'count')
+            print(f"{media:<6} n={latency['count']:<10} {quantiles}")
+    
+    if results['top_uncached']:
+        _print_header('ЧАЩЕ ВСЕГО МИМО КЭША')
+        for item in results['top_uncached']:
+            bound = f" (из них до {item['error']} — оценка)" if item.get('error') else ''
+            print(f"{item['count']:>8}  {item['uri'][:150]}{bound}")
+
+def nginx_main(argv: List[str]) -> None:
+    """Режим nginx: анализ логов доступа (кэш медиа стикеров, латентность)"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py nginx', description='Анализ логов доступа nginx')
+    parser.add_argument('logs', nargs='+', help='логи доступа (можно сжатые .gz/.xz/.zst)')
+    parser.add_argument('--format', default='auto', choices=['auto', *ACCESS_LOG_FORMATS],
+                        help='формат строк (по умолчанию определяется по первой строке)')
+    parser.add_argument('--top', type=int, default=20, help='сколько некэшированных URL показать')
+    parser.add_argument('-o', '--output', help='сохранить результаты в JSON')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='число процессов (по умолчанию — число ядер)')
+    parser.add_argument('-s', '--silent', action='store_true', help='без вывода в консоль')
+    args = parser.parse_args(argv)
+    
+    stats = AccessLogStats()
+    if len(args.logs) == 1:
+        stats = analyze_access_log(args.logs[0], args.format)
+    else:
+        # Логи разбираются параллельно; дайджесты латентности объединяются без потери точности
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for part in executor.map(analyze_access_log, sorted(args.logs), repeat(args.format)):
+                stats.merge(part)
+    results = stats.result(args.top)
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if not args.silent:
+        print_access_report(results)
+        if args.output:
+            print(f"\n[OK] Результаты сохранены в: {args.output}")
+
+# ============================================================================
+# КЭШ РЕЗУЛЬТАТОВ, АДРЕСУЕМЫЙ СОДЕРЖИМЫМ ЛОГА
+# ============================================================================
+#
+# results/<ключ>.json   — готовые результаты; ключ = sha256(версия анализатора + sha256 файла)
+# snapshots/<смещение>-<ключ>.json — состояние этапов после первых <смещение> байт лога;
+#     ключ = sha256(версия + sha256 этих байт). Для дописанного лога с тем же
+#     началом анализ продолжается с самого глубокого совпавшего снимка.
+# Давность использования — mtime файла (обновляется при попадании), при
+# превышении лимита размера удаляются самые давно использованные записи.
+
+# Версия логики анализа: меняется при любом изменении результатов или состояния этапов
+ANALYZER_VERSION = '6'
+
+DEFAULT_CACHE_BYTES = 512 * 1024 * 1024
+SNAPSHOT_INTERVAL_BYTES = 8 * 1024 * 1024
+HASH_BLOCK_SIZE = 1 << 20
+
+class ResultCache:
+    """Постоянный кэш результатов анализа на диске с LRU-вытеснением"""
+    
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_CACHE_BYTES,
+                 snapshot_bytes: int = SNAPSHOT_INTERVAL_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.snapshot_bytes = snapshot_bytes
+        self.results_dir = os.path.join(directory, 'results')
+        self.snapshots_dir = os.path.join(directory, 'snapshots')
+        os.makedirs(self.results_dir, exist_ok=True)
+        os.makedirs(self.snapshots_dir, exist_ok=True)
+    
+    @staticmethod
+    def _key(digest: str) -> str:
+        return hashlib.sha256(f'{ANALYZER_VERSION}:{digest}'.encode('ascii')).hexdigest()
+    
+    @staticmethod
+    def _hash_file(filepath: str, offsets: Iterable[int]) -> Tuple[str, Dict[int, str]]:
+        """Один проход: sha256 всего файла и sha256 префиксов заданной длины"""
+        offsets = sorted(set(offsets))
+        prefixes = {}
+        h = hashlib.sha256()
+        position = 0
+        with open(filepath, 'rb') as f:
+            while True:
+                block = f.read(HASH_BLOCK_SIZE)
+                if not block:
+                    break
+                start = 0
+                while offsets and offsets[0] <= position + len(block):
+                    cut = offsets.pop(0) - position
+                    h.update(block[start:cut])
+                    start = cut
+                    prefixes[position + cut] = h.copy().hexdigest()
+                h.update(block[start:])
+                position += len(block)
+        return h.hexdigest(), prefixes
+    
+    def _snapshot_index(self) -> Dict[int, Dict[str, str]]:
+        """Смещение -> {ключ снимка: путь к файлу}"""
+        index = defaultdict(dict)
+        for name in os.listdir(self.snapshots_dir):
+            offset, sep, rest = name.partition('-')
+            if sep and offset.isdigit() and rest.endswith('.json'):
+                index[int(offset)][rest[:-5]] = os.path.join(self.snapshots_dir, name)
+        return index
+    
+    def _load(self, path: str) -> Dict:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        os.utime(path)  # отметка использования для LRU
+        return data
+    
+    @staticmethod
+    def _write(path: str, data: Dict) -> None:
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def analyze(self, filepath: str) -> Dict:
+        """Результаты из кэша или анализ с продолжением от самого длинного закэшированного префикса"""
+        snapshots = self._snapshot_index()
+        size = os.path.getsize(filepath)
+        digest, prefixes = self._hash_file(filepath, (o for o in snapshots if o <= size))
+        
+        result_path = os.path.join(self.results_dir, self._key(digest) + '.json')
+        try:
+            return self._load(result_path)
+        except FileNotFoundError:
+            pass
+        
+        stages = default_stages()
+        if detect_compression(filepath) is not None:
+            # Архив не дописывается: снимки префиксов бесполезны, смещения в сжатых байтах
+            feed_pipeline(iter_records(filepath), stages)
+            results = build_results(stages)
+            self._write(result_path, results)
+            self.evict()
+            return json.loads(json.dumps(results, ensure_ascii=False))
+        
+        follower = LogFollower(filepath)
+        for offset in sorted(prefixes, reverse=True):
+            snapshot_path = snapshots[offset].get(self._key(prefixes[offset]))
+            if snapshot_path is None:
+                continue
+            try:
+                snapshot = self._load(snapshot_path)
+            except FileNotFoundError:
+                continue
+            for stage in stages:
+                stage.set_state(snapshot['stages'][stage.name])
+            follower.offset = offset
+            follower.format = snapshot['format']
+            break
+        
+        # Новые снимки пишутся во временные файлы; ключ (хеш префикса) считается после анализа
+        pending = []
+        
+        def records_with_snapshots() -> Iterator[Dict]:
+            last = follower.offset
+            for record in follower.read_new():
+                yield record
+                if follower.offset - last >= self.snapshot_bytes:
+                    last = follower.offset
+                    tmp_path = os.path.join(self.snapshots_dir, f'pending-{os.getpid()}-{last}.tmp')
+                    self._write(tmp_path, {'format': follower.format,
+                                           'stages': {s.name: s.get_state() for s in stages}})
+                    pending.append((last, tmp_path))
+        
+        feed_pipeline(records_with_snapshots(), stages)
+        results = build_results(stages)
+        self._write(result_path, results)
+        
+        if pending:
+            _, new_prefixes = self._hash_file(filepath, (offset for offset, _ in pending))
+            for offset, tmp_path in pending:
+                key = self._key(new_prefixes[offset])
+                os.replace(tmp_path, os.path.join(self.snapshots_dir, f'{offset}-{key}.json'))
+        self.evict()
+        # Возвращаем в том же виде, что и при попадании в кэш
+        return json.loads(json.dumps(results, ensure_ascii=False))
+    
+    def evict(self) -> None:
+        """Удаление давно использованных записей, пока кэш больше лимита"""
+        entries = []
+        for directory in (self.results_dir, self.snapshots_dir):
+            for name in os.listdir(directory):
+                if name.endswith('.tmp'):
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+# ============================================================================
+# ИСТОРИЯ СБОРОК В SQLITE
+# ============================================================================
+#
+# Каждый анализ добавляет строку в builds и связанные строки с длительностями
+# фаз, счётчиками категорий и шаблонами ошибок. Повторный анализ того же лога
+# (тот же файл, начало и число записей) заменяет прежнюю запись. Индексы по
+# времени начала сборки, фазе и хешу шаблона держат запросы трендов быстрыми
+# и на тысячах сборок.
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    analyzed_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    duration_seconds REAL NOT NULL,
+    total_records INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    warnings INTEGER NOT NULL,
+    UNIQUE (source, started_at, total_records)
+);
+CREATE INDEX IF NOT EXISTS builds_started ON builds (started_at);
+
+CREATE TABLE IF NOT EXISTS phase_durations (
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    phase TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    total_seconds REAL NOT NULL,
+    max_seconds REAL NOT NULL,
+    PRIMARY KEY (build_id, phase)
+);
+CREATE INDEX IF NOT EXISTS phase_durations_phase ON phase_durations (phase, build_id);
+
+CREATE TABLE IF NOT EXISTS category_counts (
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (build_id, category)
+);
+
+CREATE TABLE IF NOT EXISTS fingerprints (
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    fingerprint TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first_occurrence TEXT,
+    PRIMARY KEY (build_id, kind, fingerprint)
+);
+CREATE INDEX IF NOT EXISTS fingerprints_fingerprint ON fingerprints (fingerprint, build_id);
+
+CREATE TABLE IF NOT EXISTS fingerprint_templates (
+    fingerprint TEXT PRIMARY KEY,
+    template TEXT NOT NULL,
+    example TEXT
+);
+"""
+
+# Версия схемы (PRAGMA user_version). 0 — первая схема: ключ fingerprints без kind,
+# и шаблон, встреченный и как ошибка, и как предупреждение, терял строку предупреждений
+HISTORY_SCHEMA_VERSION = 1
+_HISTORY_MIGRATIONS = {
+    0: """
+ALTER TABLE fingerprints RENAME TO fingerprints_v0;
+DROP INDEX IF EXISTS fingerprints_fingerprint;
+CREATE TABLE fingerprints (
+    build_id INTEGER NOT NULL REFERENCES builds (id) ON DELETE CASCADE,
+    fingerprint TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    first_occurrence TEXT,
+    PRIMARY KEY (build_id, kind, fingerprint)
+);
+INSERT INTO fingerprints SELECT build_id, fingerprint, kind, count, first_occurrence FROM fingerprints_v0;
+DROP TABLE fingerprints_v0;
+""",
+}
+
+HISTORY_FILENAME = 'analysis_history.sqlite'
+
+class HistoryStore:
+    """История анализов сборок в локальной базе SQLite"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self._migrate()
+        self.conn.executescript(HISTORY_SCHEMA)
+        self.conn.execute(f'PRAGMA user_version = {HISTORY_SCHEMA_VERSION}')
+    
+    def close(self) -> None:
+        self.conn.close()
+    
+    def _migrate(self) -> None:
+        """Перевод базы, созданной прежней версией, на текущую схему"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fingerprints'").fetchone()
+        if not exists:
+            return
+        for step in range(version, HISTORY_SCHEMA_VERSION):
+            self.conn.executescript(_HISTORY_MIGRATIONS[step])
+    
+    def record(self, results: Dict, source: str) -> int:
+        """Сохранение результатов одного анализа; возвращает id сборки"""
+        stats = results['stats']
+        problems = results['problems']
+        source = os.path.abspath(source)
+        with self.conn:
+            self.conn.execute(
+                'DELETE FROM builds WHERE source = ? AND started_at IS ? AND total_records = ?',
+                (source, stats['first_timestamp'], stats['total_records']))
+            build_id = self.conn.execute(
+                'INSERT INTO builds (source, analyzed_at, started_at, finished_at, duration_seconds,'
+                ' total_records, errors, warnings) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (source, datetime.now().isoformat(timespec='seconds'), stats['first_timestamp'],
+                 stats['last_timestamp'], stats['duration_seconds'], stats['total_records'],
+                 problems['errors_count'], problems['warnings_count'])).lastrowid
+            self.conn.executemany(
+                'INSERT INTO phase_durations VALUES (?, ?, ?, ?, ?)',
+                [(build_id, phase, s['count'], s['total_seconds'], s['max_seconds'])
+                 for phase, s in results.get('phases', {}).get('summary', {}).items()])
+            self.conn.executemany(
+                'INSERT INTO category_counts VALUES (?, ?, ?)',
+                [(build_id, category, count) for category, count in results['categories'].items()])
+            for kind, key in (('errors', 'error_fingerprints'), ('warnings', 'warning_fingerprints')):
+                groups = results.get(key, [])
+                self.conn.executemany(
+                    'INSERT INTO fingerprints VALUES (?, ?, ?, ?, ?)',
+                    [(build_id, g['fingerprint'], kind, g['count'], g['first_occurrence']) for g in groups])
+                self.conn.executemany(
+                    'INSERT OR IGNORE INTO fingerprint_templates VALUES (?, ?, ?)',
+                    [(g['fingerprint'], g['template'], g['example']) for g in groups])
+        return build_id
+    
+    def builds(self, last: int = 50) -> List[Dict]:
+        """Последние сборки по времени начала (от старых к новым)"""
+        rows = self.conn.execute(
+            'SELECT * FROM builds ORDER BY started_at DESC, id DESC LIMIT ?', (last,)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+    
+    def phase_trend(self, phase: str, last: int = 50) -> List[Dict]:
+        """Длительность фазы в последних сборках"""
+        rows = self.conn.execute(
+            'SELECT b.id, b.source, b.started_at, p.count, p.total_seconds, p.max_seconds'
+            ' FROM phase_durations p JOIN builds b ON b.id = p.build_id'
+            ' WHERE p.phase = ? ORDER BY b.started_at DESC, b.id DESC LIMIT ?', (phase, last)).fetchall()
+        return [dict(row) for row in reversed(rows)]
+    
+    def fingerprint_history(self, fingerprint: str, kind: str = None) -> Dict:
+        """
+        Когда шаблон появился впервые, когда встречался последний раз и в скольких сборках
+        kind — только ошибки ('errors') или предупреждения ('warnings'); по умолчанию оба вида
+        """
+        template = self.conn.execute(
+            'SELECT * FROM fingerprint_templates WHERE fingerprint = ?', (fingerprint,)).fetchone()
+        if template is None:
+            return None
+        rows = self.conn.execute(
+            'SELECT b.id, b.source, b.started_at, SUM(f.count) AS count, MIN(f.first_occurrence) AS first_occurrence'
+            ' FROM fingerprints f JOIN builds b ON b.id = f.build_id'
+            ' WHERE f.fingerprint = ? AND (? IS NULL OR f.kind = ?)'
+            ' GROUP BY b.id ORDER BY b.started_at, b.id', (fingerprint, kind, kind)).fetchall()
+        builds = [dict(row) for row in rows]
+        return {
+            'fingerprint': fingerprint,
+            'kind': kind,
+            'template': template['template'],
+            'example': template['example'],
+            'builds': len(builds),
+            'total_count': sum(b['count'] for b in builds),
+            'first_seen': builds[0] if builds else None,
+            'last_seen': builds[-1] if builds else None,
+        }
+
+def history_path(output_file: str) -> str:
+    """База истории по умолчанию — рядом с analysis_results.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_file)), HISTORY_FILENAME)
+
+def add_history_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--history', help=f'база истории сборок (по умолчанию {HISTORY_FILENAME} рядом с результатами)')
+    parser.add_argument('--no-history', action='store_true', help='не записывать анализ в историю')
+
+def history_from_args(args: argparse.Namespace, output_file: str) -> 'HistoryStore':
+    if args.no_history:
+        return None
+    return HistoryStore(args.history or history_path(output_file))
+
+def history_main(argv: List[str]) -> None:
+    """Запросы трендов по истории сборок"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py history', description='Тренды по истории сборок')
+    parser.add_argument('--db', default=history_path(DEFAULT_OUTPUT_PATH), help='база истории сборок')
+    commands = parser.add_subparsers(dest='query', required=True)
+    builds = commands.add_parser('builds', help='длительность и ошибки последних сборок')
+    builds.add_argument('--last', type=int, default=50)
+    phase = commands.add_parser('phase', help='длительность фазы в последних сборках')
+    phase.add_argument('phase', help='фаза, например install, tsc, vite, push')
+    phase.add_argument('--last', type=int, default=50)
+    fingerprint = commands.add_parser('fingerprint', help='когда шаблон ошибки появился впервые')
+    fingerprint.add_argument('fingerprint', help='хеш шаблона из error_fingerprints')
+    fingerprint.add_argument('--kind', choices=['errors', 'warnings'], help='только ошибки или предупреждения')
+    args = parser.parse_args(argv)
+    
+    store = HistoryStore(args.db)
+    try:
+        if args.query == 'builds':
+            for b in store.builds(args.last):
+                print(f"{b['started_at']}  {b['duration_seconds']:9.1f} сек  ошибок: {b['errors']:6d}  "
+                      f"записей: {b['total_records']:8d}  {b['source']}")
+        elif args.query == 'phase':
+            for p in store.phase_trend(args.phase, args.last):
+                print(f"{p['started_at']}  {p['total_seconds']:9.1f} сек  (x{p['count']}, максимум {p['max_seconds']:.1f})  {p['source']}")
+        else:
+            info = store.fingerprint_history(args.fingerprint, args.kind)
+            if info is None or not info['builds']:
+                print(f"Шаблон {args.fingerprint} в истории не найден")
+                return
+            print(f"Шаблон: {info['template']}")
+            print(f"Пример: {info['example']}")
+            print(f"Сборок: {info['builds']}, вхождений: {info['total_count']}")
+            print(f"Впервые: {info['first_seen']['first_occurrence']} ({info['first_seen']['source']})")
+            print(f"Последний раз: {info['last_seen']['started_at']} ({info['last_seen']['source']})")
+    finally:
+        store.close()
+
+# ============================================================================
+# СРАВНЕНИЕ СБОРОК ПО ШАБЛОНАМ ОШИБОК
+# ============================================================================
+#
+# Шаблоны ошибок и предупреждений двух сборок сравниваются как множества
+# хешей: новые, исчезнувшие и изменившие число вхождений — за время, линейное
+# по числу различных шаблонов. Сборка задаётся готовым analysis_results.json
+# или логом; лог анализируется только на шаблоны и через кэш результатов,
+# если он указан, так что уже разобранный лог повторно не читается.
+
+FINGERPRINT_KINDS = (('errors', 'error_fingerprints'), ('warnings', 'warning_fingerprints'))
+
+_LOG_RECORD_HEAD_RE = re.compile(r'\{\s*"(?:timestamp|stream|content)"\s*:')
+
+def load_fingerprints(path: str, cache: 'ResultCache' = None) -> Dict[str, List[Dict]]:
+    """Шаблоны сборки по виду (errors/warnings): из analysis_results.json или анализом лога"""
+    results = None
+    if detect_compression(path) is None:
+        with open(path, 'r', encoding='utf-8') as f:
+            head = f.read(4096).lstrip()
+        # Лог — JSON-массив записей или NDJSON ('{"timestamp": ...'), результаты — один объект
+        if head.startswith('{') and not _LOG_RECORD_HEAD_RE.match(head):
+            with open(path, 'r', encoding='utf-8') as f:
+                results = json.load(f)
+    if results is None:
+        results = analyze_file(path, cache, sections=[key for _, key in FINGERPRINT_KINDS])
+    missing = [key for _, key in FINGERPRINT_KINDS if key not in results]
+    if missing:
+        raise ValueError(f"{path}: в результатах нет разделов {', '.join(missing)} — проанализируйте лог заново")
+    return {kind: results[key] for kind, key in FINGERPRINT_KINDS}
+
+def _diff_entry(base: Optional[Dict], new: Optional[Dict]) -> Dict:
+    group = new or base
+    entry = {
+        'fingerprint': group['fingerprint'],
+        'template': group['template'],
+        'base_count': base['count'] if base else 0,
+        'new_count': new['count'] if new else 0,
+    }
+    entry['delta'] = entry['new_count'] - entry['base_count']
+    if (base and base.get('error')) or (new and new.get('error')):
+        # Счёт из Space-Saving — оценка сверху с погрешностью error
+        entry['approximate'] = True
+    entry['example'] = group['example']
+    entry['samples'] = group.get('samples', [])
+    return entry
+
+def diff_fingerprints(base: List[Dict], new: List[Dict], min_delta: int = 1) -> Dict:
+    """Новые, исчезнувшие и изменившиеся по числу вхождений шаблоны одного вида"""
+    base_by_key = {group['fingerprint']: group for group in base}
+    new_by_key = {group['fingerprint']: group for group in new}
+    base_keys, new_keys = base_by_key.keys(), new_by_key.keys()
+    added = [_diff_entry(None, new_by_key[key]) for key in new_keys - base_keys]
+    resolved = [_diff_entry(base_by_key[key], None) for key in base_keys - new_keys]
+    changed = []
+    unchanged = 0
+    for key in new_keys & base_keys:
+        entry = _diff_entry(base_by_key[key], new_by_key[key])
+        if abs(entry['delta']) >= min_delta:
+            changed.append(entry)
+        else:
+            unchanged += 1
+    return {
+        'new': sorted(added, key=lambda e: (-e['new_count'], e['fingerprint'])),
+        'resolved': sorted(resolved, key=lambda e: (-e['base_count'], e['fingerprint'])),
+        'changed': sorted(changed, key=lambda e: (-abs(e['delta']), e['fingerprint'])),
+        'unchanged': unchanged,
+    }
+
+def diff_builds(base_path: str, new_path: str, cache: 'ResultCache' = None, min_delta: int = 1) -> Dict:
+    base = load_fingerprints(base_path, cache)
+    new = load_fingerprints(new_path, cache)
+    diff = {'base': base_path, 'new': new_path}
+    for kind, _ in FINGERPRINT_KINDS:
+        diff[kind] = diff_fingerprints(base[kind], new[kind], min_delta)
+    return diff
+
+def print_diff(diff: Dict, top: int = 10) -> None:
+    titles = {'errors': 'ОШИБКИ', 'warnings': 'ПРЕДУПРЕЖДЕНИЯ'}
+    for kind, _ in FINGERPRINT_KINDS:
+        d = diff[kind]
+        _print_header(f"{titles[kind]}: новых {len(d['new'])}, исчезло {len(d['resolved'])}, "
+                      f"изменилось {len(d['changed'])}, без изменений {d['unchanged']}")
+        for label, entries, field in (('Новые', d['new'], 'new_count'), ('Исчезли', d['resolved'], 'base_count')):
+            if entries:
+                print(f"\n{label}:")
+            for e in entries[:top]:
+                print(f"  [{e['fingerprint']}] x{e[field]}  {e['template'][:120]}")
+                print(f"      Пример: {e['example'][:150]}")
+        if d['changed']:
+            print("\nИзменилось число вхождений:")
+        for e in d['changed'][:top]:
+            mark = ' ~' if e.get('approximate') else ''
+            print(f"  [{e['fingerprint']}] {e['base_count']} -> {e['new_count']} ({e['delta']:+d}){mark}  "
+                  f"{e['template'][:100]}")
+
+def diff_main(argv: List[str]) -> None:
+    """Сравнение двух сборок по шаблонам ошибок; код выхода 1 при новых ошибках (с --fail-on-new)"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py diff', description='Сравнение шаблонов ошибок двух сборок')
+    parser.add_argument('base', help='базовая сборка (последняя зелёная): лог или analysis_results.json')
+    parser.add_argument('new', help='новая сборка: лог или analysis_results.json')
+    parser.add_argument('--min-delta', type=int, default=1, help='минимальное изменение числа вхождений')
+    parser.add_argument('--top', type=int, default=10, help='сколько шаблонов каждого списка показать')
+    parser.add_argument('-o', '--output', help='сохранить сравнение в JSON')
+    parser.add_argument('--json', action='store_true', help='вывести сравнение в JSON')
+    parser.add_argument('--fail-on-new', action='store_true', help='код выхода 1, если появились новые ошибки')
+    add_cache_arguments(parser)
+    args = parser.parse_args(argv)
+    
+    diff = diff_builds(args.base, args.new, cache_from_args(args), args.min_delta)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(diff, f, ensure_ascii=False, indent=2)
+    if args.json:
+        print(json.dumps(diff, ensure_ascii=False, indent=2))
+    else:
+        print_diff(diff, args.top)
+    if args.fail_on_new and diff['errors']['new']:
+        sys.exit(1)
+
+# ============================================================================
+# ИНДЕКС ЛОГОВ ДЛЯ ПОИСКА ПРИ ИНЦИДЕНТАХ
+# ============================================================================
+#
+# Лог индексируется один раз в базу SQLite: записи (время, поток, категория,
+# номер строки), агрегаты по минутным корзинам (поток × категория) и
+# инвертированный индекс токенов и кодов ошибок (TS2322, ENOENT, ERR_...).
+# Строки без ANSI-кодов хранятся один раз на всю базу: одинаковые строки
+# разных сборок (а их большинство) делят текст и записи в индексе токенов, а
+# регулярное выражение проверяется по уникальным строкам, а не по записям.
+# Строка ищется по 64-битному хешу текста, но совпадение хеша проверяется
+# сравнением самого текста: при коллизии строки получают разные id.
+# Число записей без фильтров по тексту берётся из агрегатов по целым корзинам
+# интервала; записи читаются только для неполных корзин на его краях.
+# Строки переиндексированных сборок остаются в базе, но в ответы не попадают.
+
+INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS builds (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    file_size INTEGER NOT NULL,
+    file_mtime REAL NOT NULL,
+    indexed_at TEXT NOT NULL,
+    started_ns INTEGER,
+    finished_ns INTEGER,
+    total_records INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS builds_source ON builds (source);
+
+CREATE TABLE IF NOT EXISTS labels (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    digest INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lines_digest ON lines (digest);
+
+CREATE TABLE IF NOT EXISTS records (
+    build_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    ts_ns INTEGER NOT NULL,
+    stream INTEGER NOT NULL,
+    category INTEGER NOT NULL,
+    line_id INTEGER NOT NULL,
+    PRIMARY KEY (build_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS records_line ON records (line_id, build_id);
+CREATE INDEX IF NOT EXISTS records_time ON records (build_id, ts_ns);
+
+CREATE TABLE IF NOT EXISTS rollups (
+    build_id INTEGER NOT NULL,
+    bucket_ns INTEGER NOT NULL,
+    stream INTEGER NOT NULL,
+    category INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (build_id, bucket_ns, stream, category)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS tokens (
+    id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS postings (
+    token_id INTEGER NOT NULL,
+    line_id INTEGER NOT NULL,
+    PRIMARY KEY (token_id, line_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS codes (
+    code TEXT NOT NULL,
+    line_id INTEGER NOT NULL,
+    PRIMARY KEY (code, line_id)
+) WITHOUT ROWID;
+"""
+
+# Версия схемы (PRAGMA user_version). 0 — первая схема: digest строки был UNIQUE
+INDEX_SCHEMA_VERSION = 1
+_INDEX_MIGRATIONS = {
+    0: """
+ALTER TABLE lines RENAME TO lines_v0;
+CREATE TABLE lines (
+    id INTEGER PRIMARY KEY,
+    digest INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+INSERT INTO lines (id, digest, content) SELECT id, digest, content FROM lines_v0;
+DROP TABLE lines_v0;
+""",
+}
+
+INDEX_FILENAME = 'log_index.sqlite'
+ROLLUP_BUCKET_SECONDS = 60
+
+# Токены: слова из букв, цифр и '_' в нижнем регистре; чисто числовые не индексируются
+INDEX_TOKEN_RE = re.compile(r'\w{2,40}')
+# Коды ошибок: диагностики tsc, коды ошибок node/npm (ENOENT, E404), коды ERR_*
+ERROR_CODE_RE = re.compile(r'\b(?:TS\d{4,5}|E[A-Z]{3,12}|E\d{3}|ERR_[A-Z0-9_]+)\b')
+# Слова, похожие на коды node, но ими не являющиеся
+_NOT_ERROR_CODES = frozenset(('ERROR', 'ERRORS', 'EXCEPTION', 'EXPECTED', 'EXIT', 'EXPOSE', 'ENTRYPOINT',
+                              'END', 'EOF', 'ENV', 'EMPTY', 'ENABLED', 'EVERY', 'EXEC'))
+
+def index_path(output_file: str) -> str:
+    """База индекса по умолчанию — рядом с analysis_results.json"""
+    return os.path.join(os.path.dirname(os.path.abspath(output_file)), INDEX_FILENAME)
+
+def parse_time_arg(value: str) -> int:
+    """Граница --since/--until: YYYY-MM-DD, YYYY-MM-DD HH:MM или полный timestamp"""
+    value = value.strip().replace(' ', 'T')
+    if len(value) == 10:
+        value += 'T00:00:00'
+    elif len(value) == 16:
+        value += ':00'
+    return parse_timestamp_ns(value)
+
+def line_tokens(clean: str) -> set:
+    return {token for token in INDEX_TOKEN_RE.findall(clean.lower()) if not token.isdigit()}
+
+def line_codes(clean: str) -> set:
+    return {code for code in ERROR_CODE_RE.findall(clean) if code not in _NOT_ERROR_CODES}
+
+class LogIndex:
+    """Индекс записей сборок в SQLite: агрегаты по времени, токены и коды ошибок"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self._migrate()
+        self.conn.executescript(INDEX_SCHEMA)
+        self.conn.execute(f'PRAGMA user_version = {INDEX_SCHEMA_VERSION}')
+        self.conn.executescript(
+            'CREATE TEMP TABLE IF NOT EXISTS query_lines (line_id INTEGER PRIMARY KEY);'
+            'CREATE TEMP TABLE IF NOT EXISTS query_builds (build_id INTEGER PRIMARY KEY);')
+        self._ids = {'labels': {}, 'tokens': {}}
+    
+    def close(self) -> None:
+        self.conn.close()
+    
+    def _migrate(self) -> None:
+        """Перевод базы, созданной прежней версией, на текущую схему"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        exists = self.conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'lines'").fetchone()
+        if not exists:
+            return
+        for step in range(version, INDEX_SCHEMA_VERSION):
+            self.conn.executescript(_INDEX_MIGRATIONS[step])
+    
+    def _id(self, table: str, column: str, value: str) -> int:
+        """id строки справочника (labels, tokens), при необходимости добавленной"""
+        cache = self._ids[table]
+        row_id = cache.get(value)
+        if row_id is None:
+            self.conn.execute(f'INSERT OR IGNORE INTO {table} ({column}) VALUES (?)', (value,))
+            row_id = self.conn.execute(f'SELECT id FROM {table} WHERE {column} = ?', (value,)).fetchone()[0]
+            cache[value] = row_id
+        return row_id
+    
+    def _lookup(self, table: str, column: str, value: str) -> Optional[int]:
+        row = self.conn.execute(f'SELECT id FROM {table} WHERE {column} = ?', (value,)).fetchone()
+        return row[0] if row is not None else None
+    
+    def _line_id(self, clean: str) -> int:
+        """id строки в общей таблице; новая строка сразу попадает в индекс токенов и кодов"""
+        digest = _stable_hash(clean) - (1 << 63)   # в знаковый диапазон INTEGER
+        for line_id, content in self.conn.execute('SELECT id, content FROM lines WHERE digest = ?',
+                                                  (digest,)).fetchall():
+            if content == clean:   # хеш не уникален: другая строка с тем же хешем — не она
+                return line_id
+        line_id = self.conn.execute('INSERT INTO lines (digest, content) VALUES (?, ?)', (digest, clean)).lastrowid
+        self.conn.executemany('INSERT INTO postings VALUES (?, ?)',
+                              [(self._id('tokens', 'token', t), line_id) for t in line_tokens(clean)])
+        self.conn.executemany('INSERT INTO codes VALUES (?, ?)', [(code, line_id) for code in line_codes(clean)])
+        return line_id
+    
+    def is_indexed(self, filepath: str) -> bool:
+        """Лог уже в индексе и с тех пор не менялся (размер и mtime)"""
+        stat = os.stat(filepath)
+        row = self.conn.execute(
+            'SELECT 1 FROM builds WHERE source = ? AND file_size = ? AND file_mtime = ?',
+            (os.path.abspath(filepath), stat.st_size, stat.st_mtime)).fetchone()
+        return row is not None
+    
+    def add_log(self, filepath: str, batch_size: int = 10000) -> Dict:
+        """Индексация лога (прежний индекс того же файла заменяется); возвращает сводку"""
+        source = os.path.abspath(filepath)
+        stat = os.stat(filepath)
+        bucket_ns = ROLLUP_BUCKET_SECONDS * NS_PER_SECOND
+        line_ids = {}
+        rollups = Counter()
+        records = []
+        first = last = None
+        seq = 0
+        with self.conn:
+            for (old_id,) in self.conn.execute('SELECT id FROM builds WHERE source = ?', (source,)).fetchall():
+                for table in ('records', 'rollups'):
+                    self.conn.execute(f'DELETE FROM {table} WHERE build_id = ?', (old_id,))
+                self.conn.execute('DELETE FROM builds WHERE id = ?', (old_id,))
+            build_id = self.conn.execute(
+                'INSERT INTO builds (source, file_size, file_mtime, indexed_at) VALUES (?, ?, ?, ?)',
+                (source, stat.st_size, stat.st_mtime, datetime.now().isoformat(timespec='seconds'))).lastrowid
+            intern = LineTable().intern
+            for raw in iter_records(filepath):
+                rec = LogRecord(raw, intern(raw['content']))
+                clean = rec.clean
+                line_id = line_ids.get(clean)
+                if line_id is None:
+                    line_id = line_ids[clean] = self._line_id(clean)
+                ts = rec.ts_ns
+                if first is None:
+                    first = ts
+                last = ts
+                stream = self._id('labels', 'name', rec.stream)
+                category = self._id('labels', 'name', rec.level)
+                rollups[(ts - ts % bucket_ns, stream, category)] += 1
+                records.append((build_id, seq, ts, stream, category, line_id))
+                seq += 1
+                if len(records) >= batch_size:
+                    self.conn.executemany('INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)', records)
+                    records = []
+            self.conn.executemany('INSERT INTO records VALUES (?, ?, ?, ?, ?, ?)', records)
+            self.conn.executemany('INSERT INTO rollups VALUES (?, ?, ?, ?, ?)',
+                                  [(build_id, *key, count) for key, count in rollups.items()])
+            self.conn.execute('UPDATE builds SET started_ns = ?, finished_ns = ?, total_records = ? WHERE id = ?',
+                              (first, last, seq, build_id))
+        return {'build_id': build_id, 'source': source, 'records': seq, 'lines': len(line_ids)}
+    
+    def builds(self, build: str = None, since_ns: int = None, until_ns: int = None) -> List[Dict]:
+        """Сборки по id или подстроке пути и пересечению с интервалом времени"""
+        sql = 'SELECT * FROM builds WHERE 1'
+        params = []
+        if build:
+            if build.isdigit():
+                sql += ' AND id = ?'
+                params.append(int(build))
+            else:
+                sql += ' AND source LIKE ?'
+                params.append(f'%{build}%')
+        if since_ns is not None:
+            sql += ' AND finished_ns >= ?'
+            params.append(since_ns)
+        if until_ns is not None:
+            sql += ' AND started_ns < ?'
+            params.append(until_ns)
+        return [dict(row) for row in self.conn.execute(sql + ' ORDER BY started_ns, id', params)]
+    
+    def _candidate_lines(self, codes: Iterable[str], tokens: Iterable[str], regex: 're.Pattern') -> Optional[set]:
+        """id строк, подходящих под коды, токены и выражение (None — любые строки)"""
+        lines = None
+        postings = [('SELECT line_id FROM codes WHERE code = ?', code) for code in codes]
+        for token in tokens:
+            token_id = self._lookup('tokens', 'token', token.lower())
+            if token_id is None:
+                return set()
+            postings.append(('SELECT line_id FROM postings WHERE token_id = ?', token_id))
+        for sql, value in postings:
+            found = {row[0] for row in self.conn.execute(sql, (value,))}
+            lines = found if lines is None else lines & found
+            if not lines:
+                return lines
+        if regex is not None:
+            if lines is None:
+                rows = self.conn.execute('SELECT id, content FROM lines')
+            else:
+                self._fill('query_lines', lines)
+                rows = self.conn.execute('SELECT l.id, l.content FROM query_lines q JOIN lines l ON l.id = q.line_id')
+            lines = {line_id for line_id, content in rows if regex.search(content)}
+        return lines
+    
+    def _fill(self, table: str, ids: Iterable[int]) -> None:
+        self.conn.execute(f'DELETE FROM {table}')
+        self.conn.executemany(f'INSERT INTO {table} VALUES (?)', ((i,) for i in ids))
+    
+    def query(self, since_ns: int = None, until_ns: int = None, streams: Iterable[str] = (),
+              categories: Iterable[str] = (), codes: Iterable[str] = (), tokens: Iterable[str] = (),
+              regex: str = None, build: str = None, limit: int = 100) -> Dict:
+        """Записи сборок под всеми фильтрами: первые limit записей и общее число совпадений"""
+        builds = self.builds(build, since_ns, until_ns)
+        lines = self._candidate_lines(codes, tokens, re.compile(regex) if regex else None)
+        if not builds or (lines is not None and not lines):
+            return {'total': 0, 'records': []}
+        label_where, label_params = self._label_filter(streams, categories)
+        time_where, time_params = [], []
+        if since_ns is not None:
+            time_where.append('r.ts_ns >= ?')
+            time_params.append(since_ns)
+        if until_ns is not None:
+            time_where.append('r.ts_ns < ?')
+            time_params.append(until_ns)
+        where, params = time_where + label_where, time_params + label_params
+        
+        self._fill('query_builds', (b['id'] for b in builds))
+        if lines is None:
+            total = self._count_rollups(since_ns, until_ns, label_where, label_params)
+            source = 'records r INDEXED BY records_time' if time_where else 'records r'
+        else:
+            self._fill('query_lines', lines)
+            total = self.conn.execute(
+                'SELECT COUNT(*) FROM query_lines q CROSS JOIN records r INDEXED BY records_line'
+                ' ON r.line_id = q.line_id JOIN query_builds qb ON qb.build_id = r.build_id' + ''.join(f' AND {w}' for w in where),
+                params).fetchone()[0]
+            # Порядок соединения фиксирован: от найденных строк к записям по индексу records_line
+            source = 'query_lines q CROSS JOIN records r INDEXED BY records_line ON r.line_id = q.line_id'
+        
+        labels = {row['id']: row['name'] for row in self.conn.execute('SELECT id, name FROM labels')}
+        matches = []
+        for b in builds:
+            if len(matches) >= min(limit, total):
+                break
+            condition = ' AND '.join(['r.build_id = ?'] + where)
+            rows = self.conn.execute(
+                f'SELECT r.seq, r.ts_ns, r.stream, r.category, l.content FROM {source}'
+                f' JOIN lines l ON l.id = r.line_id WHERE {condition} ORDER BY r.seq LIMIT ?',
+                [b['id']] + params + [limit - len(matches)])
+            matches.extend({'build_id': b['id'], 'source': b['source'], 'seq': row['seq'],
+                            'timestamp': format_timestamp_ns(row['ts_ns']), 'stream': labels[row['stream']],
+                            'category': labels[row['category']], 'content': row['content']} for row in rows)
+        return {'total': total, 'records': matches}
+    
+    def _label_filter(self, streams: Iterable[str], categories: Iterable[str]) -> Tuple[List[str], List[int]]:
+        """Условия по потоку и категории (одинаковые для records и rollups)"""
+        where, params = [], []
+        for column, names in (('stream', streams), ('category', categories)):
+            values = [self._lookup('labels', 'name', name) or -1 for name in names]
+            if values:
+                where.append(f"r.{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        return where, params
+    
+    def _count_records(self, start_ns: Optional[int], end_ns: Optional[int],
+                       label_where: List[str], label_params: List[int]) -> int:
+        """Число записей сборок query_builds в интервале [start_ns, end_ns) — по индексу records_time"""
+        where, params = [], []
+        if start_ns is not None:
+            where.append('r.ts_ns >= ?')
+            params.append(start_ns)
+        if end_ns is not None:
+            where.append('r.ts_ns < ?')
+            params.append(end_ns)
+        where.extend(label_where)
+        params.extend(label_params)
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM query_builds qb CROSS JOIN records r INDEXED BY records_time ON r.build_id = qb.build_id'
+            + ''.join(f' AND {w}' for w in where), params).fetchone()[0]
+    
+    def _count_rollups(self, since_ns: Optional[int], until_ns: Optional[int],
+                       label_where: List[str], label_params: List[int]) -> int:
+        """Число записей сборок query_builds: целые корзины из агрегатов, края интервала — по записям"""
+        bucket_ns = ROLLUP_BUCKET_SECONDS * NS_PER_SECOND
+        full_start = None if since_ns is None else -(-since_ns // bucket_ns) * bucket_ns
+        full_end = None if until_ns is None else until_ns - until_ns % bucket_ns
+        if full_start is not None and full_end is not None and full_start >= full_end:
+            return self._count_records(since_ns, until_ns, label_where, label_params)
+        where, params = list(label_where), list(label_params)
+        if full_start is not None:
+            where.append('r.bucket_ns >= ?')
+            params.append(full_start)
+        if full_end is not None:
+            where.append('r.bucket_ns < ?')
+            params.append(full_end)
+        total = self.conn.execute(
+            'SELECT COALESCE(SUM(r.count), 0) FROM query_builds qb JOIN rollups r ON r.build_id = qb.build_id'
+            + ''.join(f' AND {w}' for w in where), params).fetchone()[0]
+        if since_ns is not None and since_ns < full_start:
+            total += self._count_records(since_ns, full_start, label_where, label_params)
+        if until_ns is not None and full_end < until_ns:
+            total += self._count_records(full_end, until_ns, label_where, label_params)
+        return total
+    
+    def counts(self, since_ns: int = None, until_ns: int = None, streams: Iterable[str] = (),
+               categories: Iterable[str] = (), build: str = None) -> Dict:
+        """
+        Число записей по минутным корзинам и категориям — только из агрегатов
+        Границы интервала округляются до корзин
+        """
+        bucket_ns = ROLLUP_BUCKET_SECONDS * NS_PER_SECOND
+        where, params = [], []
+        if since_ns is not None:
+            where.append('r.bucket_ns >= ?')
+            params.append(since_ns - since_ns % bucket_ns)
+        if until_ns is not None:
+            where.append('r.bucket_ns < ?')
+            params.append(until_ns)
+        label_where, label_params = self._label_filter(streams, categories)
+        where.extend(label_where)
+        params.extend(label_params)
+        self._fill('query_builds', (b['id'] for b in self.builds(build, since_ns, until_ns)))
+        rows = self.conn.execute(
+            'SELECT r.bucket_ns, l.name AS category, SUM(r.count) AS count'
+            ' FROM query_builds qb JOIN rollups r ON r.build_id = qb.build_id JOIN labels l ON l.id = r.category'
+            + ''.join(f' AND {w}' for w in where) + ' GROUP BY r.bucket_ns, l.name', params)
+        buckets = defaultdict(dict)
+        totals = Counter()
+        for row in rows:
+            buckets[row['bucket_ns']][row['category']] = row['count']
+            totals[row['category']] += row['count']
+        return {
+            'bucket_seconds': ROLLUP_BUCKET_SECONDS,
+            'totals': dict(totals.most_common()),
+            'buckets': [{'start': format_timestamp_ns(ns), **dict(sorted(counts.items()))}
+                        for ns, counts in sorted(buckets.items())],
+        }
+
+def index_main(argv: List[str]) -> None:
+    """Индексация логов сборок для быстрых запросов (один раз на лог)"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py index', description='Индексация логов сборок')
+    parser.add_argument('logs', nargs='+', help='логи сборок (маски раскрываются: builds/*.log)')
+    parser.add_argument('--db', default=index_path(DEFAULT_OUTPUT_PATH), help='база индекса')
+    parser.add_argument('--force', action='store_true', help='переиндексировать и неизменившиеся логи')
+    args = parser.parse_args(argv)
+    
+    filepaths = sorted({path for pattern in args.logs for path in (glob.glob(pattern) or [pattern])})
+    index = LogIndex(args.db)
+    try:
+        for filepath in filepaths:
+            if not args.force and index.is_indexed(filepath):
+                print(f"[=] {filepath}: уже в индексе")
+                continue
+            started = time.perf_counter()
+            info = index.add_log(filepath)
+            print(f"[+] {filepath}: сборка #{info['build_id']}, записей: {info['records']}, "
+                  f"уникальных строк: {info['lines']} ({time.perf_counter() - started:.1f} сек)")
+    finally:
+        index.close()
+
+def query_main(argv: List[str]) -> None:
+    """Запросы к индексу: время, поток, категория, код ошибки, токены и выражение"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py query', description='Поиск по индексу логов сборок')
+    parser.add_argument('--db', default=index_path(DEFAULT_OUTPUT_PATH), help='база индекса')
+    parser.add_argument('--since', type=parse_time_arg, help='не раньше (YYYY-MM-DD[ HH:MM[:SS]], UTC)')
+    parser.add_argument('--until', type=parse_time_arg, help='раньше чем')
+    parser.add_argument('--build', help='сборка: id или подстрока пути лога')
+    parser.add_argument('--stream', action='append', default=[], help='поток (stdout/stderr), можно несколько')
+    parser.add_argument('--category', action='append', default=[], help='категория (ERROR, WARN, NPM, ...)')
+    parser.add_argument('--code', action='append', default=[], help='код ошибки (TS2322, ENOENT, ...)')
+    parser.add_argument('--token', action='append', default=[], help='слово в строке (все слова обязательны)')
+    parser.add_argument('--regex', help='регулярное выражение по тексту строки')
+    parser.add_argument('--limit', type=int, default=50, help='сколько записей вывести')
+    parser.add_argument('--counts', action='store_true', help='только число записей по минутам (из агрегатов)')
+    parser.add_argument('--builds', action='store_true', help='список проиндексированных сборок')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    args = parser.parse_args(argv)
+    
+    if not os.path.exists(args.db):
+        parser.error(f'база индекса не найдена: {args.db} (сначала analyze_logs.py index ЛОГИ)')
+    index = LogIndex(args.db)
+    started = time.perf_counter()
+    try:
+        if args.builds:
+            result = index.builds(args.build, args.since, args.until)
+        elif args.counts:
+            if args.code or args.token or args.regex:
+                parser.error('--counts считается по агрегатам и не сочетается с --code/--token/--regex')
+            result = index.counts(args.since, args.until, args.stream, args.category, args.build)
+        else:
+            result = index.query(args.since, args.until, args.stream, args.category, args.code,
+                                 args.token, args.regex, args.build, args.limit)
+    finally:
+        index.close()
+    elapsed = (time.perf_counter() - started) * 1000
+    
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.builds:
+        for b in result:
+            started_at = format_timestamp_ns(b['started_ns']) if b['started_ns'] is not None else '-'
+            print(f"#{b['id']:<5} {started_at}  записей: {b['total_records']:8d}  {b['source']}")
+    elif args.counts:
+        for bucket in result['buckets']:
+            start = bucket.pop('start')
+            print(f"{start[:16]}  " + '  '.join(f"{k}: {v}" for k, v in bucket.items()))
+        print(f"Итого: {result['totals']}")
+    else:
+        for r in result['records']:
+            print(f"#{r['build_id']} [{r['timestamp']}] {r['stream']:<6} {r['category']:<6} {r['content'][:200]}")
+        print(f"Совпадений: {result['total']}, показано: {len(result['records'])}")
+    print(f"[OK] Запрос выполнен за {elapsed:.1f} мс", file=sys.stderr)
+
+# ============================================================================
+# ЛОКАЛЬНЫЙ СЕРВИС АНАЛИЗА
+# ============================================================================
+#
+# Долгоживущий процесс отвечает на запросы дашборда и CI в JSON по HTTP (TCP
+# или Unix-сокет), не запуская Python на каждый вопрос. Разобранные сборки
+# (колоночное LogStore + результаты анализа) держатся в LRU-кэше с лимитом
+# памяти: лог читается один раз, пока он не изменится (размер, mtime) или не
+# будет вытеснен. Запросы обслуживаются потоками; одновременные запросы к
+# ещё не разобранной сборке ждут один общий разбор. Логи берутся только из
+# каталога --root.
+
+SERVICE_MEMORY_BYTES = 512 * 1024 * 1024
+SERVICE_PORT = 8765
+
+class ParsedBuild:
+    """Разобранная сборка: колонки лога, результаты анализа, индексы проблем"""
+    
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.store = load_log_store(filepath)
+        # Результаты — по уже загруженным колонкам: файл читается один раз
+        stages = default_stages()
+        feed_pipeline(self.store, stages)
+        self.results = build_results(stages)
+        self.problems = self.store.find_problems()
+        self.loaded_at = datetime.now().isoformat(timespec='seconds')
+        self.hits = 0
+        # Оценка занимаемой памяти: буферы хранилища, индексы проблем, размер результатов в JSON
+        self.nbytes = (self.store.nbytes()
+                       + sum(indices.itemsize * len(indices) + 8 * len(labels)
+                             for indices, labels in self.problems.values())
+                       + len(json.dumps(self.results, ensure_ascii=False, default=str)))
+
+class BuildCache:
+    """LRU разобранных сборок с лимитом памяти; безопасен для нескольких потоков"""
+    
+    def __init__(self, max_bytes: int = SERVICE_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.builds: 'OrderedDict[Tuple, ParsedBuild]' = OrderedDict()
+        self.nbytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._loading: Dict[Tuple, Future] = {}
+    
+    def get(self, filepath: str) -> ParsedBuild:
+        stat = os.stat(filepath)
+        key = (filepath, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            build = self.builds.get(key)
+            if build is not None:
+                self.builds.move_to_end(key)
+                build.hits += 1
+                return build
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = self._loading[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            build = ParsedBuild(filepath)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._loading[key]
+            # Прежняя версия изменившегося лога больше не нужна
+            for old in [k for k in self.builds if k[0] == filepath]:
+                self.nbytes -= self.builds.pop(old).nbytes
+            self.builds[key] = build
+            self.nbytes += build.nbytes
+            self.loads += 1
+            while self.nbytes > self.max_bytes and len(self.builds) > 1:
+                _, evicted = self.builds.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        future.set_result(build)
+        return build
+    
+    def info(self) -> Dict:
+        with self._lock:
+            return {
+                'memory_bytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'builds': [{'log': b.filepath, 'records': len(b.store), 'bytes': b.nbytes,
+                            'loaded_at': b.loaded_at, 'hits': b.hits} for b in reversed(self.builds.values())],
+            }
+
+class ServiceError(Exception):
+    """Ошибка запроса к сервису: HTTP-статус и сообщение"""
+    
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def _int_param(params: Dict[str, str], name: str, default: int) -> int:
+    """Неотрицательный целый параметр запроса (offset, limit): отрицательный срез вернул бы чужие записи"""
+    try:
+        value = int(params.get(name, default))
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ServiceError(400, f'параметр {name} должен быть неотрицательным целым числом')
+    return value
+
+def _page(items: List, params: Dict[str, str], default_limit: int = 50) -> Dict:
+    offset = _int_param(params, 'offset', 0)
+    limit = _int_param(params, 'limit', default_limit)
+    return {'total': len(items), 'offset': offset, 'items': items[offset:offset + limit]}
+
+def _endpoint_stats(build: ParsedBuild, params: Dict[str, str]) -> Dict:
+    return {'stats': build.results['stats'], 'categories': build.results['categories'],
+            'phases': build.results['phases']['summary']}
+
+def _endpoint_problems(build: ParsedBuild, params: Dict[str, str]) -> Dict:
+    group = params.get('group')
+    if group is None:
+        return build.results['problems']
+    if group not in build.problems:
+        raise ServiceError(400, f"неизвестная группа {group}; группы: {', '.join(PROBLEM_GROUPS)}")
+    indices, labels = build.problems[group]
+    offset = _int_param(params, 'offset', 0)
+    limit = _int_param(params, 'limit', 50)
+    store = build.store
+    items = [dict(store[i], label=labels[n]) for n, i in enumerate(indices[offset:offset + limit], offset)]
+    return {'group': group, 'total': len(indices), 'offset': offset, 'items': items}
+
+def _endpoint_timeline(build: ParsedBuild, params: Dict[str, str]) -> Dict:
+    return {'total': build.results['_timeline_total'], 'timeline': build.results['timeline']}
+
+def _endpoint_gaps(build: ParsedBuild, params: Dict[str, str]) -> Dict:
+    try:
+        threshold = float(params.get('threshold', 30))
+    except ValueError:
+        raise ServiceError(400, 'параметр threshold должен быть числом')
+    page = _page(build.store.time_gaps(threshold), params, 20)
+    return dict(page, threshold_seconds=threshold, distribution=build.results['gap_distribution'])
+
+# Агрегаты: параметр kind -> ключ полного списка групп в результатах
+SERVICE_AGGREGATES = {
+    'errors': '_error_groups',
+    'deprecated': '_deprecated_groups',
+    'error_fingerprints': 'error_fingerprints',
+    'warning_fingerprints': 'warning_fingerprints',
+}
+
+def _endpoint_aggregates(build: ParsedBuild, params: Dict[str, str]) -> Dict:
+    kind = params.get('kind', 'error_fingerprints')
+    if kind not in SERVICE_AGGREGATES:
+        raise ServiceError(400, f"неизвестный вид {kind}; виды: {', '.join(SERVICE_AGGREGATES)}")
+    return dict(_page(build.results[SERVICE_AGGREGATES[kind]], params, 20), kind=kind,
+                accuracy=build.results.get('accuracy', {}).get(
+                    {'errors': 'error_aggregated', 'deprecated': 'deprecated_aggregated'}.get(kind, kind)))
+
+# Эндпоинты по сборке: путь -> обработчик(сборка, параметры запроса)
+SERVICE_ENDPOINTS = {
+    '/stats': _endpoint_stats,
+    '/problems': _endpoint_problems,
+    '/timeline': _endpoint_timeline,
+    '/gaps': _endpoint_gaps,
+    '/aggregates': _endpoint_aggregates,
+}
+
+class AnalysisService:
+    """Разбор запросов: путь и параметры -> JSON-ответ (не зависит от транспорта)"""
+    
+    def __init__(self, root: str, builds: BuildCache):
+        self.root = os.path.realpath(root)
+        self.builds = builds
+    
+    def resolve_log(self, log: Optional[str]) -> str:
+        if not log:
+            raise ServiceError(400, 'не указан параметр log')
+        path = os.path.realpath(os.path.join(self.root, log))
+        if os.path.commonpath([self.root, path]) != self.root:
+            raise ServiceError(403, 'лог вне каталога --root')
+        if not os.path.isfile(path):
+            raise ServiceError(404, f'лог не найден: {log}')
+        return path
+    
+    def handle(self, target: str) -> Tuple[int, Dict]:
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        try:
+            if url.path == '/health':
+                return 200, {'status': 'ok'}
+            if url.path == '/builds':
+                return 200, self.builds.info()
+            endpoint = SERVICE_ENDPOINTS.get(url.path)
+            if endpoint is None:
+                raise ServiceError(404, f"неизвестный путь; доступны: /health, /builds, {', '.join(SERVICE_ENDPOINTS)}")
+            build = self.builds.get(self.resolve_log(params.get('log')))
+            return 200, endpoint(build, params)
+        except ServiceError as e:
+            return e.status, {'error': str(e)}
+        except (ValueError, OSError) as e:
+            return 422, {'error': f'{type(e).__name__}: {e}'}
+        except Exception as e:
+            # Ошибка в коде сервиса: запрос получает 500, сервис продолжает работать
+            print(f"[ERROR] {target}: {type(e).__name__}: {e}\n{traceback.format_exc()}", file=sys.stderr, end='')
+            return 500, {'error': f'внутренняя ошибка сервиса: {type(e).__name__}'}
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """HTTP-обработчик: GET -> AnalysisService.handle (self.server.service)"""
+    protocol_version = 'HTTP/1.1'
+    
+    def do_GET(self) -> None:
+        status, payload = self.server.service.handle(self.path)
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def address_string(self) -> str:
+        # У клиентов Unix-сокета нет адреса
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def serve_main(argv: List[str]) -> None:
+    """Режим serve: локальный JSON-сервис по разобранным сборкам"""
+    parser = argparse.ArgumentParser(prog='analyze_logs.py serve', description='Локальный сервис анализа логов')
+    parser.add_argument('--host', default='127.0.0.1', help='адрес (по умолчанию только локальный)')
+    parser.add_argument('--port', type=int, default=SERVICE_PORT, help='порт HTTP')
+    parser.add_argument('--socket', help='слушать Unix-сокет вместо TCP')
+    parser.add_argument('--root', default='.', help='каталог, из которого разрешено читать логи')
+    parser.add_argument('--memory-mb', type=int, default=SERVICE_MEMORY_BYTES // (1024 * 1024),
+                        help='лимит памяти разобранных сборок, МБ')
+    args = parser.parse_args(argv)
+    
+    builds = BuildCache(args.memory_mb * 1024 * 1024)
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+        server = UnixHTTPServer(args.socket, ServiceRequestHandler)
+        address = args.socket
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), ServiceRequestHandler)
+        address = f'http://{args.host}:{server.server_address[1]}'
+    server.service = AnalysisService(args.root, builds)
+    print(f"[OK] Сервис анализа: {address}, логи из {server.service.root}, "
+          f"лимит памяти {args.memory_mb} МБ", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+def add_cache_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--cache-dir', help='каталог кэша результатов (по умолчанию кэш выключен)')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help='лимит размера кэша, МБ')
+
+def cache_from_args(args: argparse.Namespace) -> 'ResultCache':
+    if not args.cache_dir:
+        return None
+    return ResultCache(args.cache_dir, max_bytes=args.cache_size * 1024 * 1024)
+
+def main(silent=False, filepath: str = DEFAULT_LOG_PATH, output_file: str = DEFAULT_OUTPUT_PATH,
+         cache: ResultCache = None, history: HistoryStore = None, sections: Iterable[str] = None,
+         profiler: StageProfiler = None) -> Dict:
+    """
+    Анализ лога, сохранение результатов и (если не silent) отчёт в консоль
+    sections — только эти разделы; в историю записывается лишь полный анализ
+    profiler — замер этапов (кэш результатов не используется), профиль пишется рядом с результатами
+    """
+    if not silent:
+        print("="*80)
+        print("АНАЛИЗ ЛОГОВ DOCKER BUILD")
+        print("="*80)
+        print(f"\nЗагрузка файла: {filepath}")
+    
+    # Загрузка данных: один потоковый проход, все анализаторы получают каждую запись
+    if profiler is not None:
+        results = profile_file(filepath, profiler, sections)
+    else:
+        results = analyze_file(filepath, cache, sections)
+    if not silent:
+        print_report(results)
+        _print_header("СОХРАНЕНИЕ РЕЗУЛЬТАТОВ")
+    
+    # Сохранение результатов для этапа 2
+    save_results(results, output_file)
+    if profiler is not None:
+        profile = profiler.to_dict()
+        profile['source'] = filepath
+        with open(profile_path(output_file), 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+    build_id = None
+    if history is not None and sections is None:
+        build_id = history.record(results, filepath)
+    
+    if not silent:
+        print(f"\n[OK] Результаты сохранены в: {output_file}")
+        if build_id is not None:
+            print(f"[OK] Сборка #{build_id} добавлена в историю: {history.path}")
+        if profiler is not None:
+            print(f"[OK] Профиль этапов сохранён в: {profile_path(output_file)}")
+        _print_header("ПРЕДОБРАБОТКА ЗАВЕРШЕНА")
+    return results
+
+def parse_sections(value: str) -> List[str]:
+    """Аргумент --sections: список разделов через запятую"""
+    sections = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in sections if name not in SECTIONS]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"неизвестные разделы: {', '.join(unknown)}")
+    return sections
+
+# Подкоманды: первый аргумент командной строки -> обработчик
+COMMANDS = {
+    'batch': batch_main,
+    'follow': follow_main,
+    'ts-query': ts_query_main,
+    'history': history_main,
+    'live': live_main,
+    'scan': scan_main,
+    'nginx': nginx_main,
+    'index': index_main,
+    'query': query_main,
+    'diff': diff_main,
+    'serve': serve_main,
+}
 
 if __name__ == '__main__':
-    import sys
-    silent = '--silent' in sys.argv or '-s' in sys.argv
-    main(silent=silent)
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        COMMANDS[sys.argv[1]](sys.argv[2:])
+    else:
+        parser = argparse.ArgumentParser(description='Анализ JSON логов Docker Build')
+        parser.add_argument('log', nargs='?', default=DEFAULT_LOG_PATH,
+                            help='файл лога (JSON-массив или NDJSON, можно сжатый .gz/.xz/.zst)')
+        parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT_PATH, help='файл для analysis_results.json')
+        parser.add_argument('-s', '--silent', action='store_true', help='без вывода в консоль')
+        add_cache_arguments(parser)
+        parser.add_argument('--sections', type=parse_sections,
+                            help=f"только эти разделы через запятую: {', '.join(SECTIONS)}")
+        add_history_arguments(parser)
+        parser.add_argument('--profile', action='store_true',
+                            help='замерить время, CPU и пик памяти каждого этапа (<имя>.profile.json рядом с результатами)')
+        parser.add_argument('--profile-hook', action='append', default=[], metavar='МОДУЛЬ:ФУНКЦИЯ',
+                            help='передавать замеры этапов в функцию hook(event) (можно несколько)')
+        args = parser.parse_args()
+        profiler = None
+        if args.profile or args.profile_hook:
+            profiler = StageProfiler([load_profile_hook(spec) for spec in args.profile_hook])
+        main(silent=args.silent, filepath=args.log, output_file=args.output, cache=cache_from_args(args),
+             history=history_from_args(args, args.output), sections=args.sections, profiler=profiler)
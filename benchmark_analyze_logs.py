@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк analyze_logs.py на синтетическом логе
+
+Подкоманды:
+  generate  — синтетический лог Docker/kaniko/npm/tsc заданного размера
+  run       — время каждого этапа анализа и пиковый RSS, результат в JSON
+  compare   — сравнение двух файлов результатов (регрессии между коммитами)
+  matcher   — поиск ключевых слов прежним циклом `in`-проверок против KeywordMatcher
+
+Пример:
+  python benchmark_analyze_logs.py generate --records 1000000 --error-ratio 0.05
+  python benchmark_analyze_logs.py run bench/synthetic_1000000.log
+  python benchmark_analyze_logs.py compare bench/results-old.json bench/results-new.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List
+
+try:
+    import resource
+except ImportError:  # Windows: пиковый RSS не измеряется
+    resource = None
+
+import analyze_logs
+from analyze_logs import keyword_matcher
+
+BENCH_DIR = 'bench'
+RESULTS_VERSION = 1
+
+# Шаблоны строк, похожие на реальный лог Amvera/kaniko/npm/tsc
+SYNTHETIC_LINES = [
+    "Cloning into '/git'...",
+    "HEAD is now at b031472 Merge branch 'new' of https://github.com/E13nst/StickerArtWeb.git",
+    "\x1b[36mINFO\x1b[0m[0000] Resolved base name node:18-alpine to builder ",
+    "\x1b[36mINFO\x1b[0m[0004] Retrieving image manifest node:18-alpine     ",
+    "\x1b[36mINFO\x1b[0m[0004] Building stage 'node:18-alpine' [idx: '0', base-idx: '-1'] ",
+    "\x1b[36mINFO\x1b[0m[0009] RUN npm ci --no-audit                        ",
+    "\x1b[36mINFO\x1b[0m[0009] COPY package*.json ./                        ",
+    "npm warn deprecated rimraf@3.0.2: Rimraf versions prior to v4 are no longer supported",
+    "npm notice To update run: npm install -g npm@11.9.0",
+    "miniapp/src/hooks/usePageTransitions.ts({line},{col}): error TS1005: '>' expected.",
+    "miniapp/src/App.tsx({line},{col}): error TS6133: 'imageLoader' is declared but its value is never read.",
+    "npm ERR! code ENOENT",
+    "npm ERR! network request to https://registry.npmjs.org failed, reason: ETIMEDOUT",
+    "vite v5.0.0 building for production...",
+    "transforming ({line}) miniapp/src/components/GalleryGrid.tsx",
+    "dist/assets/index-{line}.js   412.31 kB │ gzip: 131.02 kB",
+    "Container builder has completed with exit code: 2",
+    "Docker build watcher application completed",
+]
+
+def generate_lines(count: int, seed: int = 42) -> List[str]:
+    """Синтетические строки лога заданного количества"""
+    rnd = random.Random(seed)
+    lines = []
+    for _ in range(count):
+        line = rnd.choice(SYNTHETIC_LINES)
+        if '{' in line:
+            line = line.format(line=rnd.randint(1, 500), col=rnd.randint(1, 80))
+        lines.append(line)
+    return lines
+
+# ============================================================================
+# ГЕНЕРАТОР СИНТЕТИЧЕСКОГО ЛОГА
+# ============================================================================
+#
+# Лог состоит из последовательных попыток сборки, как в docs/front.log:
+# clone -> стадии kaniko -> npm ci (deprecated-предупреждения) -> tsc/vite ->
+# push или падение. Доля строк-ошибок в теле сборки задаётся error_ratio.
+
+CYAN, RED, YELLOW, RESET = '\x1b[36m', '\x1b[31m', '\x1b[33m', '\x1b[0m'
+
+DEPRECATED_PACKAGES = [
+    ('rimraf@3.0.2', 'Rimraf versions prior to v4 are no longer supported'),
+    ('inflight@1.0.6', 'This module is not supported, and leaks memory. Do not use it.'),
+    ('glob@7.2.3', 'Glob versions prior to v9 are no longer supported'),
+    ('@types/jszip@3.4.1', 'This is a stub types definition. jszip provides its own type definitions.'),
+    ('@humanwhocodes/config-array@0.13.0', 'Use @eslint/config-array instead'),
+]
+
+TS_ERRORS = [
+    ('miniapp/src/hooks/usePageTransitions.ts', 'TS1005', "'>' expected."),
+    ('miniapp/src/hooks/usePageTransitions.ts', 'TS1136', 'Property assignment expected.'),
+    ('miniapp/src/components/AnimatedLikeButton.tsx', 'TS2307',
+     "Cannot find module '../hooks/useHapticFeedback' or its corresponding type declarations."),
+    ('miniapp/src/components/AuthStatus.tsx', 'TS2304', "Cannot find name 'Card'."),
+    ('miniapp/src/App.tsx', 'TS6133', "'imageLoader' is declared but its value is never read."),
+    ('miniapp/src/api/client.ts', 'TS2322', "Type 'string' is not assignable to type 'number'."),
+]
+
+OTHER_ERRORS = [
+    'npm ERR! code ENOENT',
+    'npm ERR! network request to https://registry.npmjs.org/{pkg} failed, reason: ETIMEDOUT',
+    'FATAL: build step timeout after {n}ms',
+    'error building image: error building stage: failed to execute command: exit status 2',
+]
+
+BODY_LINES = [
+    'transforming ({n}) miniapp/src/components/GalleryGrid.tsx',
+    'dist/assets/index-{hex}.js   {kb}.31 kB │ gzip: 131.02 kB',
+    'added {n} packages in {s}s',
+    '{cyan}INFO{reset}[{t:04d}] Taking snapshot of files...',
+    '{cyan}INFO{reset}[{t:04d}] COPY miniapp ./miniapp',
+    '✓ {n} modules transformed.',
+]
+
+class SyntheticLog:
+    """Генератор записей синтетического лога сборок"""
+
+    def __init__(self, error_ratio: float = 0.05, ansi: bool = True, seed: int = 42,
+                 start: str = '2026-02-09T08:40:22'):
+        self.error_ratio = error_ratio
+        self.ansi = ansi
+        self.rnd = random.Random(seed)
+        self.now_ns = int(datetime.fromisoformat(start).replace(tzinfo=timezone.utc).timestamp()) * 10**9
+        self._second = None
+        self._second_text = ''
+
+    def _timestamp(self) -> str:
+        second, fraction = divmod(self.now_ns, 10**9)
+        if second != self._second:
+            self._second = second
+            self._second_text = datetime.fromtimestamp(second, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        return f'{self._second_text}.{fraction:09d}'
+
+    def _color(self, color: str, text: str) -> str:
+        return f'{color}{text}{RESET}' if self.ansi else text
+
+    def _record(self, content: str, stream: str = 'stdout', delay: float = None) -> Dict:
+        if delay is None:
+            # Обычно миллисекунды между строками, изредка — «зависание» на секунды
+            delay = self.rnd.expovariate(200) if self.rnd.random() > 0.002 else self.rnd.uniform(1, 25)
+        self.now_ns += int(delay * 10**9)
+        return {'timestamp': self._timestamp(), 'stream': stream, 'content': content}
+
+    def _info(self, t: int, text: str) -> str:
+        return f"{self._color(CYAN, 'INFO')}[{t:04d}] {text}"
+
+    def _body_line(self, t: int) -> str:
+        rnd = self.rnd
+        line = rnd.choice(BODY_LINES)
+        return line.format(n=rnd.randint(1, 2000), hex=f'{rnd.getrandbits(32):08x}', kb=rnd.randint(10, 900),
+                           s=rnd.randint(1, 60), t=t, cyan=CYAN if self.ansi else '', reset=RESET if self.ansi else '')
+
+    def _error_line(self) -> str:
+        rnd = self.rnd
+        if rnd.random() < 0.7:
+            file, code, message = rnd.choice(TS_ERRORS)
+            return f'{file}({rnd.randint(1, 400)},{rnd.randint(1, 80)}): error {code}: {message}'
+        line = rnd.choice(OTHER_ERRORS).format(pkg=rnd.choice(DEPRECATED_PACKAGES)[0], n=rnd.randint(1000, 60000))
+        return self._color(RED, line) if line.startswith(('FATAL', 'error')) else line
+
+    def build(self) -> Iterator[Dict]:
+        """Одна попытка сборки"""
+        rnd = self.rnd
+        yield self._record("Cloning into '/git'...", delay=rnd.uniform(60, 600))
+        yield self._record("HEAD is now at b031472 Merge branch 'new' of https://github.com/E13nst/StickerArtWeb.git")
+        yield self._record(self._info(0, 'Resolved base name node:18-alpine to builder '))
+        yield self._record(self._info(4, 'Retrieving image manifest node:18-alpine     '), delay=rnd.uniform(1, 5))
+        yield self._record(self._info(4, "Building stage 'node:18-alpine' [idx: '0', base-idx: '-1'] "))
+        yield self._record(self._info(9, 'COPY package*.json ./                        '))
+        yield self._record(self._info(9, 'RUN npm ci --no-audit                        '))
+        for package, reason in DEPRECATED_PACKAGES:
+            yield self._record(f"npm warn deprecated {package}: {reason}", 'stderr')
+        yield self._record('npm notice To update run: npm install -g npm@11.9.0', 'stderr')
+        yield self._record(self._info(15, 'RUN echo "=== STARTING BUILD ===" && npx tsc && npx vite build'))
+        yield self._record('vite v5.0.0 building for production...')
+
+        failed = False
+        for i in range(rnd.randint(200, 2000)):
+            if rnd.random() < self.error_ratio:
+                failed = True
+                yield self._record(self._error_line(), 'stderr')
+            else:
+                yield self._record(self._body_line(16 + i // 100))
+
+        if failed:
+            yield self._record(self._color(RED, 'error building image: error building stage: '
+                                                'failed to execute command: waiting for process to exit: exit status 2'), 'stderr')
+            yield self._record('Container builder has completed with exit code: 2', delay=rnd.uniform(5, 15))
+        else:
+            yield self._record(self._info(20, "Building stage 'nginx:alpine' [idx: '1', base-idx: '-1'] "))
+            yield self._record(self._info(25, 'Pushing image to harbor.amvera.ru/stickerartweb'), delay=rnd.uniform(2, 20))
+            yield self._record('Container builder has completed with exit code: 0')
+        yield self._record('Docker build watcher application completed')
+
+    def records(self, count: int) -> Iterator[Dict]:
+        """Ровно count записей (последняя сборка может быть оборвана)"""
+        produced = 0
+        while True:
+            for record in self.build():
+                if produced >= count:
+                    return
+                yield record
+                produced += 1
+
+def write_log(path: str, records: Iterator[Dict], fmt: str = 'json') -> int:
+    """Потоковая запись лога: JSON-массив (как docs/front.log) или NDJSON"""
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'json':
+            f.write('[')
+        for record in records:
+            if fmt == 'json':
+                f.write(', ' if count else '')
+                f.write(json.dumps(record))
+            else:
+                f.write(json.dumps(record))
+                f.write('\n')
+            count += 1
+        if fmt == 'json':
+            f.write(']')
+    return count
+
+# ============================================================================
+# ЗАМЕРЫ
+# ============================================================================
+#
+# Каждый замер выполняется в отдельном процессе, чтобы пиковый RSS относился
+# только к нему. Время этапа = время конвейера из одного этого этапа минус время
+# пустого конвейера (чтение, разбор JSON, LogRecord) — «pipeline_base».
+
+def _peak_rss_kb() -> int:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def _measure(name: str, path: str) -> Dict:
+    """Один замер в дочернем процессе"""
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    records = 0
+    if name == 'load':
+        for _ in analyze_logs.iter_records(path):
+            records += 1
+    elif name == 'pipeline_base':
+        records = analyze_logs.feed_pipeline(analyze_logs.iter_records(path), [])
+    elif name == 'full':
+        stages = analyze_logs.default_stages()
+        records = analyze_logs.feed_pipeline(analyze_logs.iter_records(path), stages)
+        analyze_logs.build_results(stages)
+    elif name == 'log_store':
+        store = analyze_logs.load_log_store(path)
+        store.categorize()
+        store.find_problems()
+        store.gap_distribution()
+        records = len(store)
+    else:
+        stage = next(s for s in analyze_logs.default_stages() if f'stage:{s.name}' == name)
+        records = analyze_logs.feed_pipeline(analyze_logs.iter_records(path), [stage])
+        stage.result()
+    return {
+        'seconds': time.perf_counter() - wall,
+        'cpu_seconds': time.process_time() - cpu,
+        'records': records,
+        'peak_rss_kb': _peak_rss_kb(),
+    }
+
+def measurement_names(stages: List[str] = None) -> List[str]:
+    names = ['load', 'pipeline_base']
+    names += [f'stage:{s.name}' for s in analyze_logs.default_stages() if not stages or s.name in stages]
+    names += ['full', 'log_store']
+    return names
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_benchmark(path: str, repeat: int = 1, stages: List[str] = None, verbose: bool = True) -> Dict:
+    """Все замеры по файлу лога; для каждого берётся лучшее время из repeat запусков"""
+    measurements = {}
+    for name in measurement_names(stages):
+        best = None
+        for _ in range(repeat):
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                result = executor.submit(_measure, name, path).result()
+            if best is None or result['seconds'] < best['seconds']:
+                best = result
+        measurements[name] = best
+        if verbose:
+            rss = f"{best['peak_rss_kb'] / 1024:8.1f} МБ" if best['peak_rss_kb'] is not None else '       —'
+            print(f"  {name:36s} {best['seconds']:8.3f} сек  RSS {rss}")
+
+    base = measurements['pipeline_base']['seconds']
+    for name, m in measurements.items():
+        m['records_per_second'] = m['records'] / m['seconds'] if m['seconds'] else None
+        if name.startswith('stage:'):
+            m['stage_seconds'] = max(m['seconds'] - base, 0.0)
+    return {
+        'version': RESULTS_VERSION,
+        'commit': _git_commit(),
+        'analyzer_version': analyze_logs.ANALYZER_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'log': os.path.basename(path),
+        'log_bytes': os.path.getsize(path),
+        'repeat': repeat,
+        'measurements': measurements,
+    }
+
+def compare_results(old: Dict, new: Dict, threshold: float = 0.10) -> List[str]:
+    """Замеры, ставшие медленнее более чем на threshold (доля); печатает таблицу сравнения"""
+    regressions = []
+    if old['log'] != new['log'] or old['log_bytes'] != new['log_bytes']:
+        print(f"[!] Разные логи: {old['log']} ({old['log_bytes']} байт) и {new['log']} ({new['log_bytes']} байт)")
+    print(f"{'замер':36s} {old.get('commit') or 'old':>10s} {new.get('commit') or 'new':>10s}   изменение")
+    for name, m in new['measurements'].items():
+        before = old['measurements'].get(name)
+        if before is None:
+            print(f"{name:36s} {'—':>10s} {m['seconds']:10.3f}")
+            continue
+        change = m['seconds'] / before['seconds'] - 1 if before['seconds'] else 0.0
+        mark = ''
+        if change > threshold:
+            regressions.append(name)
+            mark = '  РЕГРЕССИЯ'
+        print(f"{name:36s} {before['seconds']:10.3f} {m['seconds']:10.3f}   {change:+7.1%}{mark}")
+    return regressions
+
+# ============================================================================
+# СРАВНЕНИЕ ПОИСКА КЛЮЧЕВЫХ СЛОВ
+# ============================================================================
+
+# Прежняя реализация (до KeywordMatcher) — эталон для сравнения
+_LEGACY_TIMELINE = {
+    'git_clone': r'Cloning into',
+    'git_checkout': r'HEAD is now at',
+    'npm_install_start': r'npm (install|ci)',
+    'npm_build_start': r'npm run build',
+    'docker_stage': r'(Resolved base name|Retrieving image|Building stage)',
+    'copying': r'(Copying|COPY)',
+    'completed': r'completed|finished|done'
+}
+
+def legacy_scan(content: str) -> Dict[str, str]:
+    """Поиск тегов прежним способом: upper()/lower() и цикл `in`-проверок"""
+    found = {}
+    content_upper = content.upper()
+    for keyword in ['ERROR', 'FATAL', 'EXCEPTION', 'FAILED', 'FAIL', 'PANIC']:
+        if keyword in content_upper:
+            found['errors'] = keyword
+            break
+    for keyword in ['WARN', 'WARNING']:
+        if keyword in content_upper:
+            found['warnings'] = keyword
+            break
+    if 'INFO' in content_upper:
+        found['info'] = 'INFO'
+    if 'npm ERR!' in content or 'yarn ERR!' in content or 'gyp ERR!' in content:
+        found['npm_errors'] = 'NPM_ERROR'
+    if 'DEPRECATED' in content_upper or 'deprecated' in content:
+        found['deprecated'] = 'DEPRECATED'
+    if any(code in content_upper for code in ['ENOENT', 'EACCES', 'EPERM']):
+        found['file_errors'] = 'FILE_ERROR'
+    if 'ETIMEDOUT' in content_upper or 'timeout' in content.lower():
+        found['timeouts'] = 'TIMEOUT'
+    for event_type, pattern in _LEGACY_TIMELINE.items():
+        if re.search(pattern, content, re.IGNORECASE):
+            found['timeline'] = event_type
+            break
+    return found
+
+def bench_matcher(lines: List[str]) -> Dict[str, float]:
+    """Время поиска тегов по всем строкам: прежний способ против KeywordMatcher"""
+    start = time.perf_counter()
+    legacy = [legacy_scan(line) for line in lines]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scan = keyword_matcher.scan
+    current = [scan(line) for line in lines]
+    matcher_time = time.perf_counter() - start
+
+    if legacy != current:
+        raise AssertionError('KeywordMatcher расходится с прежней реализацией')
+    return {'legacy_seconds': legacy_time, 'matcher_seconds': matcher_time,
+            'speedup': legacy_time / matcher_time}
+
+# ============================================================================
+# ЗАПУСК
+# ============================================================================
+
+def generate_main(args: argparse.Namespace) -> None:
+    output = args.output or os.path.join(BENCH_DIR, f'synthetic_{args.records}.log')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    log = SyntheticLog(error_ratio=args.error_ratio, ansi=not args.no_ansi, seed=args.seed)
+    start = time.perf_counter()
+    count = write_log(output, log.records(args.records), args.format)
+    print(f"[OK] {count} записей ({os.path.getsize(output) / 1024 / 1024:.1f} МБ) за "
+          f"{time.perf_counter() - start:.1f} сек: {output}")
+
+def run_main(args: argparse.Namespace) -> None:
+    print(f"Бенчмарк {args.log} (лучшее из {args.repeat}):")
+    results = run_benchmark(args.log, args.repeat, args.stages)
+    output = args.output
+    if output is None:
+        os.makedirs(BENCH_DIR, exist_ok=True)
+        name = os.path.splitext(os.path.basename(args.log))[0]
+        output = os.path.join(BENCH_DIR, f"results-{name}-{results['commit'] or 'local'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"[OK] Результаты сохранены в: {output}")
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            if compare_results(json.load(f), results, args.threshold):
+                sys.exit(1)
+
+def compare_main(args: argparse.Namespace) -> None:
+    with open(args.old, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(args.new, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    if compare_results(old, new, args.threshold):
+        sys.exit(1)
+
+def matcher_main(args: argparse.Namespace) -> None:
+    print(f"Генерация {args.count} синтетических записей...")
+    lines = generate_lines(args.count)
+    result = bench_matcher(lines)
+    print(f"Прежний поиск (upper + in + re.search): {result['legacy_seconds']:.2f} сек")
+    print(f"KeywordMatcher (один проход):          {result['matcher_seconds']:.2f} сек")
+    print(f"Ускорение: x{result['speedup']:.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк analyze_logs.py')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help='синтетический лог сборок')
+    generate.add_argument('--records', type=int, default=1_000_000, help='число записей (10000, 1000000, 10000000)')
+    generate.add_argument('--error-ratio', type=float, default=0.05, help='доля строк-ошибок в теле сборки')
+    generate.add_argument('--no-ansi', action='store_true', help='без ANSI-раскраски')
+    generate.add_argument('--format', choices=('json', 'ndjson'), default='json')
+    generate.add_argument('--seed', type=int, default=42)
+    generate.add_argument('-o', '--output', help=f'файл лога (по умолчанию {BENCH_DIR}/synthetic_<N>.log)')
+    generate.set_defaults(handler=generate_main)
+
+    run = commands.add_parser('run', help='замеры этапов анализа')
+    run.add_argument('log', help='файл лога')
+    run.add_argument('--repeat', type=int, default=1, help='запусков на замер (берётся лучший)')
+    run.add_argument('--stages', nargs='*', help='только эти этапы конвейера (по имени)')
+    run.add_argument('-o', '--output', help=f'файл результатов (по умолчанию {BENCH_DIR}/results-<лог>-<коммит>.json)')
+    run.add_argument('--baseline', help='результаты прежнего коммита для сравнения')
+    run.add_argument('--threshold', type=float, default=0.10, help='допустимое замедление (доля)')
+    run.set_defaults(handler=run_main)
+
+    compare = commands.add_parser('compare', help='сравнение двух файлов результатов')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.10, help='допустимое замедление (доля)')
+    compare.set_defaults(handler=compare_main)
+
+    matcher = commands.add_parser('matcher', help='KeywordMatcher против прежнего поиска')
+    matcher.add_argument('count', nargs='?', type=int, default=1_000_000)
+    matcher.set_defaults(handler=matcher_main)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""
+Эталон для тестов: функции анализа analyze_logs.py до перехода на потоковый
+конвейер (без изменений, кроме этой шапки). Новые реализации должны давать те же
+результаты на тех же записях.
+"""
+
+import json
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import List, Dict, Tuple
+
+def load_logs(filepath: str) -> List[Dict]:
+    """Загрузка логов из JSON файла"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def parse_timestamp(ts: str) -> datetime:
+    """Парсинг timestamp в datetime объект"""
+    return datetime.fromisoformat(ts.replace('Z', '+00:00'))
+
+def analyze_basic_stats(data: List[Dict]) -> Dict:
+    """Базовая статистика по логам"""
+    stats = {
+        'total_records': len(data),
+        'first_timestamp': data[0]['timestamp'],
+        'last_timestamp': data[-1]['timestamp'],
+        'streams': Counter([d['stream'] for d in data]),
+        'content_lengths': sorted([len(d['content']) for d in data], reverse=True)[:10]
+    }
+    
+    # Вычисление длительности
+    start = parse_timestamp(data[0]['timestamp'])
+    end = parse_timestamp(data[-1]['timestamp'])
+    duration = (end - start).total_seconds()
+    stats['duration_seconds'] = duration
+    stats['duration_minutes'] = duration / 60
+    
+    return stats
+
+def categorize_by_level(data: List[Dict]) -> Dict[str, List[Dict]]:
+    """Категоризация по уровням логирования"""
+    categories = defaultdict(list)
+    
+    for record in data:
+        content = record['content']
+        content_upper = content.upper()
+        
+        # Определение категории по содержимому
+        if '\x1b[31m' in content or 'ERROR' in content_upper or 'FATAL' in content_upper:
+            categories['ERROR'].append(record)
+        elif '\x1b[33m' in content or 'WARN' in content_upper:
+            categories['WARN'].append(record)
+        elif '\x1b[36m' in content or 'INFO' in content_upper:
+            categories['INFO'].append(record)
+        elif 'npm' in content[:30].lower():
+            categories['NPM'].append(record)
+        elif any(kw in content[:50].lower() for kw in ['docker', 'kaniko', 'building', 'copying']):
+            categories['DOCKER'].append(record)
+        else:
+            categories['OTHER'].append(record)
+    
+    return dict(categories)
+
+def find_problems(data: List[Dict]) -> Dict[str, List[Tuple[Dict, str]]]:
+    """Поиск проблемных паттернов"""
+    problems = {
+        'errors': [],
+        'warnings': [],
+        'npm_errors': [],
+        'deprecated': [],
+        'file_errors': [],
+        'timeouts': []
+    }
+    
+    error_keywords = ['ERROR', 'FATAL', 'EXCEPTION', 'FAILED', 'FAIL', 'PANIC']
+    warning_keywords = ['WARN', 'WARNING']
+    
+    for record in data:
+        content = record['content']
+        content_upper = content.upper()
+        
+        # Ошибки
+        for keyword in error_keywords:
+            if keyword in content_upper:
+                problems['errors'].append((record, keyword))
+                break
+        
+        # Предупреждения
+        for keyword in warning_keywords:
+            if keyword in content_upper:
+                problems['warnings'].append((record, keyword))
+                break
+        
+        # npm/yarn ошибки
+        if 'npm ERR!' in content or 'yarn ERR!' in content or 'gyp ERR!' in content:
+            problems['npm_errors'].append((record, 'NPM_ERROR'))
+        
+        # Deprecated зависимости
+        if 'DEPRECATED' in content_upper or 'deprecated' in content:
+            problems['deprecated'].append((record, 'DEPRECATED'))
+        
+        # Файловые ошибки
+        if any(code in content_upper for code in ['ENOENT', 'EACCES', 'EPERM']):
+            problems['file_errors'].append((record, 'FILE_ERROR'))
+        
+        # Таймауты
+        if 'ETIMEDOUT' in content_upper or 'timeout' in content.lower():
+            problems['timeouts'].append((record, 'TIMEOUT'))
+    
+    return problems
+
+def analyze_timeline(data: List[Dict]) -> List[Dict]:
+    """Анализ временной шкалы и ключевых событий"""
+    key_events = []
+    
+    # Паттерны для ключевых событий
+    patterns = {
+        'git_clone': r'Cloning into',
+        'git_checkout': r'HEAD is now at',
+        'npm_install_start': r'npm (install|ci)',
+        'npm_build_start': r'npm run build',
+        'docker_stage': r'(Resolved base name|Retrieving image|Building stage)',
+        'copying': r'(Copying|COPY)',
+        'completed': r'completed|finished|done'
+    }
+    
+    for record in data:
+        content = record['content']
+        
+        for event_type, pattern in patterns.items():
+            if re.search(pattern, content, re.IGNORECASE):
+                key_events.append({
+                    'timestamp': record['timestamp'],
+                    'type': event_type,
+                    'content': content[:200]
+                })
+                break
+    
+    return key_events
+
+def find_time_gaps(data: List[Dict], threshold_seconds: int = 30) -> List[Dict]:
+    """Поиск аномально длинных пауз между событиями"""
+    gaps = []
+    
+    for i in range(1, len(data)):
+        prev_time = parse_timestamp(data[i-1]['timestamp'])
+        curr_time = parse_timestamp(data[i]['timestamp'])
+        gap = (curr_time - prev_time).total_seconds()
+        
+        if gap > threshold_seconds:
+            gaps.append({
+                'gap_seconds': gap,
+                'before': {
+                    'timestamp': data[i-1]['timestamp'],
+                    'content': data[i-1]['content'][:150]
+                },
+                'after': {
+                    'timestamp': data[i]['timestamp'],
+                    'content': data[i]['content'][:150]
+                }
+            })
+    
+    return sorted(gaps, key=lambda x: x['gap_seconds'], reverse=True)
+
+def aggregate_duplicates(problems: List[Tuple[Dict, str]], sample_length: int = 100) -> List[Dict]:
+    """Агрегация дубликатов ошибок"""
+    error_groups = defaultdict(list)
+    
+    for record, keyword in problems:
+        content = record['content']
+        # Очистка от ANSI кодов
+        clean_content = re.sub(r'\x1b\[[0-9;]*m', '', content)
+        # Группировка по первым N символам
+        key = clean_content[:sample_length].strip()
+        error_groups[key].append({
+            'timestamp': record['timestamp'],
+            'full_content': clean_content,
+            'keyword': keyword
+        })
+    
+    # Сортировка по частоте
+    aggregated = []
+    for key, occurrences in error_groups.items():
+        aggregated.append({
+            'sample': key,
+            'count': len(occurrences),
+            'first_occurrence': occurrences[0]['timestamp'],
+            'last_occurrence': occurrences[-1]['timestamp'],
+            'example': occurrences[0]['full_content'][:300]
+        })
+    
+    return sorted(aggregated, key=lambda x: x['count'], reverse=True)
+
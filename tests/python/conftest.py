@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Общие данные тестов analyze_logs.py: синтетический лог сборок (генератор из
+benchmark_analyze_logs.py) и запись его на диск в нужном формате.
+
+Запуск: python -m pytest tests/python
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, ROOT)
+
+from benchmark_analyze_logs import SyntheticLog, write_log  # noqa: E402
+
+# Записи с неудобным для разбора содержимым: скобки и запятые внутри строк,
+# экранирование, многобайтовый UTF-8, ключевые слова в разных регистрах
+TRICKY_CONTENTS = [
+    'plain [brackets], {"braces": 1}, commas , and ] closing',
+    'escaped \\"quotes\\" and \\\\ backslash',
+    'Ошибка сборки: модуль не найден — ERROR',
+    'эмодзи 🚀 и иероглифы 漢字 рядом с Timeout',
+    'npm err! lowercase is not an npm error',
+    'Request TIMEOUT after 30s',
+    'error: eacces permission denied',
+    'Socket Etimedout',
+    'npm WARN deprecated left-pad@1.0.0',
+    '\x1b[31mFailed to compile\x1b[0m',
+    'Copying files... done',
+]
+
+def synthetic_records(count: int, seed: int = 7, error_ratio: float = 0.1):
+    """Записи синтетического лога с несколькими «неудобными» строками в начале"""
+    log = SyntheticLog(error_ratio=error_ratio, seed=seed)
+    records = list(log.records(count))
+    for i, content in enumerate(TRICKY_CONTENTS):
+        records[i * 7 + 3]['content'] = content
+    return records
+
+@pytest.fixture(scope='session')
+def records():
+    return synthetic_records(6000)
+
+@pytest.fixture
+def write_records(tmp_path):
+    """write_records(records, name, fmt='json' | 'ndjson') -> путь к файлу лога"""
+    def write(records, name='build.log', fmt='json'):
+        path = str(tmp_path / name)
+        write_log(path, iter(records), fmt)
+        return path
+    return write
+
+@pytest.fixture
+def log_file(records, write_records):
+    return write_records(records)
+
+def roundtrip(results):
+    """Результаты в том виде, в каком они сохраняются в JSON"""
+    return json.loads(json.dumps(results, ensure_ascii=False, default=str))
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Детектор зависаний и лавин вывода: ровный лог, внедрённая пауза, внедрённый всплеск темпа"""
+
+import random
+
+import analyze_logs
+from conftest import roundtrip
+
+NS = analyze_logs.NS_PER_SECOND
+START_NS = analyze_logs.parse_timestamp_ns('2026-02-09T08:40:00')
+
+def _record(ts_ns, content):
+    return analyze_logs.LogRecord({'timestamp': analyze_logs.format_timestamp_ns(ts_ns), 'stream': 'stdout',
+                                   'content': content})
+
+def _flat(seconds, per_second=10, start_ns=START_NS, seed=3):
+    """Ровный поток: per_second записей в секунду с небольшим дрожанием"""
+    rng = random.Random(seed)
+    step = NS // per_second
+    return [start_ns + n * step + rng.randrange(step // 4) for n in range(seconds * per_second)]
+
+def _run(timestamps, stage=None):
+    stage = stage or analyze_logs.AnomalyStage()
+    for n, ts_ns in enumerate(timestamps):
+        stage.feed(_record(ts_ns, f'line {n}'))
+    return stage.result()
+
+def test_flat_log_has_no_anomalies():
+    result = _run(_flat(600))
+    assert result == {'stalls': 0, 'stall_seconds': 0.0, 'floods': 0, 'top': []}
+
+def test_injected_stall_is_flagged_with_context():
+    before = _flat(120)
+    after = _flat(60, start_ns=before[-1] + 45 * NS)
+    result = _run(before + after)
+    assert (result['stalls'], result['floods']) == (1, 0)
+    stall = result['top'][0]
+    assert stall['type'] == 'stall'
+    assert stall['gap_seconds'] == (after[0] - before[-1]) / NS
+    assert stall['timestamp'] == analyze_logs.format_timestamp_ns(after[0])
+    assert [line.split('] ')[1] for line in stall['context_before']] == ['line 1197', 'line 1198', 'line 1199']
+    assert [line.split('] ')[1] for line in stall['context_after']] == ['line 1200', 'line 1201', 'line 1202']
+    assert result['stall_seconds'] == stall['gap_seconds']
+
+def test_injected_rate_spike_is_flagged():
+    before = _flat(120)
+    spike_start = (before[-1] // NS + 1) * NS
+    spike = [spike_start + n * (NS // 800) for n in range(800)]
+    after = _flat(60, start_ns=spike_start + NS)
+    result = _run(before + spike + after)
+    assert (result['stalls'], result['floods']) == (0, 1)
+    flood = result['top'][0]
+    assert flood['type'] == 'flood'
+    assert flood['records_per_second'] == 800
+    assert flood['timestamp'] == analyze_logs.format_timestamp_ns(spike_start)
+    assert 9 <= flood['baseline_per_second'] <= 11
+    assert flood['score'] > 1
+
+def test_short_pauses_below_minimum_are_not_stalls():
+    # Пауза в 1 сек на фоне 0.1 сек — выше базовой линии, но короче MIN_STALL_SECONDS
+    before = _flat(120)
+    after = _flat(60, start_ns=before[-1] + NS)
+    assert _run(before + after)['stalls'] == 0
+
+def test_state_roundtrip_matches_single_pass():
+    before = _flat(120)
+    timestamps = before + _flat(60, start_ns=before[-1] + 45 * NS)
+    first = analyze_logs.AnomalyStage()
+    for n, ts_ns in enumerate(timestamps[:1201]):
+        first.feed(_record(ts_ns, f'line {n}'))
+    resumed = analyze_logs.AnomalyStage()
+    resumed.set_state(roundtrip(first.get_state()))
+    for n, ts_ns in enumerate(timestamps[1201:], 1201):
+        resumed.feed(_record(ts_ns, f'line {n}'))
+    assert resumed.result() == _run(timestamps)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""Пакетный режим: логи каталога, в том числе сжатые; объединение сводок в любом порядке"""
+
+import gzip
+import itertools
+import json
+import lzma
+import os
+
+import analyze_logs
+from conftest import roundtrip, synthetic_records
+
+def _results(directory):
+    suffix = '.analysis_results.json'
+    return sorted(name[:-len(suffix)] for name in os.listdir(directory) if name.endswith(suffix))
+
+def test_batch_includes_compressed_logs(records, write_records, tmp_path):
+    plain = write_records(records[:300], 'build-1.log')
+    for opener, name in ((gzip.open, 'build-2.log.gz'), (lzma.open, 'build-3.log.xz')):
+        with open(plain, 'rb') as src, opener(str(tmp_path / name), 'wb') as dst:
+            dst.write(src.read())
+    (tmp_path / 'notes.txt').write_text('не лог', encoding='utf-8')
+    out = tmp_path / 'out'
+    analyze_logs.batch_main([str(tmp_path), '-o', str(out), '-j', '1', '-s', '--no-history'])
+    
+    assert _results(out) == ['build-1', 'build-2', 'build-3']
+    with open(out / 'batch_summary.json', 'r', encoding='utf-8') as f:
+        summary = json.load(f)
+    assert summary['builds'] == 3
+    assert summary['total_records'] == 900
+
+def test_batch_pattern_can_be_repeated(records, write_records, tmp_path):
+    write_records(records[:100], 'a.log')
+    write_records(records[:100], 'b.json')
+    write_records(records[:100], 'c.ndjson', 'ndjson')
+    out = tmp_path / 'out'
+    analyze_logs.batch_main([str(tmp_path), '--pattern', '*.json', '--pattern', '*.ndjson',
+                             '-o', str(out), '-j', '1', '-s', '--no-history'])
+    assert _results(out) == ['b', 'c']
+
+def test_build_name_strips_compression_suffix():
+    assert analyze_logs.build_name('/logs/build-42.log.gz') == 'build-42'
+    assert analyze_logs.build_name('build-42.log') == 'build-42'
+    assert analyze_logs.build_name('build.2026.ndjson') == 'build.2026'
+
+def test_merge_does_not_depend_on_worker_order(write_records):
+    # Две сборки с одинаковыми записями: равные счёты и моменты первого появления
+    logs = [write_records(synthetic_records(800, seed=seed), f'build-{n}.log')
+            for n, seed in enumerate((1, 2, 3, 3))]
+    summaries = [analyze_logs.summarize(analyze_logs.analyze_file(log), os.path.basename(log)) for log in logs]
+    expected = roundtrip(analyze_logs.merge_summaries(summaries))
+    for order in itertools.permutations(range(len(summaries))):
+        assert roundtrip(analyze_logs.merge_summaries([summaries[i] for i in order])) == expected
+    assert expected['builds'] == 4
+    assert expected['sources'] == sorted(os.path.basename(log) for log in logs)
+
+def test_batch_result_does_not_depend_on_workers(write_records):
+    logs = [write_records(synthetic_records(500, seed=seed), f'build-{seed}.log') for seed in (4, 5, 6)]
+    _, single = analyze_logs.analyze_batch(logs, workers=1)
+    _, parallel = analyze_logs.analyze_batch(list(reversed(logs)), workers=3)
+    assert roundtrip(parallel) == roundtrip(single)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Кэш результатов: совпадение с полным анализом, попадание и продолжение с префикса"""
+
+import os
+
+import analyze_logs
+from conftest import roundtrip
+
+def test_cached_results_equal_analysis(log_file, tmp_path):
+    cache = analyze_logs.ResultCache(str(tmp_path / 'cache'))
+    expected = roundtrip(analyze_logs.analyze_file(log_file))
+    assert cache.analyze(log_file) == expected
+    # Повторный вызов — из results/, без анализа
+    assert len(os.listdir(cache.results_dir)) == 1
+    assert cache.analyze(log_file) == expected
+
+def test_appended_log_resumes_from_snapshot(records, write_records, tmp_path):
+    cache = analyze_logs.ResultCache(str(tmp_path / 'cache'), snapshot_bytes=64 * 1024)
+    prefix = write_records(records[:2000], 'build.log', 'ndjson')
+    cache.analyze(prefix)
+    snapshots = os.listdir(cache.snapshots_dir)
+    assert snapshots and not any(name.endswith('.tmp') for name in snapshots)
+    
+    full = write_records(records, 'full.log', 'ndjson')
+    with open(full, 'rb') as f:
+        data = f.read()
+    with open(prefix, 'wb') as f:
+        f.write(data)
+    resumed = cache.analyze(prefix)
+    assert resumed == roundtrip(analyze_logs.analyze_file(full))
+
+def test_snapshot_of_other_log_is_not_used(records, write_records, tmp_path):
+    cache = analyze_logs.ResultCache(str(tmp_path / 'cache'), snapshot_bytes=64 * 1024)
+    cache.analyze(write_records(records[:2000], 'a.log', 'ndjson'))
+    other = write_records(records[3000:], 'b.log', 'ndjson')
+    assert cache.analyze(other) == roundtrip(analyze_logs.analyze_file(other))
+
+def test_eviction_removes_least_recently_used(records, write_records, tmp_path):
+    cache = analyze_logs.ResultCache(str(tmp_path / 'cache'))
+    first = write_records(records[:500], 'a.log')
+    cache.analyze(first)
+    (name,) = os.listdir(cache.results_dir)
+    cache.max_bytes = os.path.getsize(os.path.join(cache.results_dir, name)) * 3 // 2
+    cache.analyze(write_records(records[:500] + records[:10], 'b.log'))
+    remaining = os.listdir(cache.results_dir)
+    assert len(remaining) == 1 and name not in remaining
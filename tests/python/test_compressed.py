@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""Сжатые логи: определение формата по сигнатуре и потоковая распаковка"""
+
+import gzip
+import lzma
+
+import pytest
+
+import analyze_logs
+
+@pytest.mark.parametrize('opener, compression', [(gzip.open, 'gzip'), (lzma.open, 'xz')])
+def test_compressed_logs_read_like_plain(log_file, tmp_path, opener, compression):
+    # Имя без расширения: формат определяется по первым байтам, а не по суффиксу
+    path = str(tmp_path / 'build.log.compressed')
+    with open(log_file, 'rb') as src, opener(path, 'wb') as dst:
+        dst.write(src.read())
+    assert analyze_logs.detect_compression(path) == compression
+    assert list(analyze_logs.iter_records(path)) == list(analyze_logs.iter_records(log_file))
+
+def test_plain_log_is_not_compressed(log_file):
+    assert analyze_logs.detect_compression(log_file) is None
+
+def test_zstd_without_package(tmp_path, monkeypatch):
+    path = str(tmp_path / 'build.log.zst')
+    with open(path, 'wb') as f:
+        f.write(b'\x28\xb5\x2f\xfd' + b'\0' * 16)
+    assert analyze_logs.detect_compression(path) == 'zstd'
+    monkeypatch.setattr(analyze_logs, 'zstandard', None)
+    with pytest.raises(ImportError, match='zstandard'):
+        analyze_logs.open_log(path)
+
+def test_compressed_analysis_matches_plain(log_file, tmp_path):
+    path = str(tmp_path / 'build.log.gz')
+    with open(log_file, 'rb') as src, gzip.open(path, 'wb') as dst:
+        dst.write(src.read())
+    assert analyze_logs.analyze_file(path) == analyze_logs.analyze_file(log_file)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Сравнение двух сборок по шаблонам ошибок"""
+
+import json
+
+import analyze_logs
+
+def _record(second, content, stream='stderr'):
+    return {'timestamp': f'2026-02-09T08:40:{second:02d}.000000001', 'stream': stream, 'content': content}
+
+BASE = [
+    _record(1, "src/a.ts(10,5): error TS2322: Type 'string' is not assignable to type 'number'."),
+    _record(2, "src/b.ts(20,1): error TS2322: Type 'string' is not assignable to type 'number'."),
+    _record(3, 'FATAL: build step timeout after 9194ms'),
+    _record(4, 'npm WARN deprecated glob@7.2.3: old'),
+]
+NEW = [
+    _record(1, "src/a.ts(11,5): error TS2322: Type 'string' is not assignable to type 'number'."),
+    _record(2, "src/c.ts(1,1): error TS2304: Cannot find name 'Card'."),
+    _record(3, "src/d.ts(3,3): error TS2304: Cannot find name 'Card'."),
+    _record(4, 'npm WARN deprecated glob@7.2.3: old'),
+]
+
+def test_diff_of_logs(write_records):
+    diff = analyze_logs.diff_builds(write_records(BASE, 'base.log'), write_records(NEW, 'new.log'))
+    errors = diff['errors']
+    assert [(e['new_count'], e['template']) for e in errors['new']] == \
+        [(2, "<path>(<n>,<n>): error TS2304: Cannot find name '<id>'.")]
+    assert [e['template'] for e in errors['resolved']] == ['FATAL: build step timeout after <dur>']
+    assert [(e['base_count'], e['new_count'], e['delta']) for e in errors['changed']] == [(2, 1, -1)]
+    assert diff['warnings']['unchanged'] == 1
+    assert not diff['warnings']['new'] and not diff['warnings']['resolved']
+
+def test_diff_of_results_files_equals_diff_of_logs(write_records, tmp_path):
+    base, new = write_records(BASE, 'base.log'), write_records(NEW, 'new.log')
+    saved = []
+    for path in (base, new):
+        out = str(tmp_path / (path.rsplit('/', 1)[-1] + '.json'))
+        analyze_logs.save_results(analyze_logs.analyze_file(path), out)
+        saved.append(out)
+    from_logs = analyze_logs.diff_builds(base, new)
+    from_results = analyze_logs.diff_builds(*saved)
+    for kind, _ in analyze_logs.FINGERPRINT_KINDS:
+        assert json.dumps(from_results[kind], sort_keys=True) == json.dumps(from_logs[kind], sort_keys=True)
+
+def test_min_delta_hides_small_changes():
+    base = [{'fingerprint': 'a', 'template': 't', 'count': 10, 'example': 'e'}]
+    new = [{'fingerprint': 'a', 'template': 't', 'count': 11, 'example': 'e'}]
+    assert analyze_logs.diff_fingerprints(base, new, min_delta=2) == \
+        {'new': [], 'resolved': [], 'changed': [], 'unchanged': 1}
+    assert analyze_logs.diff_fingerprints(base, new)['changed'][0]['delta'] == 1
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+"""Порядок групп дубликатов при равных счётах"""
+
+import analyze_logs
+
+def _stage(capacity, contents):
+    stage = analyze_logs.DuplicatesStage(capacity=capacity)
+    for second, content in enumerate(contents):
+        stage.add(f'2026-02-09T08:40:{second:02d}.0', content)
+    return [group['sample'] for group in stage.result()]
+
+def test_ties_in_first_appearance_order_without_evictions():
+    assert _stage(10, ['b', 'a', 'c', 'a', 'b', 'c']) == ['b', 'a', 'c']
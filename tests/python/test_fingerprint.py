@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Шаблоны сообщений: переменные части сводятся к плейсхолдерам, разные сообщения не сливаются"""
+
+import pytest
+
+import analyze_logs
+
+template = analyze_logs.fingerprint_template
+
+@pytest.mark.parametrize('messages, expected', [
+    (['Build step 3 of 12 done', 'Build step 10 of 12 done'], 'Build step <n> of <n> done'),
+    (['commit a1b2c3d4e5 not found', 'commit 0f9e8d7c6b5a4 not found', 'commit 0xDEADBEEF not found'],
+     'commit <hex> not found'),
+    (["ENOENT: no such file, open '/app/src/index.ts'", "ENOENT: no such file, open '/srv/build/lib/util.js'"],
+     "ENOENT: no such file, open '<id>'"),
+    (['error in C:\\build\\src\\a.js', 'error in src/components/Button.tsx'], 'error in <path>'),
+    (['fetch https://registry.npmjs.org/react failed', 'fetch http://localhost:3000/api failed'],
+     'fetch <url> failed'),
+    (['Request timed out after 30000ms', 'Request timed out after 1.5 s'], 'Request timed out after <dur>'),
+    (["Cannot find module 'lodash'", 'Cannot find module "react-dom"'], "Cannot find module '<id>'"),
+    (['src/a.ts(12,5): error TS2322: x', 'src/b/c.tsx(7,13): error TS2322: x'], '<path>(<n>,<n>): error TS2322: x'),
+    (['  spaced \t  out  ', 'spaced out'], 'spaced out'),
+])
+def test_variable_parts_normalise_to_one_template(messages, expected):
+    assert {template(m) for m in messages} == {expected}
+    assert len({analyze_logs.fingerprint(template(m)) for m in messages}) == 1
+
+@pytest.mark.parametrize('first, second', [
+    ('Cannot find module lodash', 'Cannot resolve module lodash'),
+    ('error TS2322: Type mismatch', 'error TS2345: Type mismatch'),
+    ('npm ERR! code ENOENT', 'npm ERR! code EACCES'),
+    ('Failed to compile', 'Compiled with warnings'),
+    ('exit code: 1', 'exit status: 1'),
+])
+def test_distinct_messages_do_not_collide(first, second):
+    assert template(first) != template(second)
+    assert analyze_logs.fingerprint(template(first)) != analyze_logs.fingerprint(template(second))
+
+def test_fingerprint_is_stable_hex():
+    value = analyze_logs.fingerprint('Build step <n> of <n> done')
+    assert value == analyze_logs.fingerprint('Build step <n> of <n> done')
+    assert len(value) == 16 and int(value, 16) >= 0
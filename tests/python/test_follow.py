@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Режим follow: дописываемый лог и продолжение с контрольной точки"""
+
+import gzip
+import json
+import random
+
+import pytest
+
+import analyze_logs
+from conftest import roundtrip
+
+def _append_in_pieces(src: str, dst: str, pieces: int, seed: int = 1):
+    """Байты src дописываются в dst кусками случайной длины (разрезая записи и символы UTF-8)"""
+    with open(src, 'rb') as f:
+        data = f.read()
+    cuts = sorted(random.Random(seed).sample(range(1, len(data)), pieces - 1)) + [len(data)]
+    start = 0
+    for cut in cuts:
+        with open(dst, 'ab') as f:
+            f.write(data[start:cut])
+        start = cut
+        yield
+
+@pytest.mark.parametrize('fmt', ['json', 'ndjson'])
+def test_follow_with_checkpoints_equals_full_analysis(records, write_records, tmp_path, fmt):
+    src = write_records(records[:3000], 'full.log', fmt)
+    log = str(tmp_path / 'growing.log')
+    output = str(tmp_path / 'results.json')
+    checkpoint = str(tmp_path / 'results.checkpoint.json')
+    open(log, 'wb').close()
+    for _ in _append_in_pieces(src, log, 25):
+        # Каждый вызов — как новый запуск: состояние берётся только из контрольной точки
+        followed = analyze_logs.follow_log(log, output, checkpoint, once=True, silent=True)
+    assert roundtrip(followed) == roundtrip(analyze_logs.analyze_file(src))
+
+def test_follower_reads_only_complete_records(tmp_path):
+    log = tmp_path / 'build.log'
+    first = json.dumps({'timestamp': '2026-02-09T08:40:22.1', 'stream': 'stdout', 'content': 'один'})
+    second = json.dumps({'timestamp': '2026-02-09T08:40:23.1', 'stream': 'stdout', 'content': 'два'})
+    log.write_text('[' + first + ', ' + second[:10], encoding='utf-8')
+    follower = analyze_logs.LogFollower(str(log))
+    assert [r['content'] for r in follower.read_new()] == ['один']
+    assert [r['content'] for r in follower.read_new()] == []
+    with open(log, 'a', encoding='utf-8') as f:
+        f.write(second[10:] + ']')
+    assert [r['content'] for r in follower.read_new()] == ['два']
+    assert follower.closed
+    assert follower.offset == log.stat().st_size
+
+def test_replaced_log_restarts_from_beginning(records, write_records, tmp_path):
+    log = write_records(records[:200], 'build.log')
+    output = str(tmp_path / 'results.json')
+    checkpoint = str(tmp_path / 'results.checkpoint.json')
+    analyze_logs.follow_log(log, output, checkpoint, once=True, silent=True)
+    # Другая сборка в том же файле: отпечаток начала не совпадает
+    write_records(records[500:600], 'build.log')
+    results = analyze_logs.follow_log(log, output, checkpoint, once=True, silent=True)
+    assert results['stats']['total_records'] == 100
+    assert results['stats']['first_timestamp'] == records[500]['timestamp']
+
+def test_compressed_log_cannot_be_followed(log_file, tmp_path):
+    path = str(tmp_path / 'build.log.gz')
+    with open(log_file, 'rb') as src, gzip.open(path, 'wb') as dst:
+        dst.write(src.read())
+    with pytest.raises(ValueError):
+        analyze_logs.LogFollower(path)
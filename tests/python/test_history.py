@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""История сборок в SQLite: запись анализа и запросы трендов"""
+
+import sqlite3
+
+import pytest
+
+import analyze_logs
+
+def _build(day, warn_count, extra=()):
+    lines = [
+        (0, "Cloning into 'app'..."),
+        (3, 'RUN npm ci'),
+        (20 + day, 'added 1200 packages'),
+    ]
+    # Строка с тегами errors и warnings: один шаблон и в ошибках, и в предупреждениях
+    lines += [(30 + n, f'WARN: build error in module {n}') for n in range(warn_count)]
+    lines += [(40 + n, content) for n, content in enumerate(extra)]
+    lines.append((50, 'Container builder has completed'))
+    return [{'timestamp': f'2026-02-{day:02d}T08:40:{second:02d}.0', 'stream': 'stderr', 'content': content}
+            for second, content in lines]
+
+@pytest.fixture
+def history(write_records, tmp_path):
+    store = analyze_logs.HistoryStore(str(tmp_path / 'history.sqlite'))
+    paths = []
+    for day, warn_count, extra in ((9, 2, ()), (10, 3, ('FATAL: out of memory',))):
+        path = write_records(_build(day, warn_count, extra), f'build-{day}.log')
+        store.record(analyze_logs.analyze_file(path), path)
+        paths.append(path)
+    yield store, paths
+    store.close()
+
+def _warn_fingerprint(store):
+    row = store.conn.execute(
+        "SELECT fingerprint FROM fingerprint_templates WHERE template = 'WARN: build error in module <n>'").fetchone()
+    return row[0]
+
+def test_same_template_kept_as_error_and_warning(history):
+    store, _ = history
+    fingerprint = _warn_fingerprint(store)
+    kinds = store.conn.execute(
+        'SELECT kind, SUM(count) FROM fingerprints WHERE fingerprint = ? GROUP BY kind ORDER BY kind',
+        (fingerprint,)).fetchall()
+    assert [tuple(row) for row in kinds] == [('errors', 5), ('warnings', 5)]
+    warnings = store.fingerprint_history(fingerprint, 'warnings')
+    assert (warnings['builds'], warnings['total_count']) == (2, 5)
+    both = store.fingerprint_history(fingerprint)
+    assert (both['builds'], both['total_count']) == (2, 10)
+    assert both['first_seen']['started_at'].startswith('2026-02-09')
+    assert both['last_seen']['started_at'].startswith('2026-02-10')
+
+def test_builds_and_phase_trend(history):
+    store, paths = history
+    builds = store.builds()
+    assert [b['source'] for b in builds] == [analyze_logs.os.path.abspath(p) for p in paths]
+    assert [b['errors'] for b in builds] == [2, 4]
+    trend = store.phase_trend('install')
+    assert [p['total_seconds'] for p in trend] == [47.0, 47.0]
+    assert [p['count'] for p in trend] == [1, 1]
+    assert store.fingerprint_history('0' * 16) is None
+
+def test_rerecording_a_build_replaces_it(history):
+    store, paths = history
+    store.record(analyze_logs.analyze_file(paths[0]), paths[0])
+    assert len(store.builds()) == 2
+    fingerprint = _warn_fingerprint(store)
+    assert store.fingerprint_history(fingerprint, 'errors')['total_count'] == 5
+
+def test_history_command(history, capsys):
+    store, _ = history
+    fingerprint = _warn_fingerprint(store)
+    analyze_logs.history_main(['--db', store.path, 'fingerprint', fingerprint, '--kind', 'warnings'])
+    out = capsys.readouterr().out
+    assert 'WARN: build error in module <n>' in out
+    assert 'Сборок: 2, вхождений: 5' in out
+    analyze_logs.history_main(['--db', store.path, 'phase', 'install'])
+    assert len(capsys.readouterr().out.strip().splitlines()) == 2
+
+def test_old_schema_is_migrated(tmp_path):
+    db = str(tmp_path / 'history.sqlite')
+    conn = sqlite3.connect(db)
+    conn.executescript(analyze_logs.HISTORY_SCHEMA.replace(
+        'PRIMARY KEY (build_id, kind, fingerprint)', 'PRIMARY KEY (build_id, fingerprint)'))
+    conn.execute("INSERT INTO builds VALUES (1, 'a.log', 'now', 'x', 'y', 1.0, 1, 1, 1)")
+    conn.execute("INSERT INTO fingerprints VALUES (1, 'f', 'errors', 3, 'x')")
+    conn.commit()
+    conn.close()
+    store = analyze_logs.HistoryStore(db)
+    try:
+        store.conn.execute("INSERT INTO fingerprints VALUES (1, 'f', 'warnings', 2, 'x')")
+        rows = store.conn.execute('SELECT kind, count FROM fingerprints ORDER BY kind').fetchall()
+        assert [tuple(row) for row in rows] == [('errors', 3), ('warnings', 2)]
+        assert store.conn.execute('PRAGMA user_version').fetchone()[0] == analyze_logs.HISTORY_SCHEMA_VERSION
+    finally:
+        store.close()
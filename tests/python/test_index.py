@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Индекс логов: число совпадений и записи против полного перебора"""
+
+import re
+
+import pytest
+
+import analyze_logs
+from benchmark_analyze_logs import SyntheticLog, write_log
+
+@pytest.fixture(scope='module')
+def indexed(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('index')
+    builds = []
+    for seed in (1, 2):
+        records = list(SyntheticLog(error_ratio=0.1, seed=seed).records(3000))
+        path = str(directory / f'build{seed}.log')
+        write_log(path, iter(records))
+        builds.append((path, records))
+    index = analyze_logs.LogIndex(str(directory / 'index.sqlite'))
+    for path, _ in builds:
+        index.add_log(path)
+    yield index, builds
+    index.close()
+
+def _brute_force(builds, since=None, until=None, stream=None, category=None, code=None, token=None, regex=None):
+    total = 0
+    for _, records in builds:
+        for raw in records:
+            rec = analyze_logs.LogRecord(raw)
+            clean = rec.clean
+            if since is not None and rec.ts_ns < since:
+                continue
+            if until is not None and rec.ts_ns >= until:
+                continue
+            if stream is not None and rec.stream != stream:
+                continue
+            if category is not None and rec.level != category:
+                continue
+            if code is not None and code not in analyze_logs.line_codes(clean):
+                continue
+            if token is not None and token not in analyze_logs.line_tokens(clean):
+                continue
+            if regex is not None and not re.search(regex, clean):
+                continue
+            total += 1
+    return total
+
+def _time_range(builds):
+    ts = sorted(analyze_logs.parse_timestamp_ns(r['timestamp']) for _, records in builds for r in records)
+    # Границы не на минутах: часть агрегатов целиком, края — по записям
+    return ts[len(ts) // 5] + 12345, ts[len(ts) * 4 // 5] - 6789
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'code': 'TS2322'},
+    {'code': 'ENOENT', 'stream': 'stderr'},
+    {'token': 'deprecated'},
+    {'regex': r'exit code: \d'},
+    {'category': 'ERROR'},
+    {'category': 'INFO', 'stream': 'stdout'},
+    {'token': 'snapshot', 'regex': 'Taking'},
+])
+@pytest.mark.parametrize('timed', [False, True])
+def test_query_totals_match_brute_force(indexed, filters, timed):
+    index, builds = indexed
+    since, until = _time_range(builds) if timed else (None, None)
+    result = index.query(since, until, [filters['stream']] if 'stream' in filters else (),
+                         [filters['category']] if 'category' in filters else (),
+                         [filters['code']] if 'code' in filters else (),
+                         [filters['token']] if 'token' in filters else (),
+                         filters.get('regex'), limit=5)
+    expected = _brute_force(builds, since, until, **filters)
+    assert result['total'] == expected
+    assert len(result['records']) == min(5, expected)
+    for record in result['records']:
+        if 'code' in filters:
+            assert filters['code'] in record['content']
+
+def test_counts_totals_match_records(indexed):
+    index, builds = indexed
+    counts = index.counts()
+    assert sum(counts['totals'].values()) == sum(len(records) for _, records in builds)
+    assert counts['totals']['ERROR'] == _brute_force(builds, category='ERROR')
+
+def test_reindex_replaces_build(indexed):
+    index, builds = indexed
+    path, _ = builds[0]
+    assert index.is_indexed(path)
+    before = index.query()['total']
+    index.add_log(path)
+    assert index.query()['total'] == before
+    assert len(index.builds()) == 2
+
+def test_hash_collisions_keep_lines_apart(tmp_path, monkeypatch):
+    # Все строки с одним хешем: различаются только сравнением текста
+    monkeypatch.setattr(analyze_logs, '_stable_hash', lambda value, salt=b'': 42)
+    records = list(SyntheticLog(error_ratio=0.1, seed=3).records(500))
+    path = str(tmp_path / 'build.log')
+    write_log(path, iter(records))
+    index = analyze_logs.LogIndex(str(tmp_path / 'index.sqlite'))
+    try:
+        index.add_log(path)
+        builds = [(path, records)]
+        unique = {analyze_logs.LogRecord(raw).clean for raw in records}
+        assert index.conn.execute('SELECT COUNT(*) FROM lines').fetchone()[0] == len(unique)
+        for filters in ({'code': 'TS2322'}, {'token': 'deprecated'}, {'category': 'ERROR'}):
+            result = index.query(codes=[filters['code']] if 'code' in filters else (),
+                                 tokens=[filters['token']] if 'token' in filters else (),
+                                 categories=[filters['category']] if 'category' in filters else ())
+            assert result['total'] == _brute_force(builds, **filters)
+        assert all(record['content'] in unique for record in index.query(limit=50)['records'])
+    finally:
+        index.close()
+
+def test_index_with_unique_digest_is_migrated(tmp_path, monkeypatch):
+    db = str(tmp_path / 'index.sqlite')
+    conn = analyze_logs.sqlite3.connect(db)
+    conn.executescript(analyze_logs.INDEX_SCHEMA.replace('digest INTEGER NOT NULL,', 'digest INTEGER NOT NULL UNIQUE,'))
+    conn.execute("INSERT INTO lines (digest, content) VALUES (42, 'old line')")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(analyze_logs, '_stable_hash', lambda value, salt=b'': 42 + (1 << 63))
+    index = analyze_logs.LogIndex(db)
+    try:
+        assert index._line_id('old line') == 1
+        assert index._line_id('new line') == 2
+        assert index.conn.execute('PRAGMA user_version').fetchone()[0] == analyze_logs.INDEX_SCHEMA_VERSION
+    finally:
+        index.close()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Таблица уникальных строк: интернирование без ANSI-кодов, ограничение размера, однократные вычисления"""
+
+import analyze_logs
+
+def _raw(content):
+    return {'timestamp': '2026-02-09T08:40:22.0', 'stream': 'stdout', 'content': content}
+
+def test_escape_variants_share_one_entry():
+    table = analyze_logs.LineTable()
+    plain = table.intern('npm ERR! code ELIFECYCLE')
+    colored = table.intern('\x1b[31mnpm ERR!\x1b[0m code ELIFECYCLE')
+    bold = table.intern('\x1b[1;31mnpm ERR!\x1b[0m code \x1b[0mELIFECYCLE')
+    assert plain is colored is bold
+    assert len(table.lines) == 1
+    assert plain.clean == 'npm ERR! code ELIFECYCLE'
+
+def test_record_keeps_raw_content_and_colour_level():
+    table = analyze_logs.LineTable()
+    red = analyze_logs.LogRecord(_raw('\x1b[31mdone\x1b[0m'), table.intern('\x1b[31mdone\x1b[0m'))
+    cyan = analyze_logs.LogRecord(_raw('\x1b[36mdone\x1b[0m'), table.intern('\x1b[36mdone\x1b[0m'))
+    plain = analyze_logs.LogRecord(_raw('done'), table.intern('done'))
+    assert red.line is cyan.line is plain.line
+    assert red.content == '\x1b[31mdone\x1b[0m'
+    assert red.clean == plain.clean == 'done'
+    # Цвет по-прежнему определяет категорию, хотя строка в таблице одна
+    assert (red.level, cyan.level, plain.level) == ('ERROR', 'INFO', 'OTHER')
+    for raw in ('\x1b[31mdone\x1b[0m', '\x1b[36mdone\x1b[0m', 'done'):
+        assert analyze_logs.LogRecord(_raw(raw)).level == analyze_logs.classify_level(
+            raw, analyze_logs.keyword_matcher.scan(raw))
+
+def test_derived_values_computed_once_per_line(monkeypatch):
+    calls = []
+    scan = analyze_logs.keyword_matcher.scan
+    monkeypatch.setattr(analyze_logs.keyword_matcher, 'scan', lambda content: calls.append(content) or scan(content))
+    contents = ['ERROR: failed to fetch', '\x1b[31mERROR: failed to fetch\x1b[0m', 'ok'] * 50
+    table = analyze_logs.LineTable()
+    records = [analyze_logs.LogRecord(_raw(c), table.intern(c)) for c in contents]
+    fingerprints = {r.fingerprint for r in records[::3]}
+    assert [r.tags for r in records[:3]] == [r.tags for r in records[-3:]]
+    assert all(r.level for r in records)
+    assert sorted(calls) == ['ERROR: failed to fetch', 'ok']
+    assert len(fingerprints) == 1
+
+def test_table_cap_stops_storing_new_lines():
+    table = analyze_logs.LineTable(max_lines=3)
+    lines = [table.intern(f'line {n}') for n in range(5)]
+    assert list(table.lines) == ['line 0', 'line 1', 'line 2']
+    # Сверх лимита строка не запоминается, но запись получает рабочий LineInfo
+    assert table.intern('line 4') is not lines[4]
+    assert lines[4].clean == 'line 4'
+    assert table.intern('\x1b[33mline 1\x1b[0m') is lines[1]
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Живой поток: чтение строк, строки длиннее лимита, тревоги"""
+
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import analyze_logs
+from conftest import ROOT
+
+def _record(i, content='ok'):
+    return json.dumps({'timestamp': f'2026-02-09T08:40:{i:02d}.000000001', 'stream': 'stdout',
+                       'content': f'{content} {i}'}).encode('utf-8') + b'\n'
+
+def _read(chunks, limit=256):
+    """Строки, которые read_stream передаёт в очередь, при подаче данных кусками"""
+    async def run():
+        reader = asyncio.StreamReader(limit=limit)
+        analyzer = analyze_logs.LiveAnalyzer(queue_size=0)
+        
+        async def feed():
+            for chunk in chunks:
+                reader.feed_data(chunk)
+                await asyncio.sleep(0)
+            reader.feed_eof()
+        
+        await asyncio.gather(feed(), analyzer.read_stream(reader))
+        lines = []
+        while not analyzer.queue.empty():
+            lines.append(analyzer.queue.get_nowait())
+        return lines
+    return asyncio.run(run())
+
+def test_lines_are_passed_through():
+    data = _record(1) + _record(2) + b'tail without newline'
+    assert _read([data]) == [_record(1), _record(2), b'tail without newline']
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 50, 10000])
+def test_oversized_line_is_skipped_without_losing_next_records(chunk_size):
+    data = _record(1) + b'x' * 1000 + b'\n' + _record(2) + _record(3)
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+    assert _read(chunks) == [_record(1), _record(2), _record(3)]
+
+def test_oversized_line_right_before_next_record():
+    # Перевод строки длинной строки и следующая запись уже в буфере
+    assert _read([b'y' * 600 + b'\n' + _record(4)]) == [_record(4)]
+
+def test_oversized_last_line_without_newline():
+    assert _read([_record(1), b'z' * 500]) == [_record(1)]
+
+def test_oversized_line_in_live_command(tmp_path):
+    output = tmp_path / 'live.json'
+    data = b'{"content": "' + b'x' * (2 * analyze_logs.LIVE_LINE_LIMIT + (4 << 20)) + b'"}\n' + _record(1) + _record(2)
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, 'analyze_logs.py'), 'live', '-o', str(output)],
+                          input=data, capture_output=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+    with open(output, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    assert results['stats']['total_records'] == 2
+
+def test_file_pump_skips_oversized_lines():
+    data = _record(1) + b'x' * 1000 + b'\n' + _record(2) + b'y' * 256 + _record(3) + b'z' * 300
+    
+    async def run():
+        analyzer = analyze_logs.LiveAnalyzer(queue_size=0)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, analyze_logs._pump_file, io.BytesIO(data), analyzer, loop,
+                                   threading.Event(), 256)
+        return [analyzer.queue.get_nowait() for _ in range(analyzer.queue.qsize())]
+    
+    # Строка без перевода строки в пределах лимита пропускается вместе с хвостом до '\n'
+    assert asyncio.run(run()) == [_record(1), _record(2)]
+
+class _FailingStage(analyze_logs.AnalysisStage):
+    name = 'failing'
+    
+    def feed(self, rec):
+        raise RuntimeError('stage failed')
+
+def test_failing_consumer_stops_file_pump(tmp_path, monkeypatch):
+    path = tmp_path / 'stdin.log'
+    path.write_bytes(b''.join(_record(i % 60) for i in range(5000)))
+    stdin = io.TextIOWrapper(open(path, 'rb'))
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    analyzer = analyze_logs.LiveAnalyzer(queue_size=1)
+    analyzer.stages.append(_FailingStage())
+    errors = []
+    
+    def run():
+        try:
+            asyncio.run(analyze_logs.run_live(analyzer, 'stdin'))
+        except RuntimeError as e:
+            errors.append(e)
+    
+    # stdin из обычного файла читается в потоке исполнителя; asyncio.run ждёт его завершения
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    try:
+        assert not thread.is_alive()
+        assert [str(e) for e in errors] == ['stage failed']
+        assert stdin.buffer.tell() < path.stat().st_size
+    finally:
+        stdin.close()
+
+def test_alerts_for_npm_error_and_fatal():
+    alerts = []
+    analyzer = analyze_logs.LiveAnalyzer(alerts.append)
+    records = [{'timestamp': '2026-02-09T08:40:01.1', 'stream': 'stderr', 'content': 'npm ERR! code E404'},
+               {'timestamp': '2026-02-09T08:40:02.1', 'stream': 'stderr', 'content': 'FATAL: boom'}]
+    
+    async def run():
+        for record in records:
+            await analyzer.put(record)
+        await analyzer.put(None)
+        await analyzer.consume()
+    
+    asyncio.run(run())
+    assert [alert['alert'] for alert in alerts] == ['npm_error', 'fatal']
+    assert analyzer.records == 2
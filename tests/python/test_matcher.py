@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""KeywordMatcher против прежнего поиска подстрок по каждому ключевому слову"""
+
+import pytest
+
+import analyze_logs
+from benchmark_analyze_logs import generate_lines, legacy_scan
+from conftest import TRICKY_CONTENTS
+
+@pytest.mark.parametrize('content', TRICKY_CONTENTS + [
+    'FAILED and fail', 'failure', 'WARNING: warn', 'yarn ERR! x', 'gyp ERR! y', 'npm Err! z',
+    'DEPRECATED', 'Deprecated API', 'EPERM', 'eperm', 'ETIMEDOUT', 'time out', 'TimeOut',
+    'HEAD is now at abc', 'head IS NOW at abc', 'npm ci', 'NPM INSTALL', 'npm run build',
+    'copy', 'Copying', 'DONE', 'abandoned', 'information', '',
+])
+def test_keyword_matcher_matches_legacy_scan(content):
+    assert analyze_logs.keyword_matcher.scan(content) == legacy_scan(content)
+
+def test_keyword_matcher_matches_legacy_scan_on_generated_lines():
+    for line in generate_lines(5000, seed=3):
+        assert analyze_logs.keyword_matcher.scan(line) == legacy_scan(line), line
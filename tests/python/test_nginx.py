@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Режим nginx: форматы cache_stats, ограниченная таблица некэшированных URL, объединение логов"""
+
+import pickle
+import random
+from collections import Counter
+
+import pytest
+
+import analyze_logs
+
+# log_format cache_stats из nginx.conf и он же с полями rt/content_type
+OLD_LINE = ('17/Oct/2026:04:00:00 +0000|10.0.0.1|GET|/stickers/abc?file=true|cache_status={cache}|'
+            'cache_key="/stickers/abc?file=true"|status=200|bytes=1234')
+NEW_LINE = OLD_LINE + '|rt=0.012|content_type=image/webp'
+
+def _entry(uri: str, cache: str = 'MISS') -> dict:
+    return {'uri': uri, 'status': 200, 'bytes': 10, 'cache': cache, 'request_time': None, 'content_type': None}
+
+@pytest.mark.parametrize('line, request_time, content_type, media', [
+    (OLD_LINE, None, None, 'other'),
+    (NEW_LINE, 0.012, 'image/webp', 'webp'),
+])
+def test_cache_stats_old_and_extended_format(line, request_time, content_type, media):
+    line = line.format(cache='HIT')
+    assert analyze_logs.detect_access_format(line) == 'cache_stats'
+    entry = analyze_logs.parse_cache_stats_line(line)
+    assert entry['uri'] == '/stickers/abc?file=true'
+    assert (entry['status'], entry['bytes'], entry['cache']) == (200, 1234, 'HIT')
+    assert entry['request_time'] == request_time
+    assert entry['content_type'] == content_type
+    assert analyze_logs.media_type(entry) == media
+
+def test_log_with_both_formats(tmp_path):
+    # Лог на момент выкладки расширенного формата: сначала старые строки, потом новые
+    path = tmp_path / 'access.log'
+    lines = [OLD_LINE.format(cache='MISS')] * 3 + [NEW_LINE.format(cache='HIT')] * 2
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    results = analyze_logs.analyze_access_log(str(path)).result()
+    assert results['requests'] == 5
+    assert results['skipped_lines'] == 0
+    assert results['cache_statuses'] == {'MISS': 3, 'HIT': 2}
+    assert results['by_type']['webp']['hits'] == 2
+    assert results['by_type']['other']['cache_requests'] == 3
+    assert results['latency_seconds']['all']['count'] == 2
+    assert results['top_uncached'] == [{'uri': '/stickers/abc?file=true', 'count': 3, 'error': 0}]
+
+def _skewed_uris(count: int, seed: int):
+    """Немного частых URL на фоне множества уникальных"""
+    rng = random.Random(seed)
+    for i in range(count):
+        if rng.random() < 0.3:
+            yield f'/stickers/hot{rng.randrange(5)}'
+        else:
+            yield f'/stickers/{seed}-{i}'
+
+def test_uncached_table_is_bounded():
+    stats = analyze_logs.AccessLogStats(uncached_capacity=50)
+    uris = list(_skewed_uris(20000, seed=1))
+    for uri in uris:
+        stats.feed(_entry(uri))
+    assert len(stats.uncached.entries) == 50
+    exact = Counter(uris)
+    top = stats.result(top=5)['top_uncached']
+    assert {item['uri'] for item in top} == {f'/stickers/hot{i}' for i in range(5)}
+    for item in top:
+        assert item['count'] - item['error'] <= exact[item['uri']] <= item['count']
+    assert not stats.result()['accuracy']['top_uncached']['exact']
+
+def test_merge_keeps_heavy_hitters_and_bounds():
+    parts = [list(_skewed_uris(8000, seed)) for seed in (1, 2, 3)]
+    exact = Counter(uri for part in parts for uri in part)
+    merged = analyze_logs.AccessLogStats(uncached_capacity=40)
+    for part in parts:
+        stats = analyze_logs.AccessLogStats(uncached_capacity=40)
+        for uri in part:
+            stats.feed(_entry(uri))
+        # Части приходят из рабочих процессов через pickle
+        merged.merge(pickle.loads(pickle.dumps(stats)))
+    assert len(merged.uncached.entries) <= 40
+    assert merged.requests == sum(len(part) for part in parts)
+    top = merged.result(top=5)['top_uncached']
+    assert {item['uri'] for item in top} == {f'/stickers/hot{i}' for i in range(5)}
+    bound = merged.result()['accuracy']['top_uncached']['max_overcount']
+    for group in merged.uncached.groups():
+        assert group['count'] - group['error'] <= exact[group['uri']] <= group['count']
+        assert group['error'] <= bound
+
+def test_merge_without_evictions_is_exact():
+    first, second = analyze_logs.AccessLogStats(), analyze_logs.AccessLogStats()
+    for uri in ['/a', '/b', '/a']:
+        first.feed(_entry(uri))
+    for uri in ['/b', '/c', '/b', '/a']:
+        second.feed(_entry(uri))
+    first.merge(second)
+    assert first.result()['top_uncached'] == [
+        {'uri': '/a', 'count': 3, 'error': 0},
+        {'uri': '/b', 'count': 3, 'error': 0},
+        {'uri': '/c', 'count': 1, 'error': 0},
+    ]
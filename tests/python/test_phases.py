@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Фазы сборки: границы по маркерам, вложенные стадии kaniko, сводка длительностей"""
+
+import pytest
+
+import analyze_logs
+
+# (секунда от начала, content); шаги и стадии kaniko — две независимые дорожки
+BUILD = [
+    (0, "Cloning into 'app'..."),
+    (2, 'remote: Enumerating objects: 120'),
+    (5, 'Retrieving image node:20-alpine'),
+    (6, "Building stage 'deps'"),
+    (7, 'RUN npm ci'),
+    (27, 'added 1200 packages in 20s'),
+    (30, "Building stage 'build'"),
+    (31, 'npx tsc --noEmit'),
+    (35, 'RUN npm install --production'),
+    (38, 'npx tsc -p tsconfig.build.json'),
+    (41, 'vite v5.0.1 building for production...'),
+    (50, '✓ built in 9.12s'),
+    (55, 'Pushing image to registry.example.com/app'),
+    (60, 'pushing image layer 3/5'),
+    (65, 'Container builder has completed'),
+    (70, 'cleanup'),
+]
+
+def _records(lines):
+    return [{'timestamp': f'2026-02-09T08:{40 + second // 60:02d}:{second % 60:02d}.0', 'stream': 'stdout',
+             'content': content} for second, content in lines]
+
+@pytest.fixture(scope='module')
+def phases():
+    return analyze_logs.profile_phases(_records(BUILD))
+
+def test_phase_boundaries(phases):
+    spans = [(p['phase'], p['start'][-4:-2], p['end'][-4:-2]) for p in phases['phases']]
+    assert spans == [
+        ('clone', '00', '05'),
+        ('base_image', '05', '07'),
+        ('stage:deps', '06', '30'),
+        ('install', '07', '31'),
+        ('stage:build', '30', '55'),
+        ('tsc', '31', '35'),
+        ('install', '35', '38'),
+        ('tsc', '38', '41'),
+        ('vite', '41', '55'),
+        # Повторный маркер push не открывает новую фазу; конец сборки закрывает её
+        ('push', '55', '05'),
+    ]
+    assert [p['records'] for p in phases['phases']] == [2, 2, 3, 3, 6, 1, 1, 1, 2, 3]
+
+def test_summary_counts_totals_and_maxima(phases):
+    summary = phases['summary']
+    assert summary['install'] == {'count': 2, 'total_seconds': 27.0, 'max_seconds': 24.0,
+                                  'longest_silence_seconds': 20.0}
+    assert summary['tsc'] == {'count': 2, 'total_seconds': 7.0, 'max_seconds': 4.0,
+                              'longest_silence_seconds': 0.0}
+    assert summary['stage:build']['total_seconds'] == 25.0
+    assert summary['stage:deps']['longest_silence_seconds'] == 20.0
+    assert summary['push']['total_seconds'] == 10.0
+    # Сводка — по убыванию суммарной длительности
+    totals = [s['total_seconds'] for s in summary.values()]
+    assert totals == sorted(totals, reverse=True)
+    assert list(summary)[0] == 'install'
+
+def test_longest_silences_inside_phase(phases):
+    install = phases['phases'][3]
+    assert install['silences'][0]['seconds'] == 20.0
+    assert install['silences'][0]['before']['content'] == 'RUN npm ci'
+    assert install['silences'][0]['after']['content'] == 'added 1200 packages in 20s'
+    assert [s['seconds'] for s in install['silences']] == sorted((s['seconds'] for s in install['silences']),
+                                                                 reverse=True)
+
+def test_unfinished_build_closes_at_last_record():
+    stage = analyze_logs.BuildPhasesStage()
+    for record in _records(BUILD[:12]):
+        stage.feed(analyze_logs.LogRecord(record))
+    result = stage.result()
+    open_phases = {p['phase']: p['end'][-4:-2] for p in result['phases'] if p['phase'] in ('stage:build', 'vite')}
+    assert open_phases == {'stage:build': '50', 'vite': '50'}
+    # result() не закрывает фазы: продолжение лога даёт то же, что полный проход
+    for record in _records(BUILD[12:]):
+        stage.feed(analyze_logs.LogRecord(record))
+    assert stage.result() == analyze_logs.profile_phases(_records(BUILD))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Однопроходный конвейер против прежней реализации анализа"""
+
+import pytest
+
+import analyze_logs
+import baseline_analyzer
+from conftest import roundtrip
+
+def test_basic_stats_match_baseline(records):
+    expected = baseline_analyzer.analyze_basic_stats(records)
+    actual = analyze_logs.analyze_basic_stats(iter(records))
+    for key in ('total_records', 'first_timestamp', 'last_timestamp', 'streams', 'content_lengths'):
+        assert actual[key] == expected[key], key
+    # Прежняя версия считала через datetime (микросекунды), новая — в наносекундах
+    assert actual['duration_seconds'] == pytest.approx(expected['duration_seconds'], abs=1e-5)
+
+def test_categories_match_baseline(records):
+    expected = baseline_analyzer.categorize_by_level(records)
+    actual = analyze_logs.categorize_by_level(iter(records))
+    assert actual == expected
+
+def test_problems_match_baseline(records):
+    expected = baseline_analyzer.find_problems(records)
+    actual = analyze_logs.find_problems(iter(records))
+    assert set(actual) == set(expected)
+    for group in expected:
+        assert actual[group] == expected[group], group
+
+def test_timeline_matches_baseline(records):
+    assert analyze_logs.analyze_timeline(iter(records)) == baseline_analyzer.analyze_timeline(records)
+
+def test_time_gaps_match_baseline(records):
+    expected = baseline_analyzer.find_time_gaps(records, 5)
+    actual = analyze_logs.find_time_gaps(iter(records), 5)
+    assert [(g['before'], g['after']) for g in actual] == [(g['before'], g['after']) for g in expected]
+    for a, e in zip(actual, expected):
+        assert a['gap_seconds'] == pytest.approx(e['gap_seconds'], abs=1e-5)
+
+def test_duplicates_match_baseline(records):
+    errors = baseline_analyzer.find_problems(records)['errors']
+    expected = baseline_analyzer.aggregate_duplicates(errors)
+    actual = analyze_logs.aggregate_duplicates(errors)
+    # Порядок при равном счёте не задан: сравниваем группы по ключу
+    fields = ('count', 'first_occurrence', 'last_occurrence', 'example')
+    assert {g['sample']: tuple(g[f] for f in fields) for g in actual} == \
+        {g['sample']: tuple(g[f] for f in fields) for g in expected}
+    assert all(g['error'] == 0 for g in actual)
+
+def test_single_pass_equals_separate_stages(records):
+    # Все этапы за один проход дают то же, что каждый этап своим проходом
+    stages = analyze_logs.default_stages()
+    analyze_logs.feed_pipeline(iter(records), stages)
+    together = roundtrip(analyze_logs.build_results(stages))
+    for stage in analyze_logs.default_stages():
+        analyze_logs.feed_pipeline(iter(records), [stage])
+        alone = roundtrip(analyze_logs.build_results([stage]))
+        for key, value in alone.items():
+            if key == 'accuracy':
+                assert value == {name: together[key][name] for name in value}
+            else:
+                assert value == together[key], key
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""Быстрая проверка scan: те же счётчики проблем, что и у полного анализа"""
+
+import gzip
+
+import pytest
+
+import analyze_logs
+from benchmark_analyze_logs import SyntheticLog
+
+def _problem_counts(path, groups):
+    problems = analyze_logs.find_problems(analyze_logs.iter_records(path))
+    return {group: len(problems[group]) for group in groups}
+
+@pytest.mark.parametrize('fmt', ['json', 'ndjson'])
+def test_scan_counts_match_full_analysis(write_records, fmt):
+    path = write_records(list(SyntheticLog(error_ratio=0.2, seed=11).records(5000)), fmt=fmt)
+    summary = analyze_logs.scan_problems(path)
+    assert summary['counts'] == _problem_counts(path, analyze_logs.PREFILTER_GROUPS)
+    assert summary['has_problems']
+    # Разобраны только записи вокруг опор, а не весь лог
+    assert summary['records_parsed'] < 5000
+
+def test_scan_of_clean_log(write_records):
+    path = write_records(list(SyntheticLog(error_ratio=0, seed=5).records(2000)))
+    summary = analyze_logs.scan_problems(path, groups=['file_errors'])
+    assert summary['counts'] == {'file_errors': 0}
+    assert not summary['has_problems']
+
+def test_scan_first_only_stops_early(write_records):
+    path = write_records(list(SyntheticLog(error_ratio=0.2, seed=11).records(5000)))
+    summary = analyze_logs.scan_problems(path, first_only=True)
+    assert summary['has_problems']
+    assert sum(summary['counts'].values()) >= 1
+    assert summary['records_parsed'] < analyze_logs.scan_problems(path)['records_parsed']
+
+def test_compressed_log_falls_back_to_streaming(write_records, tmp_path):
+    path = write_records(list(SyntheticLog(error_ratio=0.2, seed=11).records(3000)))
+    packed = str(tmp_path / 'build.log.gz')
+    with open(path, 'rb') as src, gzip.open(packed, 'wb') as dst:
+        dst.write(src.read())
+    assert analyze_logs.scan_problems(packed)['counts'] == analyze_logs.scan_problems(path)['counts']
+
+def test_scan_is_case_insensitive_like_full_analysis(write_records):
+    contents = ['Request TIMEOUT after 30s', 'error: eacces permission denied', 'Socket Etimedout',
+                'EPERM: operation not permitted', 'Connect ETIMEDOUT 10.0.0.1:443', 'all good']
+    path = write_records([{'timestamp': f'2026-02-09T08:40:{i:02d}.1', 'stream': 'stderr', 'content': content}
+                          for i, content in enumerate(contents)])
+    summary = analyze_logs.scan_problems(path)
+    problems = analyze_logs.analyze_file(path)['problems']
+    assert summary['counts'] == {group: problems[group] for group in analyze_logs.PREFILTER_GROUPS}
+    assert summary['counts'] == {'npm_errors': 0, 'file_errors': 2, 'timeouts': 3}
+    assert summary['has_problems']
+
+def test_scan_matches_full_analysis_on_mixed_case_log(records, log_file):
+    summary = analyze_logs.scan_problems(log_file)
+    problems = analyze_logs.analyze_file(log_file)['problems']
+    assert summary['counts'] == {group: problems[group] for group in analyze_logs.PREFILTER_GROUPS}
+
+def test_anchor_split_between_blocks(monkeypatch, write_records):
+    # Опора на границе блоков находится ровно один раз
+    monkeypatch.setattr(analyze_logs, 'PREFILTER_CHUNK', 37)
+    path = write_records([{'timestamp': '2026-02-09T08:40:00.1', 'stream': 'stderr', 'content': 'x' * i + ' ENOENT'}
+                          for i in range(40)])
+    assert analyze_logs.scan_problems(path)['counts']['file_errors'] == 40
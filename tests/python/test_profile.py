@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Режим --profile: раздельный замер этапов без смещения затрат и без вмешательства в tracemalloc"""
+
+import tracemalloc
+
+import analyze_logs
+from conftest import roundtrip
+
+def test_profile_results_equal_analysis(log_file):
+    profiler = analyze_logs.StageProfiler()
+    results = analyze_logs.profile_file(log_file, profiler)
+    assert roundtrip(results) == roundtrip(analyze_logs.analyze_file(log_file))
+    names = [step['stage'] for step in profiler.steps]
+    assert names[:2] == ['load', 'parse'] and names[-1] == 'results'
+
+def test_each_stage_pays_for_derived_fields(log_file, monkeypatch):
+    # Теги строки считает KeywordMatcher.scan: считаем вызовы на каждом шаге
+    calls = [0]
+    scan = analyze_logs.keyword_matcher.scan
+    def counting_scan(content):
+        calls[0] += 1
+        return scan(content)
+    monkeypatch.setattr(analyze_logs.keyword_matcher, 'scan', counting_scan)
+    per_step = {}
+    def hook(event):
+        per_step[event['stage']] = calls[0] - sum(per_step.values())
+    analyze_logs.profile_file(log_file, analyze_logs.StageProfiler([hook], trace_memory=False))
+    assert per_step['load'] == 0
+    assert per_step['parse'] == 0
+    # И категории, и проблемы используют теги — каждый этап вычисляет их сам
+    assert per_step['categories'] > 0
+    assert per_step['problems'] == per_step['categories']
+
+def test_external_tracemalloc_keeps_running(log_file):
+    tracemalloc.start()
+    try:
+        ballast = [bytes(1000) for _ in range(1000)]
+        profiler = analyze_logs.StageProfiler()
+        analyze_logs.profile_file(log_file, profiler, sections=['stats'])
+        assert tracemalloc.is_tracing()
+        # Пик шага — сверх памяти на его начало: балласт вызывающего кода не учитывается
+        assert all(0 <= step['peak_memory_bytes'] < 10 ** 9 for step in profiler.steps)
+        stats_step = next(step for step in profiler.steps if step['stage'] == 'stats')
+        assert stats_step['peak_memory_bytes'] < len(ballast) * 1000
+    finally:
+        tracemalloc.stop()
+    assert not tracemalloc.is_tracing()
+
+def test_profiler_stops_its_own_tracing(log_file):
+    analyze_logs.profile_file(log_file, analyze_logs.StageProfiler(), sections=['stats'])
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Выбор разделов (--sections): запускаются только нужные этапы, в результатах только их ключи"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import analyze_logs
+from conftest import ROOT
+
+@pytest.fixture
+def created(monkeypatch):
+    """Имена разделов, этапы которых были созданы"""
+    names = []
+
+    def spy(name, factory):
+        def create():
+            names.append(name)
+            return factory()
+        return create
+
+    monkeypatch.setattr(analyze_logs, 'SECTIONS',
+                        {name: spy(name, factory) for name, factory in analyze_logs.SECTIONS.items()})
+    return names
+
+def _saved(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def test_only_requested_stages_are_created(created, log_file, tmp_path):
+    output = str(tmp_path / 'results.json')
+    results = analyze_logs.main(silent=True, filepath=log_file, output_file=output, sections=['problems'])
+    assert created == ['problems']
+    saved = _saved(output)
+    # accuracy — гарантии точности выборок примеров, только для запущенных этапов
+    assert list(saved) == ['problems', 'accuracy']
+    assert list(saved['accuracy']) == ['problems']
+    assert [key for key in results if not key.startswith('_')] == list(saved)
+    assert results['problems'] == analyze_logs.analyze_file(log_file)['problems']
+
+def test_profile_mode_creates_only_requested_stages(created, log_file, tmp_path):
+    output = str(tmp_path / 'results.json')
+    analyze_logs.main(silent=True, filepath=log_file, output_file=output, sections=['stats', 'timeline'],
+                      profiler=analyze_logs.StageProfiler())
+    # Профилировщик готовит отдельный экземпляр каждого этапа, но только выбранных
+    assert set(created) == {'stats', 'timeline'}
+    assert set(_saved(output)) - {'accuracy'} == {'stats', 'timeline'}
+
+def test_sections_command_line(log_file, tmp_path):
+    output = str(tmp_path / 'results.json')
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, 'analyze_logs.py'), log_file, '-o', output, '-s',
+                           '--sections', 'problems, error_aggregated'], capture_output=True, timeout=120)
+    assert proc.returncode == 0, proc.stderr.decode('utf-8', 'replace')
+    saved = _saved(output)
+    assert list(saved) == ['problems', 'error_aggregated', 'accuracy']
+    assert set(saved['accuracy']) == {'problems', 'error_aggregated'}
+
+def test_unknown_section_is_rejected(log_file):
+    proc = subprocess.run([sys.executable, os.path.join(ROOT, 'analyze_logs.py'), log_file, '-s',
+                           '--sections', 'problems,bogus'], capture_output=True, timeout=120)
+    assert proc.returncode == 2
+    assert 'bogus' in proc.stderr.decode('utf-8', 'replace')
+    with pytest.raises(ValueError):
+        analyze_logs.default_stages(['bogus'])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Локальный сервис анализа: эндпоинты, ошибки запросов, LRU разобранных сборок"""
+
+import os
+
+import pytest
+
+import analyze_logs
+from conftest import roundtrip
+
+@pytest.fixture
+def service(records, write_records):
+    log = write_records(records[:2000], 'build.log')
+    return analyze_logs.AnalysisService(os.path.dirname(log), analyze_logs.BuildCache()), log
+
+def test_endpoints_match_analysis(service):
+    service, log = service
+    results = roundtrip(analyze_logs.analyze_file(log))
+    status, payload = service.handle('/stats?log=build.log')
+    assert status == 200
+    assert roundtrip(payload['stats']) == results['stats']
+    status, payload = service.handle('/problems?log=build.log&group=errors&limit=3')
+    assert status == 200
+    assert payload['total'] == results['problems']['errors_count']
+    assert len(payload['items']) == min(3, payload['total'])
+    status, payload = service.handle('/timeline?log=build.log')
+    assert status == 200
+    assert roundtrip(payload['timeline']) == results['timeline']
+    assert service.handle('/health') == (200, {'status': 'ok'})
+
+@pytest.mark.parametrize('target, status', [
+    ('/stats', 400),
+    ('/stats?log=missing.log', 404),
+    ('/stats?log=../outside.log', 403),
+    ('/unknown?log=build.log', 404),
+    ('/problems?log=build.log&group=nope', 400),
+    ('/gaps?log=build.log&threshold=x', 400),
+    ('/gaps?log=build.log&offset=-1', 400),
+    ('/aggregates?log=build.log&limit=-5', 400),
+    ('/aggregates?log=build.log&limit=x', 400),
+    ('/problems?log=build.log&group=errors&offset=-3', 400),
+    ('/problems?log=build.log&group=errors&limit=-1', 400),
+])
+def test_request_errors(service, target, status):
+    service, _ = service
+    code, payload = service.handle(target)
+    assert code == status
+    assert 'error' in payload
+
+def test_internal_error_returns_500(service, monkeypatch, capsys):
+    service, _ = service
+    def broken(build, params):
+        raise KeyError('stats')
+    monkeypatch.setitem(analyze_logs.SERVICE_ENDPOINTS, '/stats', broken)
+    status, payload = service.handle('/stats?log=build.log')
+    assert status == 500
+    assert 'KeyError' in payload['error']
+    err = capsys.readouterr().err
+    assert 'Traceback' in err and '/stats?log=build.log' in err
+    # Сервис продолжает отвечать
+    assert service.handle('/health')[0] == 200
+
+def test_log_is_read_once(service, monkeypatch):
+    service, log = service
+    opened = []
+    open_log = analyze_logs.open_log
+    def counting_open(filepath, *args, **kwargs):
+        opened.append(filepath)
+        return open_log(filepath, *args, **kwargs)
+    monkeypatch.setattr(analyze_logs, 'open_log', counting_open)
+    for target in ('/stats', '/problems', '/aggregates', '/gaps'):
+        assert service.handle(f'{target}?log=build.log')[0] == 200
+    assert opened == [os.path.realpath(log)]
+    info = service.builds.info()
+    assert info['loads'] == 1
+    assert info['builds'][0]['hits'] == 3
+
+def test_lru_evicts_oldest_build(records, write_records):
+    first = write_records(records[:500], 'first.log')
+    second = write_records(records[500:1000], 'second.log')
+    builds = analyze_logs.BuildCache(max_bytes=1)
+    builds.get(first)
+    builds.get(second)
+    info = builds.info()
+    # Последняя сборка остаётся всегда, даже сверх лимита
+    assert [b['log'] for b in info['builds']] == [second]
+    assert info['evictions'] == 1
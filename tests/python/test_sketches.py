@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Ограниченные по памяти структуры: Space-Saving, Count-Min, выборки примеров"""
+
+import json
+import random
+from collections import Counter
+
+import analyze_logs
+
+def _zipf_stream(count, keys, seed):
+    rnd = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return [f'key-{k}' for k in rnd.choices(range(keys), weights, k=count)]
+
+def test_space_saving_bounds():
+    stream = _zipf_stream(20000, 2000, seed=5)
+    exact = Counter(stream)
+    table = analyze_logs.SpaceSaving(capacity=100)
+    for key in stream:
+        table.add(key, lambda key=key: {'key': key})
+    groups = {g['key']: g for g in table.groups()}
+    assert table.evictions > 0
+    for key, group in groups.items():
+        assert group['count'] - group['error'] <= exact[key] <= group['count'], key
+    bound = len(stream) // table.capacity
+    for key, count in exact.items():
+        if count > bound:
+            assert key in groups, key
+
+def test_space_saving_exact_without_evictions():
+    stream = _zipf_stream(5000, 50, seed=6)
+    table = analyze_logs.SpaceSaving(capacity=100)
+    for key in stream:
+        table.add(key, lambda key=key: {'key': key})
+    assert {g['key']: g['count'] for g in table.groups()} == Counter(stream)
+    assert table.accuracy('test')['exact']
+
+def test_space_saving_state_roundtrip():
+    stream = _zipf_stream(5000, 500, seed=7)
+    table = analyze_logs.SpaceSaving(capacity=50)
+    for key in stream[:2500]:
+        table.add(key, lambda key=key: {'key': key})
+    restored = analyze_logs.SpaceSaving()
+    restored.set_state(json.loads(json.dumps(table.get_state())), 'key')
+    for key in stream[2500:]:
+        table.add(key, lambda key=key: {'key': key})
+        restored.add(key, lambda key=key: {'key': key})
+    assert sorted(map(str, table.groups())) == sorted(map(str, restored.groups()))
+
+def test_count_min_never_underestimates():
+    stream = _zipf_stream(20000, 5000, seed=8)
+    sketch = analyze_logs.CountMinSketch()
+    for key in stream:
+        sketch.add(key)
+    for key, count in Counter(stream).items():
+        assert count <= sketch.estimate(key) <= count + analyze_logs.COUNT_MIN_EPSILON * len(stream) * 10
+
+def test_reservoir_is_deterministic_and_bounded():
+    first, second = analyze_logs.Reservoir(5, 'x'), analyze_logs.Reservoir(5, 'x')
+    for i in range(1000):
+        first.add(i)
+        second.add(i)
+    assert first.items == second.items
+    assert len(first.items) == 5 and first.seen == 1000
+
+def test_accuracy_computed_once_per_stage(records, monkeypatch):
+    calls = Counter()
+    accuracy = analyze_logs.DuplicatesStage.accuracy
+
+    def counted(self):
+        calls[self.name] += 1
+        return accuracy(self)
+
+    monkeypatch.setattr(analyze_logs.DuplicatesStage, 'accuracy', counted)
+    stages = analyze_logs.default_stages(['error_aggregated', 'deprecated_aggregated'])
+    analyze_logs.feed_pipeline(iter(records), stages)
+    results = analyze_logs.build_results(stages)
+    assert calls == {'error_aggregated': 1, 'deprecated_aggregated': 1}
+    assert set(results['accuracy']) == {'error_aggregated', 'deprecated_aggregated'}
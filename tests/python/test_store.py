@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Колоночное хранилище LogStore: содержимое, уникальные строки и расход памяти"""
+
+import tracemalloc
+
+import analyze_logs
+from conftest import synthetic_records
+
+def test_log_store_keeps_records(records, log_file):
+    store = analyze_logs.load_log_store(log_file)
+    assert len(store) == len(records)
+    assert list(store) == records
+    assert store[17] == records[17]
+    assert store[-1] == records[-1]
+
+def test_unique_contents_stored_once(records):
+    store = analyze_logs.LogStore.from_records(iter(records))
+    unique = list(dict.fromkeys(r['content'] for r in records))
+    assert list(store.unique_contents()) == unique
+    assert list(store.contents()) == [r['content'] for r in records]
+    # Ключи поиска уникальных строк — хеши фиксированного размера, а не сами строки
+    assert all(isinstance(key, bytes) and len(key) == 8 for key in store._content_index)
+
+def test_digest_collisions_keep_contents_apart(records, monkeypatch):
+    # Все строки с одним хешем: различаются только сравнением байт
+    monkeypatch.setattr(analyze_logs, '_content_digest', lambda data: b'\0' * 8)
+    store = analyze_logs.LogStore.from_records(iter(records[:500]))
+    assert list(store) == records[:500]
+    assert len(store._content_index) == 1
+    assert len(list(store.unique_contents())) == len({r['content'] for r in records[:500]})
+
+def _traced_size(build):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        value = build()
+        size = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return value, size
+
+def test_log_store_memory_against_list_of_dicts(write_records):
+    path = write_records(synthetic_records(20000, seed=11))
+    records, list_bytes = _traced_size(lambda: list(analyze_logs.iter_records(path)))
+    store, store_bytes = _traced_size(lambda: analyze_logs.load_log_store(path))
+    assert len(store) == len(records)
+    # Список словарей — сотни байт накладных расходов на запись; колонки — единицы
+    assert store_bytes * 3 < list_bytes
+    assert store.nbytes() <= store_bytes
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Потоковое чтение лога: JSON-массив и NDJSON на любых границах блоков"""
+
+import io
+import json
+
+import pytest
+
+import analyze_logs
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1000, 1 << 16])
+def test_json_array_matches_json_load(records, write_records, chunk_size):
+    log_file = write_records(records[:1500])
+    with open(log_file, 'r', encoding='utf-8') as f:
+        expected = json.load(f)
+    assert list(analyze_logs.iter_records(log_file, chunk_size)) == expected
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64, 1 << 16])
+def test_ndjson_matches_records(records, write_records, chunk_size):
+    path = write_records(records[:500], fmt='ndjson')
+    assert list(analyze_logs.iter_records(path, chunk_size)) == records[:500]
+
+@pytest.mark.parametrize('text', [
+    '  \n [ ]  ',
+    '[{"timestamp": "t", "stream": "s", "content": "a"}\n,\n{"timestamp": "t", "stream": "s", "content": "]"}]',
+    '\n\n{"timestamp": "t", "stream": "s", "content": "x"}\n\n{"timestamp": "t", "stream": "s", "content": "y"}',
+])
+@pytest.mark.parametrize('chunk_size', [1, 4, 1 << 16])
+def test_whitespace_and_separators(text, chunk_size):
+    stripped = text.strip()
+    if stripped.startswith('['):
+        expected = json.loads(stripped)
+    else:
+        expected = [json.loads(line) for line in stripped.splitlines() if line.strip()]
+    assert list(analyze_logs.iter_records_from_stream(io.StringIO(text), chunk_size)) == expected
+
+def test_ndjson_first_line_longer_than_chunk():
+    long_record = {'timestamp': 't', 'stream': 's', 'content': 'x' * 5000}
+    text = json.dumps(long_record) + '\n' + json.dumps({'timestamp': 't', 'stream': 's', 'content': 'y'})
+    result = list(analyze_logs.iter_records_from_stream(io.StringIO(text), 64))
+    assert [r['content'] for r in result] == ['x' * 5000, 'y']
+
+def test_unclosed_array_is_an_error():
+    with pytest.raises(ValueError):
+        list(analyze_logs.iter_records_from_stream(io.StringIO('[{"content": "a"}, '), 4))
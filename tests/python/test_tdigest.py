@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""t-digest: квантили латентности отдачи медиа в ограниченной памяти"""
+
+import json
+import random
+
+import pytest
+
+import analyze_logs
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _latencies(count, seed):
+    rnd = random.Random(seed)
+    # Длинный хвост, как у латентности отдачи медиа
+    return [rnd.lognormvariate(-3, 1) for _ in range(count)]
+
+@pytest.mark.parametrize('q', [0.5, 0.9, 0.95, 0.99])
+def test_tdigest_quantiles_close_to_exact(q):
+    values = _latencies(50000, seed=1)
+    digest = analyze_logs.TDigest()
+    for value in values:
+        digest.add(value)
+    # Ошибка по рангу: оценка лежит между точными квантилями q ± 1%
+    estimate = digest.quantile(q)
+    assert _exact_quantile(values, max(0, q - 0.01)) <= estimate <= _exact_quantile(values, min(1, q + 0.01))
+    assert len(digest.means) < 10 * digest.compression
+
+def test_tdigest_merge_matches_single_digest():
+    parts = [_latencies(20000, seed) for seed in range(4)]
+    merged = analyze_logs.TDigest()
+    single = analyze_logs.TDigest()
+    for part in parts:
+        digest = analyze_logs.TDigest()
+        for value in part:
+            digest.add(value)
+            single.add(value)
+        merged.merge(digest)
+    values = [v for part in parts for v in part]
+    assert merged.count == single.count == len(values)
+    assert merged.min == min(values) and merged.max == max(values)
+    for q in (0.5, 0.99):
+        assert merged.quantile(q) == pytest.approx(single.quantile(q), rel=0.05)
+
+def test_tdigest_serialization_roundtrip():
+    digest = analyze_logs.TDigest()
+    for value in _latencies(5000, seed=3):
+        digest.add(value)
+    restored = analyze_logs.TDigest.from_dict(json.loads(json.dumps(digest.to_dict())))
+    assert restored.count == digest.count
+    for q in (0.5, 0.9, 0.99):
+        assert restored.quantile(q) == pytest.approx(digest.quantile(q), rel=1e-4)
+
+def test_tdigest_empty_and_single_value():
+    digest = analyze_logs.TDigest()
+    assert digest.quantile(0.5) is None
+    digest.add(0.25)
+    assert digest.quantile(0.99) == 0.25
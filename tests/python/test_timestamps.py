@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Метки времени в наносекундах, колонка меток и распределение пауз"""
+
+import random
+from array import array
+from datetime import datetime, timezone
+
+import pytest
+
+import analyze_logs
+
+NS = analyze_logs.NS_PER_SECOND
+
+def _epoch_ns(year, month, day, hour, minute, second, fraction_ns=0, offset_minutes=0):
+    base = datetime(year, month, day, hour, minute, second, tzinfo=timezone.utc)
+    return (int(base.timestamp()) - offset_minutes * 60) * NS + fraction_ns
+
+@pytest.mark.parametrize('ts, expected', [
+    ('2026-02-09T08:40:22', _epoch_ns(2026, 2, 9, 8, 40, 22)),
+    ('2026-02-09T08:40:22.5', _epoch_ns(2026, 2, 9, 8, 40, 22, 500000000)),
+    ('2026-02-09T08:40:22.123456789', _epoch_ns(2026, 2, 9, 8, 40, 22, 123456789)),
+    ('2026-02-09T08:40:22.000000001', _epoch_ns(2026, 2, 9, 8, 40, 22, 1)),
+    # Больше 9 знаков дроби — лишние отбрасываются, без округления
+    ('2026-02-09T08:40:22.1234567899', _epoch_ns(2026, 2, 9, 8, 40, 22, 123456789)),
+    ('2026-02-09T08:40:22Z', _epoch_ns(2026, 2, 9, 8, 40, 22)),
+    ('2026-02-09T08:40:22.25Z', _epoch_ns(2026, 2, 9, 8, 40, 22, 250000000)),
+    ('2026-02-09T08:40:22+03:00', _epoch_ns(2026, 2, 9, 8, 40, 22, offset_minutes=180)),
+    ('2026-02-09T08:40:22.1-05:30', _epoch_ns(2026, 2, 9, 8, 40, 22, 100000000, offset_minutes=-330)),
+    ('2026-02-09T08:40:22+0300', _epoch_ns(2026, 2, 9, 8, 40, 22, offset_minutes=180)),
+    ('2026-02-09T08:40:22.987654321-0130', _epoch_ns(2026, 2, 9, 8, 40, 22, 987654321, offset_minutes=-90)),
+    ('2026-02-09 08:40:22.5', _epoch_ns(2026, 2, 9, 8, 40, 22, 500000000)),
+    ('1970-01-01T00:00:00', 0),
+    ('2024-02-29T23:59:59.999999999', _epoch_ns(2024, 2, 29, 23, 59, 59, 999999999)),
+])
+def test_parse_timestamp_ns(ts, expected):
+    assert analyze_logs.parse_timestamp_ns(ts) == expected
+
+def test_format_roundtrip():
+    ns = _epoch_ns(2026, 2, 9, 8, 40, 22, 123456789)
+    assert analyze_logs.format_timestamp_ns(ns) == '2026-02-09T08:40:22.123456789'
+    assert analyze_logs.parse_timestamp_ns(analyze_logs.format_timestamp_ns(ns)) == ns
+
+@pytest.mark.parametrize('timestamps', [
+    # Формат Amvera: векторный путь
+    ['2026-02-09T08:40:22.1', '2026-02-09T08:40:22.123456789', '2026-02-09T08:40:23', '2026-02-09T08:41:00.05'],
+    # Смешанные смещения и Z: общий путь через parse_timestamp_ns
+    ['2026-02-09T08:40:22.1Z', '2026-02-09T11:40:22.2+03:00', '2026-02-09T03:10:22.3-0530',
+     '2026-02-09T08:40:22.4'],
+    [],
+])
+def test_timestamp_column_matches_scalar_parser(timestamps):
+    column = analyze_logs.timestamp_column(timestamps)
+    assert column.typecode == 'q'
+    assert list(column) == [analyze_logs.parse_timestamp_ns(ts) for ts in timestamps]
+
+def test_mixed_offsets_are_ordered_in_utc():
+    column = analyze_logs.timestamp_column(
+        ['2026-02-09T08:40:22.1Z', '2026-02-09T11:40:22.2+03:00', '2026-02-09T03:10:22.3-0530'])
+    assert list(analyze_logs.gap_column(column)) == [100000000, 100000000]
+
+def test_gap_distribution_matches_exact_counts():
+    rng = random.Random(5)
+    gaps = [int(rng.expovariate(1.0) * NS) for _ in range(5000)] + [120 * NS, 400 * NS]
+    streaming = analyze_logs.GapDistribution()
+    for gap in gaps:
+        streaming.add(gap)
+    vectorized = analyze_logs.GapDistribution()
+    vectorized.add_column(array('q', gaps))
+    result = streaming.result()
+    assert vectorized.result() == result
+    assert result['gaps_total'] == len(gaps)
+    assert result['max_gap_seconds'] == 400
+    for item in result['over_threshold']:
+        over = [gap for gap in gaps if gap > round(item['threshold_seconds'] * NS)]
+        assert item['count'] == len(over)
+        assert item['total_seconds'] == sum(over) / NS
+    # Экспоненциальное распределение со средним 1 сек: доля пауз длиннее 1 сек около e^-1
+    over_1s = next(item['count'] for item in result['over_threshold'] if item['threshold_seconds'] == 1)
+    assert over_1s / len(gaps) == pytest.approx(0.368, abs=0.03)
+
+def test_gap_indices_and_column():
+    column = array('q', [0, NS, 3 * NS, 3 * NS + 1, 40 * NS])
+    gaps = analyze_logs.gap_column(column)
+    assert list(gaps) == [NS, 2 * NS, 1, 37 * NS - 1]
+    assert analyze_logs.gap_indices(gaps, 1) == [1, 3]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Индекс диагностик tsc: построение из лога, запросы по коду и по файлу, ts-query"""
+
+import pytest
+
+import analyze_logs
+
+# (файл, строка, колонка, код, сообщение)
+DIAGNOSTICS = [
+    ('src/components/Gallery.tsx', 12, 5, 'TS2322', "Type 'string' is not assignable to type 'number'."),
+    ('src/components/Gallery.tsx', 40, 17, 'TS2322', "Type 'null' is not assignable to type 'Sticker'."),
+    ('src/components/Gallery.tsx', 51, 3, 'TS2304', "Cannot find name 'useStore'."),
+    ('src/api/client.ts', 7, 1, 'TS2307', "Cannot find module '@/config' or its corresponding type declarations."),
+    ('src/api/client.ts', 88, 22, 'TS2322', "Type 'undefined' is not assignable to type 'string'."),
+    ('src/pages/My Profile.tsx', 3, 9, 'TS2304', "Cannot find name 'React'."),
+]
+
+def _records():
+    records = [{'timestamp': '2026-02-09T08:40:00.0', 'stream': 'stdout', 'content': '> tsc --noEmit'}]
+    for n, (file, line, column, code, message) in enumerate(DIAGNOSTICS, 1):
+        content = f'\x1b[96m{file}\x1b[0m({line},{column}): error {code}: {message}'
+        records.append({'timestamp': f'2026-02-09T08:40:{n:02d}.0', 'stream': 'stderr', 'content': content})
+    # Похожие, но не диагностики tsc
+    records.append({'timestamp': '2026-02-09T08:41:00.0', 'stream': 'stderr', 'content': 'error TS2322 somewhere'})
+    records.append({'timestamp': '2026-02-09T08:41:01.0', 'stream': 'stdout',
+                    'content': 'src/a.ts(1,1): warning TS6133: unused'})
+    return records
+
+@pytest.fixture
+def ts_log(write_records):
+    return write_records(_records(), 'tsc.log')
+
+@pytest.fixture
+def ts_index(ts_log):
+    return analyze_logs.TsDiagnosticIndex.from_dict(analyze_logs.analyze_file(ts_log)['_ts_index'])
+
+def test_index_rows_match_diagnostics(ts_index):
+    assert len(ts_index) == len(DIAGNOSTICS)
+    rows = [ts_index.row(i) for i in range(len(ts_index))]
+    assert [(r['file'], r['line'], r['column'], r['code'], r['message']) for r in rows] == DIAGNOSTICS
+
+def test_query_by_code(ts_index):
+    assert ts_index.files_for_code('TS2322') == [('src/components/Gallery.tsx', 2), ('src/api/client.ts', 1)]
+    assert [ts_index.row(i)['line'] for i in ts_index.rows_for_code('TS2304')] == [51, 3]
+    assert ts_index.rows_for_code('TS9999') == []
+
+def test_query_by_file(ts_index):
+    assert ts_index.codes_for_file('src/components/Gallery.tsx') == [('TS2322', 2), ('TS2304', 1)]
+    assert ts_index.codes_for_file('src/pages/My Profile.tsx') == [('TS2304', 1)]
+    assert ts_index.rows_for_file('missing.ts') == []
+
+def test_summary_and_serialization(ts_index, tmp_path):
+    summary = ts_index.summary()
+    assert summary == {
+        'total': 6,
+        'codes': {'TS2322': 3, 'TS2304': 2, 'TS2307': 1},
+        'files': {'src/components/Gallery.tsx': 3, 'src/api/client.ts': 2, 'src/pages/My Profile.tsx': 1},
+    }
+    path = str(tmp_path / 'index.json')
+    ts_index.save(path)
+    loaded = analyze_logs.TsDiagnosticIndex.load(path)
+    assert loaded.to_dict() == ts_index.to_dict()
+    assert loaded.files_for_code('TS2322') == ts_index.files_for_code('TS2322')
+
+def test_ts_query_command(ts_log, tmp_path, capsys):
+    output = str(tmp_path / 'results.json')
+    analyze_logs.main(silent=True, filepath=ts_log, output_file=output)
+    index_file = analyze_logs.ts_index_path(output)
+    capsys.readouterr()
+
+    analyze_logs.ts_query_main([index_file, '--code', 'TS2322'])
+    assert capsys.readouterr().out.split('\n')[:2] == [
+        '     2  src/components/Gallery.tsx', '     1  src/api/client.ts']
+    analyze_logs.ts_query_main([index_file, '--file', 'src/api/client.ts'])
+    assert capsys.readouterr().out.split() == ['1', 'TS2307', '1', 'TS2322']
+    analyze_logs.ts_query_main([index_file, '--code', 'TS2322', '--file', 'src/api/client.ts', '--rows'])
+    assert capsys.readouterr().out.strip() == (
+        "src/api/client.ts(88,22): TS2322: Type 'undefined' is not assignable to type 'string'.")